@@ -0,0 +1,200 @@
+"""Benchmark harness for every sampling mode across population sizes.
+
+Builds synthetic populations with skewed size distributions (lognormal and
+Pareto) from 10^3 rows up to ``--max-rows`` (10^8 at most) and measures wall
+time and peak traced memory for setup (automatic weights, equal-width
+``pd.cut``, manual cutoffs, exact and sketched equal-frequency cutoffs),
+each design, a batch of replicate samples, the streaming reservoir over a
+CSV file and the export of the sample, both eagerly and chunked through
+:class:`pps.LazySample` in every available format. Results are written as JSON so runs from
+different versions can be compared::
+
+    python benchmarks/bench_sampling.py --max-rows 1e7 --output bench/v0.2.json
+    python benchmarks/bench_sampling.py --compare bench/v0.1.json --output bench/v0.2.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pps import (  # noqa: E402
+    KLLSketch,
+    LazySample,
+    PPSSampler,
+    available_formats,
+    equal_width_bins,
+    generate_replicates,
+    manual_bins,
+    quantile_bins,
+    reservoir_sample_csv,
+)
+from pps.stratified import allocate, stratified_sample, stratum_summary  # noqa: E402
+
+DISTRIBUTIONS = {
+    "lognormal": lambda rng, n: rng.lognormal(mean=3.0, sigma=1.5, size=n),
+    "pareto": lambda rng, n: (rng.pareto(1.2, size=n) + 1) * 100,
+}
+
+# Sampford is rejective; its acceptance rate collapses for large samples
+SAMPFORD_MAX_SAMPLE = 200
+
+# Replicate samples drawn per run, in the calling process so timings compare across machines
+REPLICATES = 100
+
+# Writing the CSV for the streaming case dominates beyond this many rows
+STREAM_MAX_ROWS = 10 ** 7
+
+
+def measure(func, repeat):
+    """Best wall time over ``repeat`` runs and the peak traced memory of one run."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def cases(sizes, sample_size, workdir):
+    """Yield ``(group, name, callable)`` for every benchmarked operation; files go to ``workdir``."""
+    cutoffs = np.nanquantile(sizes, [1 / 3, 2 / 3])
+    weights3 = [1.0, 2.0, 4.0]
+
+    yield "setup", "automatic", lambda: PPSSampler.from_sizes(sizes)
+    yield "setup", "equal_width_cut", lambda: PPSSampler.from_bins(equal_width_bins(sizes, 3)[0], weights3)
+    yield "setup", "manual_cutoffs", lambda: PPSSampler.from_bins(manual_bins(sizes, cutoffs)[0], weights3)
+    yield "setup", "qcut", lambda: PPSSampler.from_bins(quantile_bins(sizes, 3)[0], weights3)
+    yield "setup", "quantile_sketch", lambda: KLLSketch().update(sizes).edges(3)
+
+    sampler = PPSSampler.from_sizes(sizes)
+    yield "setup", "alias_table", lambda: PPSSampler.from_sizes(sizes).alias_table
+    sampler.alias_table
+    yield "design", "successive", lambda: sampler.sample(sample_size, random_state=1)
+    yield "design", "with_replacement", lambda: sampler.sample(sample_size, replace=True, random_state=1)
+    yield "design", "systematic", lambda: sampler.sample_design(sample_size, "systematic", random_state=1)
+    yield "design", "pareto", lambda: sampler.sample_design(sample_size, "pareto", random_state=1)
+    yield "design", "sequential_poisson", lambda: sampler.sample_design(sample_size, "sequential_poisson",
+                                                                         random_state=1)
+    if sample_size <= SAMPFORD_MAX_SAMPLE:
+        yield "design", "sampford", lambda: sampler.sample_design(sample_size, "sampford", random_state=1)
+
+    codes = quantile_bins(sizes, 3)[0]
+    summary = stratum_summary(codes, sizes, 3)
+    allocation = allocate(sample_size, summary, "neyman")
+    yield "design", "stratified_neyman", lambda: stratified_sample(codes, sizes, allocation, 1, summary=summary)
+    yield "design", "replicates", lambda: generate_replicates(sampler, sample_size, REPLICATES, seed=1, workers=1)
+
+    frame = pd.DataFrame({"id": np.arange(sizes.size), "size": sizes})
+    indices = sampler.sample(sample_size, random_state=1)
+    yield "export", "csv", lambda: sampler.take(frame, indices).to_csv(io.StringIO(), index=False)
+    sample = LazySample(frame, sampler, indices)
+    for fmt in available_formats():
+        yield "export", f"lazy_{fmt}", lambda fmt=fmt: sample.write(io.BytesIO(), fmt)
+
+    if sizes.size <= STREAM_MAX_ROWS:
+        path = os.path.join(workdir, "population.csv")
+        frame.to_csv(path, index=False)
+        yield "stream", "reservoir_csv", lambda: reservoir_sample_csv(path, "size", sample_size, random_state=1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(max_rows, repeat, sample_fraction, max_sample, seed):
+    rng = np.random.default_rng(seed)
+    results = []
+    exponent = 3
+    with tempfile.TemporaryDirectory(prefix="pps-bench-") as workdir:
+        while 10 ** exponent <= max_rows:
+            rows = 10 ** exponent
+            sample_size = max(1, min(max_sample, int(rows * sample_fraction)))
+            for dist_name, make in DISTRIBUTIONS.items():
+                sizes = make(rng, rows)
+                for group, name, func in cases(sizes, sample_size, workdir):
+                    seconds, peak = measure(func, repeat)
+                    results.append({
+                        "group": group,
+                        "case": name,
+                        "distribution": dist_name,
+                        "rows": rows,
+                        "sample_size": sample_size,
+                        "seconds": seconds,
+                        "peak_bytes": peak,
+                    })
+                    print(f"{group:7s} {name:20s} {dist_name:10s} rows=1e{exponent} n={sample_size:<8d} "
+                          f"{seconds * 1000:10.2f} ms {peak / 2 ** 20:9.1f} MiB", flush=True)
+            exponent += 1
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {
+            (r["group"], r["case"], r["distribution"], r["rows"]): r
+            for r in json.load(f)["results"]
+        }
+    print(f"\nChange versus {baseline_path} (time ratio, memory ratio):")
+    for r in results:
+        old = baseline.get((r["group"], r["case"], r["distribution"], r["rows"]))
+        if old and old["seconds"] > 0:
+            memory = r["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else float("nan")
+            print(f"{r['group']:7s} {r['case']:20s} {r['distribution']:10s} rows={r['rows']:<10d} "
+                  f"x{r['seconds'] / old['seconds']:6.2f}  x{memory:6.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PPS sampling modes.")
+    parser.add_argument("--max-rows", type=float, default=1e6, help="largest population size (default: 1e6)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the best is kept")
+    parser.add_argument("--sample-fraction", type=float, default=0.01, help="sample size as a share of rows")
+    parser.add_argument("--max-sample", type=int, default=500_000, help="upper bound on the sample size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    results = run(min(args.max_rows, 1e8), args.repeat, args.sample_fraction, args.max_sample, args.seed)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    directory = os.path.dirname(args.output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Headless PPS sampling engine shared by the Streamlit, Tk and batch front-ends.
+
+Nothing ``import pps`` loads imports Streamlit or Tk, so batch jobs can use it
+without paying GUI start-up cost. The Streamlit widgets the apps share live
+in :mod:`pps.ui`, which only the apps import.
+"""
+from .alias import AliasTable
+from .binning import bin_counts, equal_width_bins, equal_width_edges, label_rows, manual_bins, manual_edges, quantile_bins
+from .cache import LRUCache, cached, content_hash, read_csv_cached
+from .coordination import permanent_random_numbers, shift_prn
+from .core import PPSSampler
+from .designs import DesignSample, PRN_DESIGNS, inclusion_probabilities, pareto, sampford, sequential_poisson, systematic_pps
+from .diagnostics import DEFAULT_REPLICATES, SampleDiagnostics, diagnose, format_diagnostics
+from .estimation import VARIANCE_METHODS, estimate
+from .export import EXPORT_FORMATS, LazySample, available_formats, format_from_path, write_chunks, write_frame
+from .expressions import SizeExpression
+from .incremental import DeltaSummary, IncrementalFrame, SampleChange, read_delta
+from .jobs import Job, JobCancelled, JobManager, job_processes, submit_job
+from .profiling import Profiler, StageTiming, configure_logging
+from .quantiles import KLLSketch, bin_report, codes_from_edges, interval_labels, quantile_edges
+from .replicates import generate_replicates
+from .sharded import ShardedSample, shard_edges, sharded_sample
+from .sources import ArrowSource, FrameSource, SUPPORTED_EXTENSIONS, detect_format, open_source, open_upload
+from .stratified import allocate, label_strata, stratified_sample, stratum_summary
+from .streaming import fetch_rows, reservoir_sample_csv, stream_quantile_bins, stream_sample_csv
+
+__all__ = [
+    "AliasTable",
+    "ArrowSource",
+    "DEFAULT_REPLICATES",
+    "DeltaSummary",
+    "DesignSample",
+    "EXPORT_FORMATS",
+    "FrameSource",
+    "IncrementalFrame",
+    "Job",
+    "JobCancelled",
+    "JobManager",
+    "KLLSketch",
+    "LazySample",
+    "LRUCache",
+    "PPSSampler",
+    "PRN_DESIGNS",
+    "Profiler",
+    "SampleChange",
+    "SampleDiagnostics",
+    "ShardedSample",
+    "SizeExpression",
+    "StageTiming",
+    "SUPPORTED_EXTENSIONS",
+    "VARIANCE_METHODS",
+    "allocate",
+    "available_formats",
+    "bin_counts",
+    "bin_report",
+    "cached",
+    "codes_from_edges",
+    "configure_logging",
+    "content_hash",
+    "detect_format",
+    "diagnose",
+    "equal_width_bins",
+    "equal_width_edges",
+    "estimate",
+    "fetch_rows",
+    "format_diagnostics",
+    "format_from_path",
+    "generate_replicates",
+    "inclusion_probabilities",
+    "interval_labels",
+    "job_processes",
+    "label_rows",
+    "label_strata",
+    "manual_bins",
+    "manual_edges",
+    "open_source",
+    "open_upload",
+    "pareto",
+    "permanent_random_numbers",
+    "quantile_bins",
+    "quantile_edges",
+    "read_delta",
+    "read_csv_cached",
+    "reservoir_sample_csv",
+    "sampford",
+    "sequential_poisson",
+    "shard_edges",
+    "sharded_sample",
+    "shift_prn",
+    "stratified_sample",
+    "stratum_summary",
+    "stream_quantile_bins",
+    "stream_sample_csv",
+    "submit_job",
+    "systematic_pps",
+    "write_chunks",
+    "write_frame",
+]
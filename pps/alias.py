@@ -0,0 +1,78 @@
+"""Walker/Vose alias tables for O(1) with-replacement PPS draws."""
+import numpy as np
+
+
+def _build(weights):
+    """Vose's construction, pairing whole batches of small and large columns per round.
+
+    Within a round, each small column is paired with the large column whose
+    running excess covers the start of its deficit, so a single large column
+    can absorb many small ones at once. Large columns that drop below one
+    become small for the next round.
+    """
+    n = weights.size
+    scaled = weights * (n / weights.sum())
+    prob = np.ones(n)
+    alias = np.arange(n, dtype=np.int64)
+    small = np.flatnonzero(scaled < 1)
+    large = np.flatnonzero(scaled >= 1)
+    while small.size and large.size:
+        deficit = 1 - scaled[small]
+        start = np.cumsum(deficit) - deficit
+        owner = np.searchsorted(np.cumsum(scaled[large] - 1), start, side="right")
+        served = owner < large.size
+        if not served.any():
+            break
+        paired = small[served]
+        prob[paired] = scaled[paired]
+        alias[paired] = large[owner[served]]
+        scaled[large] -= np.bincount(owner[served], weights=deficit[served], minlength=large.size)
+        still_large = scaled[large] >= 1
+        small = np.concatenate([small[~served], large[~still_large]])
+        large = large[still_large]
+    return prob, alias
+
+
+class AliasTable:
+    """Prebuilt index for drawing rows with probability proportional to weight.
+
+    Building is O(N) and vectorized; each draw is one uniform column pick and
+    one coin flip, so batches of millions of indices cost O(size). Tables can
+    be saved with :meth:`save` and reloaded with :meth:`load`.
+    """
+
+    def __init__(self, prob, alias, total):
+        self.prob = prob
+        self.alias = alias
+        self.total = float(total)
+
+    @classmethod
+    def from_weights(cls, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        weights = np.where(weights > 0, weights, 0.0)
+        total = weights.sum()
+        if total <= 0:
+            raise ValueError("Total probability is zero or invalid.")
+        prob, alias = _build(weights)
+        if weights.size <= np.iinfo(np.int32).max:
+            alias = alias.astype(np.int32)
+        return cls(prob, alias, total)
+
+    def __len__(self):
+        return self.prob.size
+
+    def draw(self, size, random_state=None):
+        """Draw ``size`` row indices with replacement."""
+        rng = np.random.default_rng(random_state)
+        columns = rng.integers(0, self.prob.size, size=int(size))
+        keep = rng.random(columns.size) < self.prob[columns]
+        return np.where(keep, columns, self.alias[columns]).astype(np.intp)
+
+    def save(self, file):
+        """Write the table to ``file`` (a path or binary file object) in NumPy ``.npz`` format."""
+        np.savez(file, prob=self.prob, alias=self.alias, total=self.total)
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file) as data:
+            return cls(data["prob"], data["alias"], data["total"])
@@ -0,0 +1,74 @@
+"""Bin assignment on a single size column.
+
+Every helper works on a one-dimensional array and returns ``(codes, labels)``:
+``codes`` holds the bin number of each row (``-1`` for rows outside every
+bin, e.g. missing values) and ``labels`` the bin names in code order.
+"""
+import numpy as np
+import pandas as pd
+
+from .quantiles import codes_from_edges, interval_labels, quantile_edges
+
+
+def _codes_and_labels(categorical):
+    labels = categorical.categories.astype(str).tolist()
+    return np.asarray(categorical.codes), labels
+
+
+def equal_width_bins(values, num_bins):
+    """Equal-width bins, as ``pd.cut(values, bins=num_bins)``."""
+    return _codes_and_labels(pd.cut(np.asarray(values), bins=int(num_bins)))
+
+
+def equal_width_edges(values, num_bins):
+    """Edges of :func:`equal_width_bins`, widened as ``pd.cut`` does so the minimum falls inside."""
+    values = np.asarray(values, dtype=float)
+    low, high = float(np.nanmin(values)), float(np.nanmax(values))
+    if low == high:
+        low -= 0.001 * abs(low) if low != 0 else 0.001
+        high += 0.001 * abs(high) if high != 0 else 0.001
+        return np.linspace(low, high, int(num_bins) + 1)
+    edges = np.linspace(low, high, int(num_bins) + 1)
+    edges[0] -= (high - low) * 0.001
+    return edges
+
+
+def manual_edges(values, cutoffs, upper_pad=0.01):
+    """Edges of :func:`manual_bins`: the column minimum, the ``cutoffs`` and the padded maximum."""
+    values = np.asarray(values, dtype=float)
+    return np.array([float(np.nanmin(values))] + [float(c) for c in cutoffs] + [float(np.nanmax(values)) + upper_pad])
+
+
+def manual_bins(values, cutoffs, upper_pad=0.01):
+    """Bins bounded by the column minimum, the internal ``cutoffs`` and the maximum.
+
+    The upper edge is padded by ``upper_pad`` so the maximum falls inside the
+    last bin, matching the manual mode of the Streamlit apps.
+    """
+    values = np.asarray(values, dtype=float)
+    edges = manual_edges(values, cutoffs, upper_pad)
+    return _codes_and_labels(pd.cut(values, bins=edges, include_lowest=True))
+
+
+def quantile_bins(values, num_bins, labels=None):
+    """Equal-frequency bins, as ``pd.qcut(values, q=num_bins, labels=labels)``.
+
+    The cutoffs come from :func:`pps.quantiles.quantile_edges`, which selects
+    them with ``np.partition`` instead of sorting the column.
+    """
+    edges = quantile_edges(values, num_bins)
+    if labels is not None and len(labels) != len(edges) - 1:
+        raise ValueError("Bin labels must be one fewer than the number of bin edges")
+    return codes_from_edges(values, edges), list(labels) if labels is not None else interval_labels(edges)
+
+
+def bin_counts(codes, num_bins):
+    """Number of rows falling in each bin."""
+    codes = np.asarray(codes)
+    return np.bincount(codes[codes >= 0], minlength=num_bins)
+
+
+def label_rows(codes, labels, indices):
+    """Bin labels of the rows at ``indices`` (``None`` for rows outside every bin)."""
+    lookup = np.array(list(labels) + [None], dtype=object)
+    return lookup[np.asarray(codes)[indices]]
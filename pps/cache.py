@@ -0,0 +1,133 @@
+"""Process-wide LRU cache for parsed uploads and derived sampling inputs.
+
+Entries are keyed on a hash of the uploaded file's content plus whatever
+parameters produced them (column, binning settings, weights), so reruns and
+other sessions working on the same file reuse the parsed frame, bin codes
+and samplers instead of reprocessing the file. The least recently used
+entries are evicted once the cache holds more than ``max_bytes``. Values
+that grow after they are stored, such as sources filling in the columns they
+read, are measured again through :meth:`LRUCache.remeasure`.
+"""
+import hashlib
+import io
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 2 << 30
+
+_MISSING = object()
+
+
+def content_hash(data):
+    """Hex digest identifying the content of a bytes-like object."""
+    return hashlib.blake2b(memoryview(data), digest_size=16).hexdigest()
+
+
+def _sizeof(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    if isinstance(value, (tuple, list)):
+        return sum(_sizeof(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_sizeof(v) for v in value.values())
+    if hasattr(value, "__dict__"):
+        return sum(_sizeof(v) for v in vars(value).values())
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache bounded by the estimated size of its values."""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+    def put(self, key, value):
+        size = _sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            self._evict()
+
+    def remeasure(self, key):
+        """Estimate the size of the value under ``key`` again after it grew in place, evicting as needed."""
+        with self._lock:
+            if key not in self._entries:
+                return
+            value, size = self._entries[key]
+            self._entries[key] = (value, _sizeof(value))
+            self._nbytes += self._entries[key][1] - size
+            self._evict()
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._nbytes -= evicted
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+default_cache = LRUCache()
+
+
+def cached(key, compute, cache=None):
+    """Look ``key`` up in ``cache`` (the process-wide cache by default), computing it on a miss."""
+    return (default_cache if cache is None else cache).get_or_compute(key, compute)
+
+
+def read_csv_cached(data, cache=None, compact=False, **read_csv_kwargs):
+    """Parse CSV ``data`` (bytes) once per distinct content.
+
+    Returns ``(frame, file_hash)``; use ``file_hash`` as the first part of
+    the keys of everything derived from this frame. The cached frame is
+    shared, so callers must not modify it in place. With ``compact`` it is
+    stored through :func:`pps.compact.compact_frame`.
+    """
+    from .compact import compact_frame
+
+    def parse():
+        frame = pd.read_csv(io.BytesIO(data), **read_csv_kwargs)
+        return compact_frame(frame) if compact else frame
+
+    file_hash = content_hash(data)
+    key = ("read_csv", file_hash, compact, tuple(sorted(read_csv_kwargs.items())))
+    frame = cached(key, parse, cache)
+    return frame, file_hash
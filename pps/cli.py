@@ -0,0 +1,474 @@
+"""``pps-sample``: headless PPS sampling for scheduled and batch jobs.
+
+Example::
+
+    pps-sample extracts/*.parquet --column revenue -n 500 --bins 3 \\
+        --labels Small,Medium,Large --weights 1,2,4 --seed 7 \\
+        --output "samples/{stem}_sample.csv" --workers 4
+
+Each input is sampled independently with the same settings; ``{stem}`` in
+``--output`` is replaced by the input file's name without extension. With
+``--sharded`` the inputs are instead shards of one population, sampled
+together into one output named after the first shard. Quoted glob
+patterns are expanded by the command itself, in sorted order. The
+command exits with status 0 when every file was sampled, 1 when any file
+failed and 2 on invalid arguments. It never imports a GUI toolkit.
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .binning import equal_width_bins, equal_width_edges, label_rows, manual_bins, manual_edges, quantile_bins
+from .coordination import permanent_random_numbers, shift_prn
+from .core import PPSSampler
+from .diagnostics import DEFAULT_REPLICATES, diagnose, format_diagnostics
+from .export import LazySample, format_from_path, write_frame
+from .incremental import IncrementalFrame, read_delta
+from .profiling import LOGGER, Profiler
+from .sources import open_source
+from .stratified import ALLOCATIONS, allocate, label_strata, stratified_sample, stratum_summary
+from .quantiles import DEFAULT_K, interval_labels, quantile_edges
+from .sharded import shard_edges, sharded_sample
+from .streaming import DEFAULT_CHUNKSIZE, stream_quantile_bins, stream_sample_csv
+
+EXIT_OK = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+
+DESIGN_CHOICES = ["successive", "with-replacement", "systematic", "sampford", "pareto", "sequential-poisson"]
+
+
+def _list_of(convert):
+    def parse(text):
+        try:
+            return [convert(item.strip()) for item in text.split(",")]
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return parse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="pps-sample",
+        description="Draw probability-proportional-to-size samples from CSV, Parquet, Feather or Arrow files.",
+    )
+    parser.add_argument("inputs", nargs="+", help="input files or quoted glob patterns")
+    parser.add_argument("-c", "--column", required=True,
+                        help="numeric size column, or a size expression over several columns such as "
+                             "'revenue * employees' or 'log1p(revenue)'")
+    parser.add_argument("-n", "--sample-size", type=int, required=True, help="rows to draw per file")
+    parser.add_argument("--design", choices=DESIGN_CHOICES, default="successive",
+                        help="sampling design (default: successive draws without replacement)")
+    parser.add_argument("--prn-key", help="unit key column for permanent random numbers, which coordinate "
+                                          "samples over time (pareto or sequential-poisson design)")
+    parser.add_argument("--prn-seed", type=int, default=0, help="permanent random number seed, one per survey (default: 0)")
+    parser.add_argument("--prn-shift", type=float, default=0.0,
+                        help="shift of the permanent random numbers; 0 maximizes overlap with earlier samples, "
+                             "the sampling fraction rotates units out (default: 0)")
+    binning = parser.add_mutually_exclusive_group()
+    binning.add_argument("--bins", type=int, help="number of equal-width bins")
+    binning.add_argument("--cutoffs", type=_list_of(float), help="internal cutoff points, comma-separated")
+    binning.add_argument("--quantiles", type=int, help="number of equal-frequency bins")
+    parser.add_argument("--labels", type=_list_of(str), help="bin labels, comma-separated")
+    parser.add_argument("--weights", type=_list_of(float), help="bin weights, comma-separated (default: 1 each)")
+    parser.add_argument("--stratified", action="store_true", help="sample PPS within each bin label instead of weighting bins")
+    parser.add_argument("--allocation", choices=ALLOCATIONS, default="proportional", help="stratum allocation")
+    parser.add_argument("--fixed", type=_list_of(int), help="per-label sample sizes for --allocation fixed")
+    parser.add_argument("--seed", type=int, default=42, help="random seed (default: 42)")
+    parser.add_argument("-o", "--output", default="{stem}_sample.csv",
+                        help="output path, .csv, .csv.gz, .csv.zst or .parquet; {stem} is the input name "
+                             "(default: {stem}_sample.csv)")
+    parser.add_argument("--index-only", action="store_true",
+                        help="write only row indices, bin labels and probabilities instead of full rows")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes: files (or shards with --sharded) read in parallel, or with one "
+                             "input the processes drawing the --diagnostics replicates (default: 1)")
+    parser.add_argument("--sharded", action="store_true",
+                        help="treat the inputs as shards of one population and draw one sample across them "
+                             "(successive or with-replacement design; --quantiles bins are approximate)")
+    parser.add_argument("--stream", action="store_true",
+                        help="two-pass chunked sampling of large CSVs (successive design; bins only with --quantiles)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="rows per chunk with --stream")
+    parser.add_argument("--sketch-k", type=int, default=DEFAULT_K,
+                        help=f"quantile sketch size for --stream --quantiles; larger is more accurate (default: {DEFAULT_K})")
+    parser.add_argument("--diagnostics", metavar="PATH",
+                        help="also write expected vs. realized counts per bin, sum of pi, certainty units, size "
+                             "coverage, effective sample size and a Monte Carlo check of pi to PATH; {stem} is the "
+                             "input name")
+    parser.add_argument("--diagnostic-replicates", type=int, default=DEFAULT_REPLICATES,
+                        help=f"replicate draws for the Monte Carlo check, 0 to skip (default: {DEFAULT_REPLICATES})")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the time spent in each stage (read, bin, weights, sample, write) to stderr")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="also track the peak memory of each stage with tracemalloc (slower); "
+                             "implies --profile unless --profile-log is given")
+    parser.add_argument("--profile-log", metavar="PATH",
+                        help="append one JSON object per stage, plus a summary per file, to PATH")
+    incremental = parser.add_mutually_exclusive_group()
+    incremental.add_argument("--save-state", metavar="PATH",
+                             help="also save the sizes, bins and sample of a --prn-key run to PATH (.npz) "
+                                  "for later --from-state updates")
+    incremental.add_argument("--from-state", metavar="PATH",
+                             help="treat the inputs as delta files, apply them in order to the state saved at "
+                                  "PATH, redraw the sample and update the state; {stem} is the state's name")
+    parser.add_argument("--op-column", default="op",
+                        help="delta column holding insert, update, delete or upsert (default: op; "
+                             "without it every row is an upsert)")
+    return parser
+
+
+def _expand(inputs):
+    """Input paths with every glob pattern replaced by its matches, sorted; patterns matching nothing stay as given."""
+    paths = []
+    for pattern in inputs:
+        paths.extend(sorted(glob.glob(pattern)) or [pattern])
+    return paths
+
+
+def _validate(parser, args):
+    binned = args.bins is not None or args.cutoffs is not None or args.quantiles is not None
+    if args.sample_size < 1:
+        parser.error("--sample-size must be at least 1")
+    if len(args.inputs) > 1 and "{stem}" not in args.output and not args.sharded:
+        parser.error("--output must contain {stem} when sampling several files")
+    if args.sharded and (args.stream or args.stratified or args.prn_key or args.save_state or args.from_state
+                         or args.design not in ("successive", "with-replacement")):
+        parser.error("--sharded supports the successive and with-replacement designs, optionally over bins")
+    outputs = [output_path(args.output, path) for path in args.inputs]
+    if len(set(outputs)) != len(outputs) and not args.sharded:
+        parser.error("several inputs share a file name and would write the same output")
+    if args.stream and args.index_only:
+        parser.error("--index-only cannot be combined with --stream")
+    if args.stream and (args.bins is not None or args.cutoffs is not None or args.stratified or args.design != "successive"):
+        parser.error("--stream supports only the successive design, optionally over --quantiles bins")
+    if args.stratified and not binned:
+        parser.error("--stratified needs --bins, --cutoffs or --quantiles")
+    if args.stratified and args.design != "successive":
+        parser.error("--stratified uses successive draws within strata; drop --design")
+    if args.prn_key and args.design not in ("pareto", "sequential-poisson"):
+        parser.error("--prn-key needs --design pareto or sequential-poisson")
+    if args.save_state and not args.prn_key:
+        parser.error("--save-state needs --prn-key and --design pareto or sequential-poisson")
+    if args.save_state and (args.stratified or len(args.inputs) > 1):
+        parser.error("--save-state takes one input and does not support --stratified")
+    if args.from_state and (binned or args.stratified or args.stream or args.index_only or args.prn_key):
+        parser.error("--from-state takes the key, design and bins from the saved state; drop the sampling options")
+    if args.diagnostics and (args.stream or args.stratified or args.sharded or args.from_state):
+        parser.error("--diagnostics cannot be combined with --stream, --stratified, --sharded or --from-state")
+    if args.diagnostics and len(args.inputs) > 1 and "{stem}" not in args.diagnostics:
+        parser.error("--diagnostics must contain {stem} when sampling several files")
+    if args.allocation == "fixed" and not args.fixed:
+        parser.error("--allocation fixed needs --fixed")
+    if args.fixed and args.allocation != "fixed":
+        parser.error("--fixed needs --allocation fixed")
+    if args.weights and args.stratified:
+        parser.error("--weights weight bins and cannot be combined with --stratified; use --allocation")
+    if (args.labels or args.weights) and not binned:
+        parser.error("--labels and --weights need --bins, --cutoffs or --quantiles")
+
+
+def _bin(values, options):
+    """Bin codes, interval labels and the name of the bin column, or Nones without binning."""
+    column = options["column"]
+    if options["bins"] is not None:
+        return equal_width_bins(values, options["bins"]) + (f"{column}_cut",)
+    if options["cutoffs"] is not None:
+        return manual_bins(values, options["cutoffs"]) + (f"{column}_cut",)
+    if options["quantiles"] is not None:
+        return quantile_bins(values, options["quantiles"]) + (f"{column}_qbin",)
+    return None, None, None
+
+
+def _edges(values, options):
+    """Bin edges behind :func:`_bin`, or None without binning."""
+    if options["bins"] is not None:
+        return equal_width_edges(values, options["bins"])
+    if options["cutoffs"] is not None:
+        return manual_edges(values, options["cutoffs"])
+    if options["quantiles"] is not None:
+        return quantile_edges(values, options["quantiles"])
+    return None
+
+
+def _labels(bin_labels, options):
+    labels = options["labels"] or [f"Bin{i+1}" for i in range(len(bin_labels))]
+    if len(labels) != len(bin_labels):
+        raise ValueError(f"Expected {len(bin_labels)} labels, got {len(labels)}.")
+    return labels
+
+
+def _bin_weights(labels, options):
+    """Weight of every bin; bins sharing a label share that label's weight."""
+    weights = options["weights"] or [1.0] * len(labels)
+    if len(weights) != len(labels):
+        raise ValueError(f"Expected {len(labels)} weights, got {len(weights)}.")
+    prob_map = dict(zip(labels, weights))
+    return [prob_map[label] for label in labels]
+
+
+def output_path(template, path):
+    """``template`` with ``{stem}`` replaced by the name of ``path`` without extension."""
+    return template.replace("{stem}", os.path.splitext(os.path.basename(path))[0])
+
+
+def sample_file(path, options, profiler=None):
+    """Sample one input file and write the result; returns the output path.
+
+    Stages are timed with ``profiler`` (a :class:`pps.profiling.Profiler`) when given.
+    """
+    profiler = profiler or Profiler()
+    column = options["column"]
+    n = options["sample_size"]
+    seed = options["seed"]
+    output = output_path(options["output"], path)
+
+    if options["stream"]:
+        edges = weights = labels = None
+        if options["quantiles"] is not None:
+            # Approximate cutoffs from one sketch pass over the size column
+            with profiler.stage("quantile sketch", "io"):
+                bins = stream_quantile_bins(path, column, options["quantiles"], options["chunksize"],
+                                            options["sketch_k"], seed)
+            edges = bins.edges
+            labels = _labels(bins.labels, options)
+            weights = _bin_weights(labels, options)
+        with profiler.stage("stream sample", "io"):
+            sample_df = stream_sample_csv(path, column, n, options["chunksize"], seed, edges, weights, labels,
+                                          None if edges is None else "bin_label")
+        with profiler.stage("write", "io"):
+            _make_parent(output)
+            write_frame(output, sample_df)
+        return output
+
+    with profiler.stage("read", "io"):
+        source = open_source(path)
+        sizes = source.column(column)
+    with profiler.stage("bin"):
+        codes, bin_labels, bin_col = _bin(sizes, options)
+    extra_columns = {}
+
+    with profiler.stage("weights"):
+        if codes is None:
+            sampler = PPSSampler.from_sizes(sizes)
+        else:
+            labels = _labels(bin_labels, options)
+            if options["stratified"]:
+                sampler = PPSSampler.from_sizes(sizes)
+            else:
+                sampler = PPSSampler.from_bins(codes, _bin_weights(labels, options))
+
+    with profiler.stage("sample"):
+        if options["stratified"]:
+            strata, stratum_labels = label_strata(codes, labels)
+            summary = stratum_summary(strata, sizes, len(stratum_labels))
+            allocation = allocate(n, summary, options["allocation"], options["fixed"])
+            result = stratified_sample(strata, sizes, allocation, random_state=seed, summary=summary)
+            indices = result.indices
+            extra_columns["stratum_probability"] = result.probability
+        elif options["design"] in ("successive", "with-replacement"):
+            indices = sampler.sample(n, replace=options["design"] == "with-replacement", random_state=seed)
+        else:
+            prn = None
+            if options["prn_key"]:
+                if options["prn_key"] not in source.columns:
+                    raise ValueError(f"Key column '{options['prn_key']}' not found.")
+                prn = shift_prn(permanent_random_numbers(source.column(options["prn_key"]), options["prn_seed"]),
+                                options["prn_shift"])
+            result = sampler.sample_design(n, design=options["design"].replace("-", "_"), random_state=seed, prn=prn)
+            indices = result.indices
+            extra_columns["inclusion_probability"] = result.pi
+
+    if options["save_state"]:
+        with profiler.stage("save state", "io"):
+            weights = None if codes is None else _bin_weights(labels, options)
+            state = IncrementalFrame(source.column(options["prn_key"]), sizes, n, options["design"].replace("-", "_"),
+                                     options["prn_seed"], options["prn_shift"], _edges(sizes, options), weights,
+                                     None if codes is None else labels, options["prn_key"], column)
+            state.draw()
+            _make_parent(options["save_state"])
+            _save_state(state, options["save_state"])
+
+    if column not in source.columns:
+        # A size expression: write the derived measure next to the sampled rows
+        extra_columns[column] = sizes[indices]
+    if options["diagnostics"]:
+        with profiler.stage("diagnostics"):
+            design = options["design"]
+            # Several inputs already take one worker process each
+            workers = options["workers"] if len(options["inputs"]) == 1 else 1
+            checks = diagnose(sampler, indices, n, codes, None if codes is None else labels, sizes,
+                              replace=design == "with-replacement",
+                              design=None if design in ("successive", "with-replacement") else design.replace("-", "_"),
+                              replicates=options["diagnostic_replicates"], random_state=seed, workers=workers)
+        with profiler.stage("write diagnostics", "io"):
+            report = output_path(options["diagnostics"], path)
+            _make_parent(report)
+            with open(report, "w") as f:
+                f.write(format_diagnostics(checks) + "\n")
+
+    if codes is not None:
+        with profiler.stage("label"):
+            extra_columns[bin_col] = label_rows(codes, bin_labels, indices)
+            extra_columns["bin_label"] = label_rows(codes, labels, indices)
+    with profiler.stage("write", "io"):
+        _make_parent(output)
+        with open(output, "wb") as f:
+            LazySample(source, sampler, indices, extra_columns).write(f, format_from_path(output), options["index_only"])
+    return output
+
+
+def sample_shards(paths, options, profiler=None):
+    """Sample the population split across ``paths`` into one output; returns the output path."""
+    profiler = profiler or Profiler()
+    column = options["column"]
+    workers = options["workers"]
+    edges = weights = labels = None
+    if options["bins"] is not None or options["cutoffs"] is not None or options["quantiles"] is not None:
+        with profiler.stage("shard edges", "io"):
+            edges = shard_edges(paths, column, options["bins"], options["cutoffs"], options["quantiles"],
+                                options["sketch_k"], options["seed"], workers)
+        labels = _labels(interval_labels(edges), options)
+        weights = _bin_weights(labels, options)
+    with profiler.stage("shard sample", "io"):
+        result = sharded_sample(paths, column, options["sample_size"], options["design"] == "with-replacement",
+                                options["seed"], edges, weights, labels, None if edges is None else "bin_label",
+                                workers, options["index_only"])
+    output = output_path(options["output"], paths[0])
+    with profiler.stage("write", "io"):
+        _make_parent(output)
+        write_frame(output, result.frame)
+    return output
+
+
+def update_from_state(options, profiler=None):
+    """Apply the delta inputs to the saved state, redraw and write the sample; returns report lines."""
+    profiler = profiler or Profiler()
+    path = options["from_state"]
+    with profiler.stage("read state", "io"):
+        state = IncrementalFrame.load(path)
+    if options["column"] != state.size_column:
+        raise ValueError(f"The state was saved with size column '{state.size_column}', not '{options['column']}'.")
+    lines = []
+    for delta in options["inputs"]:
+        with profiler.stage("read delta", "io"):
+            keys, sizes, ops = read_delta(open_source(delta), state.key_column, options["column"], options["op_column"])
+        with profiler.stage("apply delta"):
+            summary = state.apply_delta(keys, sizes, ops)
+        lines.append(f"{delta}: {summary.inserted} inserted, {summary.updated} updated, {summary.deleted} deleted")
+    with profiler.stage("sample"):
+        result, change = state.draw(options["sample_size"])
+    output = output_path(options["output"], path)
+    with profiler.stage("write", "io"):
+        _make_parent(output)
+        write_frame(output, state.sample_frame(result))
+    with profiler.stage("save state", "io"):
+        _save_state(state, path)
+    lines.append(f"{path} -> {output}: {change.kept.size} kept, {change.added.size} added, {change.dropped.size} dropped")
+    return lines
+
+
+def _save_state(state, path):
+    # Written beside the old state and swapped in, so a failed run leaves it intact
+    temporary = path + ".tmp"
+    state.save(temporary)
+    os.replace(temporary, path)
+
+
+def _make_parent(output):
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def _profiler(options, path):
+    # Stages are logged by the parent process, so workers need no log handlers
+    return Profiler(memory=options["profile_memory"], file=path)
+
+
+def _report_profile(profiler, options):
+    if options["profile"]:
+        print(f"{profiler.context['file']}:\n{profiler.format()}", file=sys.stderr)
+    if options["profile_log"]:
+        profiler.emit()
+
+
+def _log_to(path):
+    """Append the JSON stage records of the ``pps.profile`` logger to ``path``."""
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(logging.INFO)
+
+
+def _run(path, options):
+    profiler = _profiler(options, path)
+    try:
+        with profiler:
+            return path, sample_file(path, options, profiler), None, profiler
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}", profiler
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    args.inputs = _expand(args.inputs)
+    _validate(parser, args)
+    if args.profile_memory and not args.profile_log:
+        args.profile = True
+    options = vars(args)
+    inputs = args.inputs
+
+    profiling = args.profile or args.profile_log or args.profile_memory
+    if args.profile_log:
+        _log_to(args.profile_log)
+
+    if args.from_state:
+        profiler = _profiler(options, args.from_state)
+        try:
+            with profiler:
+                lines = update_from_state(options, profiler)
+        except Exception as e:
+            print(f"{args.from_state}: {type(e).__name__}: {e}", file=sys.stderr)
+            return EXIT_FAILURE
+        print("\n".join(lines))
+        if profiling:
+            _report_profile(profiler, options)
+        return EXIT_OK
+
+    if args.sharded:
+        profiler = _profiler(options, inputs[0])
+        try:
+            with profiler:
+                output = sample_shards(inputs, options, profiler)
+        except Exception as e:
+            print(f"{len(inputs)} shards: {type(e).__name__}: {e}", file=sys.stderr)
+            return EXIT_FAILURE
+        print(f"{len(inputs)} shards -> {output}")
+        if profiling:
+            _report_profile(profiler, options)
+        return EXIT_OK
+
+    if args.workers > 1 and len(inputs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(_run, inputs, [options] * len(inputs)))
+    else:
+        results = [_run(path, options) for path in inputs]
+
+    status = EXIT_OK
+    for path, output, error, profiler in results:
+        if error is None:
+            print(f"{path} -> {output}")
+        else:
+            print(f"{path}: {error}", file=sys.stderr)
+            status = EXIT_FAILURE
+        if profiling:
+            _report_profile(profiler, options)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Compact, read-only population buffers.
+
+Apps serving several sessions keep one parsed copy of each upload in the
+process-wide cache (:mod:`pps.cache`). These helpers keep that copy small:
+numeric columns take the narrowest dtype that still holds every value
+exactly, repeated strings become categoricals and bin codes fit in int8.
+Shared arrays are marked read-only so one session cannot change what
+another one samples.
+"""
+import numpy as np
+import pandas as pd
+
+INT_DTYPES = (np.int8, np.int16, np.int32, np.int64)
+
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_SHARE = 0.5
+
+
+def smallest_int_dtype(low, high):
+    """Narrowest signed integer dtype holding every value in ``[low, high]``."""
+    for dtype in INT_DTYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def float_dtype(values):
+    """``float32`` when every value of ``values`` survives the round trip, else ``float64``."""
+    values = np.asarray(values)
+    if np.can_cast(values.dtype, np.float32, casting="safe"):
+        return np.dtype(np.float32)
+    with np.errstate(over="ignore"):
+        narrow = values.astype(np.float32)
+    if np.array_equal(narrow.astype(values.dtype), values, equal_nan=values.dtype.kind == "f"):
+        return np.dtype(np.float32)
+    return np.dtype(np.float64)
+
+
+def downcast(values):
+    """``values`` in the narrowest lossless dtype: int8 to int32, or float32.
+
+    Floats that are all whole numbers without missing values become
+    integers. Anything else is returned unchanged.
+    """
+    values = np.asarray(values)
+    if values.size == 0 or values.dtype.kind not in "iuf":
+        return values
+    if values.dtype.kind == "f":
+        if not np.isnan(values).any() and np.array_equal(values, np.trunc(values)):
+            low, high = values.min(), values.max()
+            if np.iinfo(np.int32).min <= low and high <= np.iinfo(np.int32).max:
+                return values.astype(smallest_int_dtype(low, high))
+        dtype = float_dtype(values)
+    else:
+        dtype = smallest_int_dtype(values.min(), values.max())
+        if values.dtype.kind == "u" and values.max() > np.iinfo(dtype).max:
+            return values
+    return values if dtype == values.dtype else values.astype(dtype)
+
+
+def compact_codes(codes, num_codes):
+    """Bin or stratum ``codes`` (``-1`` for none) in the narrowest integer dtype."""
+    codes = np.asarray(codes)
+    return codes.astype(smallest_int_dtype(-1, max(int(num_codes) - 1, 0)), copy=False)
+
+
+def read_only(values):
+    """``values`` as an array that cannot be written through."""
+    values = np.asarray(values)
+    if values.flags.writeable:
+        values = values.view()
+        values.flags.writeable = False
+    return values
+
+
+def compact_frame(frame):
+    """A copy of ``frame`` with narrow integer columns and categorical text columns.
+
+    Float columns keep their dtype so exported values print exactly as they
+    were read; the size column is narrowed separately by :func:`downcast`.
+    """
+    frame = frame.copy(deep=False)
+    for name in frame.columns:
+        column = frame[name]
+        if pd.api.types.is_integer_dtype(column.dtype) and not isinstance(column.dtype, pd.CategoricalDtype):
+            frame[name] = pd.to_numeric(column, downcast="integer")
+        elif (pd.api.types.is_object_dtype(column.dtype) or pd.api.types.is_string_dtype(column.dtype)) \
+                and len(column) and column.nunique() <= CATEGORY_MAX_SHARE * len(column):
+            frame[name] = column.astype("category")
+    return frame
@@ -0,0 +1,71 @@
+"""Permanent random numbers (PRNs) for coordinating samples over time.
+
+Each unit gets a uniform number derived from its key alone, so it keeps the
+same number when the population is updated, reordered or re-read. Order
+designs such as :func:`pps.designs.pareto` and
+:func:`pps.designs.sequential_poisson` then select the units with the
+smallest PRN-based ranking variables. Drawing again from an updated
+population with the same PRNs gives a positively coordinated sample (the
+largest possible overlap); shifting the PRNs with :func:`shift_prn` rotates
+units out, and a shift at least as large as the sampling fraction gives a
+negatively coordinated, nearly disjoint sample.
+"""
+import numpy as np
+import pandas as pd
+
+_UINT53 = float(1 << 53)
+
+
+def _mix64(values):
+    # SplitMix64 finalizer; uint64 arithmetic wraps around
+    values = np.asarray(values, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def _normalize_keys(keys):
+    """Keys in a dtype that does not depend on how the column was read."""
+    keys = np.asarray(keys)
+    if keys.dtype.kind in "iub":
+        return keys.astype(np.int64)
+    if keys.dtype.kind == "f":
+        if np.array_equal(keys, np.trunc(keys)) and np.abs(keys).max(initial=0) < 2 ** 63:
+            return keys.astype(np.int64)
+        return keys.astype(np.float64)
+    return keys.astype(str).astype(object)
+
+
+def permanent_random_numbers(keys, seed=0):
+    """A stable uniform number in ``(0, 1)`` for every key.
+
+    The number depends only on the key value and ``seed``: the same key
+    gets the same number in every file, whatever its row position or the
+    column's dtype (``7``, ``7.0`` and ``np.int8(7)`` agree). Keys should
+    be unique; missing keys raise ``ValueError``. Use a different ``seed``
+    for each independent survey that draws from the same frame.
+    """
+    keys = np.asarray(keys)
+    if pd.isna(keys).any():
+        raise ValueError("Key column has missing values; every unit needs a key for permanent random numbers.")
+    hashes = pd.util.hash_array(_normalize_keys(keys), categorize=False)
+    # pandas hashes integers with the same finalizer, so the seed is offset
+    # first (as SplitMix64 does) to keep it from cancelling a small key's hash
+    with np.errstate(over="ignore"):
+        salt = _mix64(np.uint64(int(seed) & 0xFFFFFFFFFFFFFFFF) + np.uint64(0x9E3779B97F4A7C15))
+    hashes = _mix64(hashes ^ salt)
+    return ((hashes >> np.uint64(11)).astype(np.float64) + 0.5) / _UINT53
+
+
+def shift_prn(prn, shift):
+    """PRNs moved by ``shift`` around the unit interval.
+
+    A shift of 0 keeps the sample positively coordinated. With order
+    designs the selected units have the smallest PRNs relative to their
+    inclusion probability, so shifting by the sampling fraction (or
+    ``k`` times it in period ``k``) rotates previous units out.
+    """
+    shifted = np.mod(np.asarray(prn, dtype=np.float64) + float(shift), 1.0)
+    # Keep the open interval: a PRN that lands exactly on 0 moves to the smallest positive float
+    return np.where(shifted > 0, shifted, np.nextafter(0.0, 1.0))
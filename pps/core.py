@@ -0,0 +1,144 @@
+"""Vectorized probability-proportional-to-size sampling on NumPy arrays."""
+import numpy as np
+
+from .alias import AliasTable
+from .compact import float_dtype
+from .designs import DESIGNS, PRN_DESIGNS
+
+
+class PPSSampler:
+    """Draw row indices with probability proportional to a weight array.
+
+    ``weights`` holds one unnormalized weight per row of the population.
+    Missing weights count as zero; rows with zero weight are never drawn.
+    Indices returned by :meth:`sample` are row positions in that array, so
+    callers only ever materialize the selected rows of their frame.
+    Weights are kept unnormalized next to their scalar ``total``, as float32
+    when given as float32 and float64 otherwise.
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights)
+        if weights.dtype != np.float32:
+            weights = weights.astype(np.float64, copy=False)
+        if weights.ndim != 1:
+            raise ValueError("Weights must be a one-dimensional array.")
+        if np.isnan(weights).any():
+            weights = np.where(np.isnan(weights), weights.dtype.type(0), weights)
+        if np.isinf(weights).any():
+            raise ValueError("Weights must be finite.")
+        if (weights < 0).any():
+            raise ValueError("Weights must not be negative.")
+        total = float(weights.sum(dtype=np.float64))
+        if total <= 0:
+            raise ValueError("Total probability is zero or invalid.")
+        self.weights = weights
+        self.total = total
+        self._eligible = None
+        self._alias_table = None
+
+    @classmethod
+    def from_sizes(cls, sizes):
+        """Automatic mode: weight each row by its size, skipping missing and non-positive sizes.
+
+        Sizes stored in a type that float32 holds exactly (e.g. a downcast
+        compact column) give float32 weights.
+        """
+        sizes = np.asarray(sizes)
+        exact = sizes.dtype.kind in "iuf" and np.can_cast(sizes.dtype, np.float32, casting="safe")
+        sizes = sizes.astype(np.float32 if exact else np.float64, copy=False)
+        return cls(np.where(sizes > 0, sizes, sizes.dtype.type(0)))
+
+    @classmethod
+    def from_bins(cls, codes, bin_weights):
+        """Custom binning mode: weight each row by the weight of its bin.
+
+        ``codes`` are bin numbers as returned by :mod:`pps.binning`; rows with
+        code ``-1`` get zero weight.
+        """
+        bin_weights = np.asarray(bin_weights, dtype=np.float64)
+        lookup = np.append(bin_weights, 0.0).astype(float_dtype(bin_weights))
+        return cls(lookup[np.asarray(codes)])
+
+    def __len__(self):
+        return self.weights.size
+
+    @property
+    def eligible(self):
+        """Positions of the rows with positive weight."""
+        if self._eligible is None:
+            self._eligible = np.flatnonzero(self.weights > 0)
+        return self._eligible
+
+    @property
+    def n_eligible(self):
+        return self.eligible.size
+
+    @property
+    def alias_table(self):
+        """Alias table for with-replacement draws, built on first use and reused."""
+        if self._alias_table is None:
+            self._alias_table = AliasTable.from_weights(self.weights)
+        return self._alias_table
+
+    @property
+    def probabilities(self):
+        """Single-draw selection probability of every row, in float64 even for float32 weights."""
+        return self.weights.astype(np.float64) / self.total
+
+    def sample(self, n, replace=False, random_state=None):
+        """Return ``n`` row indices drawn with probability proportional to weight.
+
+        With replacement, draws come from the cached :attr:`alias_table`.
+        Without replacement this is successive weighted sampling (the same
+        design as ``DataFrame.sample(weights=...)``) computed in one O(N)
+        pass with Efraimidis-Spirakis keys. Indices come back in draw order.
+        """
+        n = int(n)
+        if n < 0:
+            raise ValueError("Sample size must not be negative.")
+        rng = np.random.default_rng(random_state)
+        if replace:
+            return self.alias_table.draw(n, rng)
+        eligible = self.eligible
+        if n > eligible.size:
+            raise ValueError("Cannot take a larger sample than population when 'replace=False'")
+        if n == 0:
+            return np.empty(0, dtype=np.intp)
+        keys = np.log(rng.random(eligible.size)) / self.weights[eligible]
+        top = np.argpartition(keys, eligible.size - n)[eligible.size - n:]
+        top = top[np.argsort(-keys[top], kind="stable")]
+        return eligible[top]
+
+    def sample_design(self, n, design="systematic", random_state=None, prn=None):
+        """Draw ``n`` rows with a fixed-size piPS design from :mod:`pps.designs`.
+
+        ``prn`` holds one permanent random number per row (see
+        :mod:`pps.coordination`) and is accepted by the order designs in
+        :data:`pps.designs.PRN_DESIGNS`. Returns a
+        :class:`pps.designs.DesignSample` holding the row indices and their
+        inclusion probabilities.
+        """
+        if design not in DESIGNS:
+            raise ValueError(f"Unknown design '{design}'. Choose from: {', '.join(DESIGNS)}.")
+        if prn is None:
+            return DESIGNS[design](self.weights, n, random_state=random_state)
+        if design not in PRN_DESIGNS:
+            raise ValueError(f"Permanent random numbers need an order design: {', '.join(PRN_DESIGNS)}.")
+        return DESIGNS[design](self.weights, n, u=prn)
+
+    def take(self, frame, indices, columns=None):
+        """Materialize the sampled rows of ``frame`` with a ``probability`` column.
+
+        ``frame`` is a DataFrame or a source from :mod:`pps.sources`.
+        ``columns`` maps extra output column names to values aligned with
+        ``indices`` (e.g. the bin labels of the sampled rows).
+        """
+        if hasattr(frame, "take_rows"):
+            sample_df = frame.take_rows(indices)
+        else:
+            sample_df = frame.iloc[indices].reset_index(drop=True)
+        for name, values in (columns or {}).items():
+            sample_df[name] = values
+        sample_df["probability"] = self.weights[indices].astype(np.float64) / self.total
+        return sample_df
@@ -0,0 +1,154 @@
+"""Fixed-size without-replacement designs with inclusion probabilities proportional to size.
+
+Each design takes one unnormalized weight per row (missing and non-positive
+weights are ineligible) and returns a :class:`DesignSample`. Units whose
+size exceeds the sampling interval are taken with certainty (``pi == 1``)
+and the rest of the sample is drawn among the remaining units.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+DesignSample = namedtuple("DesignSample", ["indices", "pi"])
+DesignSample.__doc__ = """Row indices of a sample and the inclusion probability of each sampled row."""
+
+
+def _clean_weights(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return np.where(weights > 0, weights, 0.0)
+
+
+def inclusion_probabilities(weights, n):
+    """Inclusion probabilities ``pi_i = n * w_i / W`` with certainty units capped at 1.
+
+    Capping is repeated until no remaining unit exceeds 1, each time spreading
+    the remaining sample size over the remaining size total.
+    """
+    weights = _clean_weights(weights)
+    n = int(n)
+    n_eligible = int(np.count_nonzero(weights))
+    if n > n_eligible:
+        raise ValueError("Cannot take a larger sample than population when 'replace=False'")
+    pi = np.zeros_like(weights)
+    certain = np.zeros(weights.shape, dtype=bool)
+    while True:
+        remaining = ~certain
+        n_left = n - int(certain.sum())
+        total = weights[remaining].sum()
+        if n_left <= 0 or total <= 0:
+            break
+        pi[remaining] = weights[remaining] * (n_left / total)
+        over = remaining & (pi >= 1)
+        if not over.any():
+            break
+        certain |= over
+    pi[certain] = 1.0
+    return pi
+
+
+def _split_certainty(weights, n):
+    pi = inclusion_probabilities(weights, n)
+    certain = np.flatnonzero(pi >= 1)
+    return pi, certain, n - certain.size
+
+
+def systematic_pps(weights, n, random_state=None):
+    """Systematic PPS: one random start, then every unit of cumulative ``pi``.
+
+    O(N) via a cumulative sum and ``searchsorted``. The design depends on row
+    order; sort the population by a related variable beforehand for implicit
+    stratification.
+    """
+    rng = np.random.default_rng(random_state)
+    pi, certain, n_left = _split_certainty(weights, n)
+    if n_left == 0:
+        return DesignSample(certain, pi[certain])
+    rest = np.where(pi < 1, pi, 0.0)
+    cumulative = np.cumsum(rest)
+    points = rng.random() + np.arange(n_left)
+    chosen = np.searchsorted(cumulative, points, side="right")
+    chosen = np.minimum(chosen, np.flatnonzero(rest)[-1])
+    indices = np.sort(np.concatenate([certain, chosen]))
+    return DesignSample(indices, pi[indices])
+
+
+def sampford(weights, n, random_state=None, max_tries=10_000):
+    """Sampford's rejective design, which has exactly the target ``pi``.
+
+    The first unit is drawn with probability ``pi_i / n`` and the others with
+    probability proportional to ``pi_i / (1 - pi_i)``, all with replacement;
+    a draw is accepted when every unit is distinct. Each attempt is vectorized,
+    but the acceptance rate falls as the sample grows, so this suits moderate
+    sample sizes.
+    """
+    rng = np.random.default_rng(random_state)
+    pi, certain, n_left = _split_certainty(weights, n)
+    if n_left == 0:
+        return DesignSample(certain, pi[certain])
+    candidates = np.flatnonzero((pi > 0) & (pi < 1))
+    p = pi[candidates]
+    first_cdf = np.cumsum(p)
+    rest_cdf = np.cumsum(p / (1 - p))
+    for _ in range(max_tries):
+        first = np.searchsorted(first_cdf, rng.random() * first_cdf[-1], side="right")
+        others = np.searchsorted(rest_cdf, rng.random(n_left - 1) * rest_cdf[-1], side="right")
+        draw = np.minimum(np.append(others, first), candidates.size - 1)
+        if np.unique(draw).size == n_left:
+            indices = np.sort(np.concatenate([certain, candidates[draw]]))
+            return DesignSample(indices, pi[indices])
+    raise RuntimeError(f"Sampford sampling did not accept a sample within {max_tries} attempts.")
+
+
+def _order_sample(weights, n, random_state, u, ranking):
+    """Take the ``n`` units with the smallest ``ranking(u, pi)`` after the certainty units.
+
+    ``u`` holds one uniform per row, e.g. permanent random numbers from
+    :mod:`pps.coordination`; fresh uniforms are drawn when it is ``None``.
+    """
+    pi, certain, n_left = _split_certainty(weights, n)
+    if u is not None:
+        u = np.asarray(u, dtype=np.float64)
+        if u.shape != pi.shape:
+            raise ValueError(f"Expected {pi.size} random numbers, got {u.size}.")
+    if n_left == 0:
+        return DesignSample(certain, pi[certain])
+    candidates = np.flatnonzero((pi > 0) & (pi < 1))
+    if u is None:
+        u_candidates = np.random.default_rng(random_state).random(candidates.size)
+    else:
+        u_candidates = u[candidates]
+    ranks = ranking(u_candidates, pi[candidates])
+    chosen = candidates[np.argpartition(ranks, n_left - 1)[:n_left]]
+    indices = np.sort(np.concatenate([certain, chosen]))
+    return DesignSample(indices, pi[indices])
+
+
+def pareto(weights, n, random_state=None, u=None):
+    """Pareto piPS: take the ``n`` units with the smallest ranking variables.
+
+    ``Q_i = [u_i / (1 - u_i)] / [pi_i / (1 - pi_i)]`` with ``u_i`` uniform. The
+    realized inclusion probabilities are very close to the target ``pi``.
+    Pass ``u`` to supply the uniforms yourself (e.g. permanent random numbers).
+    """
+    return _order_sample(weights, n, random_state, u, lambda u, lam: (u / (1 - u)) / (lam / (1 - lam)))
+
+
+def sequential_poisson(weights, n, random_state=None, u=None):
+    """Sequential Poisson piPS: take the ``n`` units with the smallest ``u_i / pi_i``.
+
+    Ohlsson's design, simpler than :func:`pareto` and slightly further from
+    the target ``pi`` for large sampling fractions. Pass ``u`` to supply the
+    uniforms yourself (e.g. permanent random numbers).
+    """
+    return _order_sample(weights, n, random_state, u, lambda u, lam: u / lam)
+
+
+DESIGNS = {
+    "systematic": systematic_pps,
+    "sampford": sampford,
+    "pareto": pareto,
+    "sequential_poisson": sequential_poisson,
+}
+
+# Order designs that accept permanent random numbers through ``u``
+PRN_DESIGNS = ("pareto", "sequential_poisson")
@@ -0,0 +1,164 @@
+"""Checks of a drawn PPS sample against its design.
+
+:func:`diagnose` compares the realized sample with what the design expects:
+counts per bin label against the sum of the inclusion probabilities ``pi``
+in each bin, ``sum(pi)`` against ``n``, whether every certainty unit
+(``pi == 1``) was taken, the share of the size total the sample covers and
+Kish's effective sample size of the design weights ``1 / pi``. Optionally a
+batch of fast replicate draws (:func:`pps.replicates.generate_replicates`)
+gives empirical inclusion frequencies to hold against ``pi``.
+
+Everything is a handful of ``np.bincount`` calls over the population, so
+millions of rows take seconds; the replicates dominate. Successive draws
+without replacement only approximate the ``pi`` of a strict piPS design,
+especially for large units, and the Monte Carlo columns show by how much.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .core import PPSSampler
+from .designs import inclusion_probabilities
+from .replicates import generate_replicates
+
+DEFAULT_REPLICATES = 200
+
+# Units are grouped into this many classes of increasing pi when no bins are given
+PI_GROUPS = 10
+
+SampleDiagnostics = namedtuple("SampleDiagnostics", ["summary", "bins"])
+SampleDiagnostics.__doc__ = """Result of :func:`diagnose`.
+
+``summary`` holds the sample-level figures. ``bins`` has one row per bin
+label (or per class of ``pi`` without bins): population and eligible rows,
+size share, ``expected`` and ``realized`` sampled rows with their difference
+and z-score, and with replicates the mean realized count ``mc_mean`` over
+the replicate draws and its z-score ``mc_z`` (missing where the count is
+the same in every replicate, as for a bin of certainty units).
+"""
+
+
+def _groups(expected, eligible, codes, labels):
+    """Group number of every unit and the group labels; bins sharing a label form one group."""
+    if codes is not None:
+        codes = np.asarray(codes)
+        labels = [str(label) for label in labels] + ["(no bin)"]
+        codes = np.where(codes < 0, len(labels) - 1, codes)
+    else:
+        # Equal-count classes of increasing pi among eligible units
+        num_groups = max(1, min(PI_GROUPS, eligible.size))
+        order = eligible[np.argsort(expected[eligible], kind="stable")]
+        ranked = np.arange(order.size) * num_groups // max(order.size, 1)
+        codes = np.full(expected.size, num_groups, dtype=np.intp)
+        codes[order] = ranked
+        labels = [f"pi {expected[order[ranked == g]].min():.3g}–{expected[order[ranked == g]].max():.3g}"
+                  for g in range(num_groups)] + ["(ineligible)"]
+    label_ids, unique_labels = pd.factorize(pd.Series(labels))
+    return label_ids[codes], list(unique_labels)
+
+
+def diagnose(weights, indices, n=None, codes=None, labels=None, sizes=None, replace=False, design=None,
+             replicates=DEFAULT_REPLICATES, random_state=None, workers=None, progress=None):
+    """Diagnostics of the sample ``indices`` drawn with ``weights`` (an array or :class:`pps.core.PPSSampler`).
+
+    ``n`` is the sample size (default: the number of indices). ``codes`` and
+    ``labels`` are the bins from :mod:`pps.binning`; bins sharing a label are
+    reported together. ``sizes`` measures coverage (default: the weights).
+    ``replace`` and ``design`` describe how the sample was drawn, as in
+    :meth:`pps.core.PPSSampler.sample` and :meth:`~pps.core.PPSSampler.sample_design`;
+    with replacement ``pi`` is the expected number of draws of a unit.
+    ``replicates`` extra samples are drawn with ``random_state`` on
+    ``workers`` processes for the Monte Carlo check (0 skips it), reporting
+    to ``progress`` as in :func:`pps.replicates.generate_replicates`.
+    """
+    sampler = weights if isinstance(weights, PPSSampler) else PPSSampler(weights)
+    w = sampler.weights.astype(np.float64, copy=False)
+    indices = np.asarray(indices, dtype=np.intp)
+    n = indices.size if n is None else int(n)
+    eligible = np.flatnonzero(w > 0)
+    if replace:
+        p = w / sampler.total
+        expected = n * p
+        variance = n * p * (1 - p)
+        sampled = indices
+        design_weights = 1 / expected[indices]
+    else:
+        expected = inclusion_probabilities(w, n)
+        variance = expected * (1 - expected)
+        sampled = np.unique(indices)
+        design_weights = 1 / expected[sampled]
+    sizes = w if sizes is None else np.where(w > 0, np.nan_to_num(np.asarray(sizes, dtype=np.float64)), 0.0)
+    certain = np.flatnonzero(expected >= 1) if not replace else np.empty(0, dtype=np.intp)
+
+    groups, group_labels = _groups(expected, eligible, codes, labels)
+    num_groups = len(group_labels)
+    table = pd.DataFrame({
+        "bin_label": group_labels,
+        "rows": np.bincount(groups, minlength=num_groups),
+        "eligible": np.bincount(groups[eligible], minlength=num_groups),
+        "size_share": np.bincount(groups, w, minlength=num_groups) / sampler.total,
+        "expected": np.bincount(groups, expected, minlength=num_groups),
+        "variance": np.bincount(groups, variance, minlength=num_groups),
+        "realized": np.bincount(groups[sampled], minlength=num_groups),
+    })
+    summary = {
+        "design": design or ("with-replacement" if replace else "successive"),
+        "population_rows": int(w.size),
+        "eligible_rows": int(eligible.size),
+        "sample_size": n,
+        "rows_drawn": int(indices.size),
+        "distinct_rows": int(np.unique(indices).size),
+        "sum_pi": float(expected.sum()),
+        "certainty_units": int(certain.size),
+        "certainty_sampled": int(np.isin(certain, sampled).sum()),
+        "size_coverage": float(sizes[np.unique(sampled)].sum() / sizes.sum()) if sizes.sum() > 0 else 0.0,
+        "effective_sample_size": float(design_weights.sum() ** 2 / (design_weights ** 2).sum())
+        if design_weights.size else 0.0,
+    }
+
+    if replicates:
+        draws = generate_replicates(sampler, n, replicates, seed=random_state, replace=replace, design=design,
+                                    workers=workers, progress=progress)
+        rows = draws["row_id"].to_numpy()
+        replicate_ids = draws["replicate_id"].to_numpy()
+        frequency = np.bincount(rows, minlength=w.size) / replicates
+        per_replicate = np.bincount(replicate_ids * num_groups + groups[rows],
+                                    minlength=replicates * num_groups).reshape(replicates, num_groups)
+        table["mc_mean"] = per_replicate.mean(axis=0)
+        standard_error = per_replicate.std(axis=0, ddof=1) / np.sqrt(replicates) if replicates > 1 else np.nan
+        # A count that never varies has no standard error, and no z-score rather than an infinite one
+        standard_error = np.where(standard_error > 0, standard_error, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            table["mc_z"] = (table["mc_mean"] - table["expected"]) / standard_error
+            unit_error = np.abs(frequency - expected)[eligible]
+            outside = unit_error > 3 * np.sqrt(variance[eligible] / replicates) + 1 / replicates
+        summary["replicates"] = int(replicates)
+        summary["mc_max_abs_error"] = float(unit_error.max()) if unit_error.size else 0.0
+        summary["mc_share_outside_3se"] = float(outside.mean()) if outside.size else 0.0
+
+    table = table[(table["rows"] > 0) | (table["realized"] > 0)].copy()
+    table["difference"] = table["realized"] - table["expected"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        table["z"] = table["difference"] / np.sqrt(table.pop("variance"))
+    columns = ["bin_label", "rows", "eligible", "size_share", "expected", "realized", "difference", "z"]
+    if replicates:
+        columns += ["mc_mean", "mc_z"]
+    return SampleDiagnostics(summary, table[columns].reset_index(drop=True))
+
+
+def format_diagnostics(diagnostics):
+    """The summary lines followed by the per-bin table, for terminals."""
+    s = diagnostics.summary
+    lines = [
+        f"Design {s['design']}: {s['rows_drawn']} rows drawn ({s['distinct_rows']} distinct) "
+        f"from {s['eligible_rows']} eligible of {s['population_rows']}",
+        f"Sum of pi {s['sum_pi']:.4f} for n = {s['sample_size']}; "
+        f"{s['certainty_sampled']} of {s['certainty_units']} certainty units sampled",
+        f"Size coverage {s['size_coverage']:.2%}; effective sample size {s['effective_sample_size']:.1f}",
+    ]
+    if "replicates" in s:
+        lines.append(f"Monte Carlo over {s['replicates']} replicates: largest inclusion error "
+                     f"{s['mc_max_abs_error']:.4f}, {s['mc_share_outside_3se']:.2%} of units outside 3 SE")
+    lines.append(diagnostics.bins.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    return "\n".join(lines)
@@ -0,0 +1,234 @@
+"""Design-based estimates of totals, means and ratios from a drawn sample.
+
+Totals are Horvitz–Thompson (``sum(y / pi)``) when inclusion probabilities
+are known, or Hansen–Hurwitz (``sum(y / (n * p))``) from single-draw
+probabilities ``p``. Means (Hájek) and ratios are ratios of estimated
+totals. Every sum is one ``np.bincount`` over (stratum, domain) cells, so
+estimates for all bin labels come out of a single pass over the sample.
+
+Design variances use the with-replacement formula for Hansen–Hurwitz and
+Deville's approximation, which needs no joint inclusion probabilities, for
+Horvitz–Thompson; means and ratios are linearized. Alternatively a
+delete-one or random-group jackknife is computed within strata.
+"""
+import numpy as np
+import pandas as pd
+
+VARIANCE_METHODS = ("design", "jackknife")
+
+
+def _values(sample, key):
+    """``key`` as an array: a column name of ``sample`` or already the values."""
+    if not isinstance(key, str):
+        return np.asarray(key)
+    if isinstance(sample, pd.DataFrame):
+        return sample[key].to_numpy()
+    return sample.column(key)
+
+
+def _numeric(sample, key):
+    values = _values(sample, key).astype(np.float64)
+    if np.isnan(values).any():
+        raise ValueError(f"Column '{key}' has missing values." if isinstance(key, str) else "Values have missing entries.")
+    return values
+
+
+def _factorize(values, m, name):
+    if values is None:
+        return np.zeros(m, dtype=np.intp), pd.Index(["All"], name=name)
+    codes, uniques = pd.factorize(values, sort=True)
+    if codes.size != m:
+        raise ValueError(f"Expected {m} {name} values, got {codes.size}.")
+    return codes, pd.Index(uniques, name=name)
+
+
+def _weights(sample, pi, probability, strata, num_strata):
+    """Expansion weights ``1 / pi`` or ``1 / (n_h * p)`` per sampled row."""
+    if (pi is None) == (probability is None):
+        raise ValueError("Pass exactly one of 'pi' (Horvitz–Thompson) or 'probability' (Hansen–Hurwitz).")
+    if pi is not None:
+        pi = _numeric(sample, pi)
+        if np.any((pi <= 0) | (pi > 1)):
+            raise ValueError("Inclusion probabilities must be in (0, 1].")
+        return 1.0 / pi, pi
+    p = _numeric(sample, probability)
+    if np.any(p <= 0):
+        raise ValueError("Draw probabilities must be positive.")
+    n_h = np.bincount(strata, minlength=num_strata)
+    return 1.0 / (n_h[strata] * p), None
+
+
+def _cell_sums(cells, values, size):
+    return np.bincount(cells, weights=values, minlength=size)
+
+
+def _design_variance(e, strata, domains, num_strata, num_domains, pi):
+    """Variance of the estimated domain totals of the expanded values ``e``.
+
+    ``e`` is ``w * z`` per row and column; rows outside a domain must already
+    be zero in that domain's linearized variable, so each domain total
+    behaves like a total over the whole sample.
+    """
+    cells = strata * num_domains + domains
+    size = num_strata * num_domains
+    out = np.empty((num_domains, e.shape[1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if pi is None:
+            n_h = np.bincount(strata, minlength=num_strata)[:, None]
+            for j in range(e.shape[1]):
+                t = _cell_sums(cells, e[:, j], size).reshape(num_strata, num_domains)
+                s2 = _cell_sums(cells, e[:, j] ** 2, size).reshape(num_strata, num_domains)
+                # A stratum with a single draw leaves only the domains it touches inestimable
+                out[:, j] = np.sum(np.where(s2 > 0, (n_h * s2 - t ** 2) / (n_h - 1), 0.0), axis=0)
+        else:
+            f = 1.0 - pi
+            d = np.bincount(strata, weights=f, minlength=num_strata)
+            c = (1.0 / (1.0 - np.bincount(strata, weights=f ** 2, minlength=num_strata) / d ** 2))[:, None]
+            d = d[:, None]
+            for j in range(e.shape[1]):
+                b = _cell_sums(cells, f * e[:, j], size).reshape(num_strata, num_domains)
+                q = _cell_sums(cells, f * e[:, j] ** 2, size).reshape(num_strata, num_domains)
+                out[:, j] = np.sum(np.where(q > 0, c * (q - b ** 2 / d), 0.0), axis=0)
+    return out
+
+
+def _jackknife_groups(strata, num_strata, groups, rng):
+    """Jackknife group of every row (numbered across strata), the stratum of each group and its group count."""
+    if groups is None:
+        order = np.argsort(strata, kind="stable")
+        replicate = np.empty(strata.size, dtype=np.intp)
+        replicate[order] = np.arange(strata.size)
+        replicate_stratum = strata[order]
+        g_h = np.bincount(strata, minlength=num_strata)
+        return replicate, replicate_stratum, g_h[replicate_stratum]
+    groups = int(groups)
+    if groups < 2:
+        raise ValueError("Jackknife needs at least 2 groups.")
+    # Random equal-sized groups within each stratum
+    order = np.lexsort((rng.random(strata.size), strata))
+    n_h = np.bincount(strata, minlength=num_strata)
+    g_h = np.minimum(groups, n_h)
+    starts = np.concatenate([[0], np.cumsum(n_h)[:-1]])
+    rank = np.arange(strata.size) - starts[strata[order]]
+    local = rank * g_h[strata[order]] // n_h[strata[order]]
+    group_starts = np.concatenate([[0], np.cumsum(g_h)[:-1]])
+    replicate = np.empty(strata.size, dtype=np.intp)
+    replicate[order] = group_starts[strata[order]] + local
+    replicate_stratum = np.repeat(np.arange(num_strata), g_h)
+    return replicate, replicate_stratum, g_h[replicate_stratum]
+
+
+def _replicate_totals(e, strata, domains, replicate, replicate_stratum, g, num_strata, num_domains):
+    """Domain totals of ``e`` with each jackknife group left out, shape ``(replicates, domains)``."""
+    num_replicates = replicate_stratum.size
+    total = _cell_sums(domains, e, num_domains)
+    by_stratum = _cell_sums(strata * num_domains + domains, e, num_strata * num_domains).reshape(num_strata, num_domains)
+    left_out = _cell_sums(replicate * num_domains + domains, e, num_replicates * num_domains).reshape(num_replicates, num_domains)
+    g = g[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dropped = total + (by_stratum[replicate_stratum] - g * left_out) / (g - 1)
+    return np.where((g > 1) | (by_stratum[replicate_stratum] != 0), dropped, total)
+
+
+def estimate(sample, columns, pi=None, probability=None, by=None, ratio_to=None, strata=None,
+             variance="design", jackknife_groups=None, random_state=None):
+    """Estimated totals, means and optionally ratios of ``columns`` per domain.
+
+    ``sample`` is a DataFrame or a :class:`pps.export.LazySample`; ``columns``,
+    ``pi``, ``probability``, ``by``, ``ratio_to`` and ``strata`` are column
+    names of it or arrays aligned with its rows. Give ``pi`` (inclusion
+    probabilities) for Horvitz–Thompson or ``probability`` (single-draw
+    probabilities, e.g. the ``probability`` column) for Hansen–Hurwitz; for
+    successive draws without replacement the latter is the usual
+    with-replacement approximation. ``by`` splits the estimates into
+    domains such as bin labels, ``ratio_to`` adds the ratio of each column
+    to that column, and ``strata`` marks independently sampled strata
+    (e.g. ``bin_label`` with ``stratum_probability``).
+
+    ``variance`` is ``"design"`` or ``"jackknife"``; ``jackknife_groups``
+    switches from delete-one to that many random groups per stratum.
+
+    Returns a DataFrame indexed by domain and column (by column alone
+    without ``by``) with ``n``, ``population``, ``total``, ``total_se``,
+    ``mean``, ``mean_se`` and, with ``ratio_to``, ``ratio`` and ``ratio_se``.
+    """
+    if variance not in VARIANCE_METHODS:
+        raise ValueError(f"Unknown variance method '{variance}'. Choose from: {', '.join(VARIANCE_METHODS)}.")
+    if isinstance(columns, str):
+        columns = [columns]
+    columns = list(columns)
+    if not columns:
+        raise ValueError("Select at least one column to estimate.")
+    y = np.column_stack([_numeric(sample, column) for column in columns])
+    m = y.shape[0]
+    if m == 0:
+        raise ValueError("The sample is empty.")
+
+    strata, _ = _factorize(None if strata is None else _values(sample, strata), m, "stratum")
+    num_strata = int(strata.max()) + 1
+    domains, domain_labels = _factorize(None if by is None else _values(sample, by), m, by if isinstance(by, str) else "domain")
+    num_domains = len(domain_labels)
+    # Rows without a domain label get their own cell, dropped from the results
+    domains = np.where(domains < 0, num_domains, domains)
+    cells = num_domains + 1
+
+    w, pi = _weights(sample, pi, probability, strata, num_strata)
+    x = None if ratio_to is None else _numeric(sample, ratio_to)
+
+    e_y = w[:, None] * y
+    total = np.column_stack([_cell_sums(domains, e_y[:, j], cells) for j in range(y.shape[1])])
+    population = _cell_sums(domains, w, cells)
+    x_total = None if x is None else _cell_sums(domains, w * x, cells)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = total / population[:, None]
+        ratio = None if x is None else total / x_total[:, None]
+
+    if variance == "design":
+        def linearized(theta, denominator, d_total):
+            d = np.ones(m) if denominator is None else denominator
+            with np.errstate(divide="ignore", invalid="ignore"):
+                z = (y - theta[domains] * d[:, None]) / d_total[domains][:, None]
+            return _design_variance(w[:, None] * z, strata, domains, num_strata, cells, pi)[:num_domains]
+
+        total_var = _design_variance(e_y, strata, domains, num_strata, cells, pi)[:num_domains]
+        mean_var = linearized(mean, None, population)
+        ratio_var = None if x is None else linearized(ratio, x, x_total)
+    else:
+        rng = np.random.default_rng(random_state)
+        replicate, replicate_stratum, g = _jackknife_groups(strata, num_strata, jackknife_groups, rng)
+        factor = ((g - 1) / g)[:, None]
+
+        def replicates(e):
+            return _replicate_totals(e, strata, domains, replicate, replicate_stratum, g, num_strata, cells)
+
+        def spread(replicate_estimates, full):
+            with np.errstate(invalid="ignore"):
+                return np.sum(factor * (replicate_estimates - full) ** 2, axis=0)[:num_domains]
+
+        population_r = replicates(w)
+        x_r = None if x is None else replicates(w * x)
+        total_var = np.empty((num_domains, len(columns)))
+        mean_var = np.empty_like(total_var)
+        ratio_var = None if x is None else np.empty_like(total_var)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for j in range(len(columns)):
+                total_r = replicates(e_y[:, j])
+                total_var[:, j] = spread(total_r, total[:, j])
+                mean_var[:, j] = spread(total_r / population_r, mean[:, j])
+                if x is not None:
+                    ratio_var[:, j] = spread(total_r / x_r, ratio[:, j])
+
+    results = {
+        "n": np.repeat(np.bincount(domains, minlength=cells)[:num_domains], len(columns)),
+        "population": np.repeat(population[:num_domains], len(columns)),
+        "total": total[:num_domains].ravel(),
+        "total_se": np.sqrt(np.maximum(total_var, 0.0)).ravel(),
+        "mean": mean[:num_domains].ravel(),
+        "mean_se": np.sqrt(np.maximum(mean_var, 0.0)).ravel(),
+    }
+    if x is not None:
+        results["ratio"] = ratio[:num_domains].ravel()
+        results["ratio_se"] = np.sqrt(np.maximum(ratio_var, 0.0)).ravel()
+    index = pd.MultiIndex.from_product([domain_labels, columns], names=[domain_labels.name, "column"])
+    frame = pd.DataFrame(results, index=index)
+    return frame if by is not None else frame.droplevel(0)
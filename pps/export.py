@@ -0,0 +1,171 @@
+"""Lazy, chunked export of drawn samples.
+
+A :class:`LazySample` keeps only the sampled row indices and their per-row
+extras (bin labels, inclusion probabilities). Rows are materialized chunk by
+chunk while the export is written, so the full sample frame is never held,
+and :meth:`LazySample.write` to a file never holds the encoded output either.
+A Streamlit download button reads whatever its callback returns into bytes,
+so a download from the apps holds the encoded file in memory once while it
+is served; only encoding is deferred until the button is clicked. Exports can
+be plain, gzip- or zstd-compressed CSV, Parquet, or just row indices with
+probabilities.
+"""
+import gzip
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Exports up to this size stay in memory; larger ones spill to a temporary file
+SPOOL_BYTES = 64 << 20
+
+EXPORT_FORMATS = {
+    "csv": ("csv", "text/csv"),
+    "csv.gz": ("csv.gz", "application/gzip"),
+    "csv.zst": ("csv.zst", "application/zstd"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def available_formats():
+    """Export formats whose optional dependencies are installed."""
+    formats = ["csv", "csv.gz"]
+    try:
+        import zstandard  # noqa: F401
+        formats.append("csv.zst")
+    except ImportError:
+        pass
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        pass
+    return formats
+
+
+def format_from_path(path):
+    """Export format implied by a file name (plain CSV by default)."""
+    name = str(path).lower()
+    for fmt in ("csv.gz", "csv.zst", "parquet"):
+        if name.endswith("." + fmt):
+            return fmt
+    return "csv"
+
+
+def _zstd_writer(file):
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd export requires the zstandard package (pip install zstandard).") from e
+    return zstandard.ZstdCompressor().stream_writer(file, closefd=False)
+
+
+def write_chunks(file, chunks, fmt="csv"):
+    """Write DataFrame ``chunks`` to the binary ``file`` in one of :data:`EXPORT_FORMATS`."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'. Choose from: {', '.join(EXPORT_FORMATS)}.")
+    if fmt == "parquet":
+        from .sources import _pyarrow
+        pa = _pyarrow()
+        writer = None
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pa.parquet.ParquetWriter(file, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+        return
+    if fmt == "csv.gz":
+        binary = gzip.GzipFile(fileobj=file, mode="wb")
+    elif fmt == "csv.zst":
+        binary = _zstd_writer(file)
+    else:
+        binary = file
+    text = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    for i, chunk in enumerate(chunks):
+        chunk.to_csv(text, header=i == 0, index=False)
+    text.flush()
+    text.detach()
+    if binary is not file:
+        binary.close()
+
+
+def write_frame(path, frame):
+    """Write a DataFrame to ``path`` in the format implied by its name."""
+    with open(path, "wb") as f:
+        write_chunks(f, [frame], format_from_path(path))
+
+
+class LazySample:
+    """A drawn sample that materializes its rows only when previewed or exported.
+
+    ``source`` is a DataFrame or a source from :mod:`pps.sources`, ``sampler``
+    the :class:`pps.core.PPSSampler` that drew ``indices``, and ``columns``
+    maps extra output columns to values aligned with ``indices``.
+    """
+
+    def __init__(self, source, sampler, indices, columns=None):
+        self.source = source
+        self.sampler = sampler
+        self.indices = np.asarray(indices)
+        self.columns = dict(columns or {})
+
+    def __len__(self):
+        return self.indices.size
+
+    def _take(self, start, stop, index_only=False):
+        part = self.indices[start:stop]
+        part_columns = {name: np.asarray(values)[start:stop] for name, values in self.columns.items()}
+        if index_only:
+            return pd.DataFrame({
+                "row_id": part,
+                **part_columns,
+                "probability": self.sampler.weights[part].astype(np.float64) / self.sampler.total,
+            })
+        return self.sampler.take(self.source, part, part_columns)
+
+    def head(self, n=5):
+        return self._take(0, n)
+
+    def column(self, name):
+        """Values of one output column for every sampled row, without materializing the others."""
+        if name in self.columns:
+            return np.asarray(self.columns[name])
+        if name == "probability":
+            return self.sampler.weights[self.indices].astype(np.float64) / self.sampler.total
+        if isinstance(self.source, pd.DataFrame):
+            return self.source[name].to_numpy()[self.indices]
+        return self.source.column(name)[self.indices]
+
+    def chunks(self, chunk_rows=DEFAULT_CHUNK_ROWS, index_only=False):
+        """Yield the sample as DataFrames of at most ``chunk_rows`` rows.
+
+        With ``index_only`` each chunk holds the row indices, the extra
+        columns (e.g. ``inclusion_probability``) and ``probability`` instead
+        of the full rows.
+        """
+        if len(self) == 0:
+            yield self._take(0, 0, index_only)
+        for start in range(0, len(self), chunk_rows):
+            yield self._take(start, start + chunk_rows, index_only)
+
+    def write(self, file, fmt="csv", index_only=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+        write_chunks(file, self.chunks(chunk_rows, index_only), fmt)
+
+    def export(self, fmt="csv", index_only=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+        """Encode the sample into a spooled temporary file, rewound and ready to read.
+
+        The file stays in memory up to :data:`SPOOL_BYTES`. Callers that copy
+        it into bytes, such as Streamlit's download button, hold the whole
+        encoded sample regardless.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+        self.write(spool, fmt, index_only, chunk_rows)
+        spool.seek(0)
+        return spool
@@ -0,0 +1,176 @@
+"""Size measures defined by an expression over several columns.
+
+A :class:`SizeExpression` such as ``revenue * employees``,
+``0.7 * sales + 0.3 * assets``, ``clip(revenue, 0, 1e6)`` or
+``log1p(revenue)`` is parsed once into a tree of NumPy ufunc calls and then
+evaluated over just the columns it names, so a derived size never requires
+a modified copy of the whole frame. Column names that are not identifiers
+are quoted with backticks (```net sales` * 2``). Sources cache each derived
+measure under the expression's normalized text (see
+:meth:`pps.sources.FrameSource.column`).
+"""
+import ast
+import re
+
+import numpy as np
+import pandas as pd
+
+FUNCTIONS = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log1p": np.log1p,
+    "log2": np.log2,
+    "log10": np.log10,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+    "clip": np.clip,
+    "where": np.where,
+}
+
+_BINARY = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+    ast.Mod: np.mod,
+    ast.BitAnd: np.logical_and,
+    ast.BitOr: np.logical_or,
+}
+_UNARY = {ast.USub: np.negative, ast.UAdd: np.positive, ast.Not: np.logical_not, ast.Invert: np.logical_not}
+_COMPARE = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+_BOOLEAN = {ast.And: np.logical_and, ast.Or: np.logical_or}
+
+_QUOTED = re.compile(r"`([^`]+)`")
+
+
+def _numeric(values):
+    values = np.asarray(values)
+    if values.dtype.kind in "iufb":
+        return values.astype(np.float64, copy=False)
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=np.float64)
+
+
+class SizeExpression:
+    """A parsed size expression; ``text`` is its normalized form and ``columns`` the names it reads."""
+
+    def __init__(self, text):
+        quoted = []
+
+        def placeholder(match):
+            quoted.append(match.group(1))
+            return f"__column_{len(quoted) - 1}__"
+
+        source = _QUOTED.sub(placeholder, str(text).strip())
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid size expression '{text}': {e.msg}.") from None
+        self._names = {f"__column_{i}__": name for i, name in enumerate(quoted)}
+        self._tree = tree.body
+        self.columns = []
+        self._check(self._tree)
+        normalized = ast.unparse(tree)
+        for name, column in self._names.items():
+            normalized = normalized.replace(name, f"`{column}`")
+        self.text = normalized
+
+    def __repr__(self):
+        return f"SizeExpression({self.text!r})"
+
+    def _column(self, node):
+        name = self._names.get(node.id, node.id)
+        if name not in self.columns:
+            self.columns.append(name)
+        return name
+
+    def _check(self, node):
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Only numbers are allowed as constants in size expressions, not {node.value!r}.")
+        elif isinstance(node, ast.Name):
+            self._column(node)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            self._check(node.operand)
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            for operand in [node.left] + node.comparators:
+                self._check(operand)
+        elif isinstance(node, ast.BoolOp) and type(node.op) in _BOOLEAN:
+            for value in node.values:
+                self._check(value)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+                and not node.keywords:
+            for arg in node.args:
+                self._check(arg)
+        else:
+            raise ValueError(
+                f"Unsupported syntax '{ast.unparse(node)}' in size expression. Use numbers, columns, arithmetic, "
+                f"comparisons and the functions {', '.join(FUNCTIONS)}."
+            )
+
+    def _eval(self, node, values):
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.Name):
+            return values[self._names.get(node.id, node.id)]
+        if isinstance(node, ast.BinOp):
+            return _BINARY[type(node.op)](self._eval(node.left, values), self._eval(node.right, values))
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY[type(node.op)](self._eval(node.operand, values))
+        if isinstance(node, ast.Compare):
+            operands = [self._eval(operand, values) for operand in [node.left] + node.comparators]
+            result = True
+            for op, left, right in zip(node.ops, operands, operands[1:]):
+                result = np.logical_and(result, _COMPARE[type(op)](left, right))
+            return result
+        if isinstance(node, ast.BoolOp):
+            result = self._eval(node.values[0], values)
+            for value in node.values[1:]:
+                result = _BOOLEAN[type(node.op)](result, self._eval(value, values))
+            return result
+        args = [self._eval(arg, values) for arg in node.args]
+        try:
+            return FUNCTIONS[node.func.id](*args)
+        except TypeError as e:
+            raise ValueError(f"Invalid call '{ast.unparse(node)}' in size expression: {e}") from None
+
+    def evaluate(self, column, n_rows):
+        """The measure for every row as float64; ``column(name)`` returns one column's values.
+
+        Each column is fetched once. Infinite and undefined results (e.g.
+        ``log(0)``) become missing, which sampling treats as ineligible.
+        """
+        values = {name: _numeric(column(name)) for name in self.columns}
+        with np.errstate(all="ignore"):
+            result = np.asarray(self._eval(self._tree, values), dtype=np.float64)
+        result = np.broadcast_to(result, (n_rows,)).copy() if result.ndim == 0 else result
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+    def evaluate_frame(self, frame):
+        """The measure for every row of a DataFrame, e.g. one chunk of a streamed CSV."""
+        missing = [name for name in self.columns if name not in frame.columns]
+        if missing:
+            raise ValueError(f"Column '{missing[0]}' not found.")
+        return self.evaluate(lambda name: frame[name].to_numpy(), len(frame))
+
+
+def frame_sizes(frame, column):
+    """Sizes of every row of ``frame``: the column ``column``, or the expression it holds."""
+    if column in frame.columns:
+        return _numeric(frame[column].to_numpy())
+    return SizeExpression(column).evaluate_frame(frame)
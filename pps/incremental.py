@@ -0,0 +1,294 @@
+"""Incremental re-sampling of a keyed population from delta files.
+
+An :class:`IncrementalFrame` keeps what sampling needs from a population,
+sorted by unit key: the sizes, the permanent random numbers (see
+:mod:`pps.coordination`), the bin of every unit and running totals. It is
+saved to a ``.npz`` file, so a daily refresh reads only the delta (the
+inserted, updated and deleted rows) instead of re-reading the full frame.
+
+Applying a delta updates the size total and the bin counts in time
+proportional to the delta. The sample is then redrawn with an order design
+on the stored arrays: every unit's inclusion probability depends on the new
+size total, so it is recomputed for all units, but that is one vectorized
+pass with no parsing. Because the random numbers are permanent, the redrawn
+sample is exactly the one a full re-read would give and it keeps every
+unit whose ranking is still small enough.
+"""
+import json
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .coordination import permanent_random_numbers, shift_prn
+from .designs import DESIGNS, PRN_DESIGNS
+from .expressions import SizeExpression
+from .quantiles import _report, codes_from_edges, interval_labels
+
+STATE_VERSION = 1
+
+DELTA_OPS = ("insert", "update", "delete", "upsert")
+
+DeltaSummary = namedtuple("DeltaSummary", ["inserted", "updated", "deleted"])
+DeltaSummary.__doc__ = """Number of units inserted, updated and deleted by one delta."""
+
+SampleChange = namedtuple("SampleChange", ["kept", "added", "dropped"])
+SampleChange.__doc__ = """Keys kept in, added to and dropped from the sample since the previous draw."""
+
+
+def _key_array(keys):
+    """Keys as int64 when they are whole numbers, else as fixed-width strings, so they sort and save."""
+    keys = np.asarray(keys)
+    if pd.isna(keys).any():
+        raise ValueError("Key column has missing values; every unit needs a key.")
+    if keys.dtype.kind in "iub":
+        return keys.astype(np.int64)
+    if keys.dtype.kind == "f" and np.array_equal(keys, np.trunc(keys)):
+        return keys.astype(np.int64)
+    return keys.astype(str)
+
+
+def _sizes(sizes):
+    return pd.to_numeric(pd.Series(np.asarray(sizes)), errors="coerce").to_numpy(dtype=np.float64)
+
+
+class IncrementalFrame:
+    """Sampling state of a keyed population, updated in place by :meth:`apply_delta`.
+
+    ``design`` is an order design from :data:`pps.designs.PRN_DESIGNS`;
+    ``prn_seed`` and ``prn_shift`` pick its permanent random numbers. With
+    bin ``edges`` each unit is weighted by the entry of ``bin_weights`` for
+    its bin; the outer bins are open-ended, so updated sizes beyond the
+    original range stay in the first or last bin. Without edges units are
+    weighted by size and missing or non-positive sizes are ineligible.
+    """
+
+    def __init__(self, keys, sizes, n, design="sequential_poisson", prn_seed=0, prn_shift=0.0,
+                 edges=None, bin_weights=None, labels=None, key_column="key", size_column="size"):
+        if design not in PRN_DESIGNS:
+            raise ValueError(f"Incremental sampling needs an order design: {', '.join(PRN_DESIGNS)}.")
+        keys = _key_array(keys)
+        sizes = _sizes(sizes)
+        if keys.size != sizes.size:
+            raise ValueError("Keys and sizes must have the same length.")
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        if self.keys.size > 1 and (self.keys[1:] == self.keys[:-1]).any():
+            raise ValueError("Unit keys must be unique.")
+        self.sizes = sizes[order]
+        self.n = int(n)
+        self.design = design
+        self.prn_seed = int(prn_seed)
+        self.prn_shift = float(prn_shift)
+        self.key_column = key_column
+        self.size_column = size_column
+        self.edges = None if edges is None else np.asarray(edges, dtype=np.float64)
+        if self.edges is not None:
+            num_bins = self.edges.size - 1
+            self.bin_weights = np.ones(num_bins) if bin_weights is None else np.asarray(bin_weights, dtype=np.float64)
+            if self.bin_weights.size != num_bins:
+                raise ValueError(f"Expected {num_bins} bin weights, got {self.bin_weights.size}.")
+            self.labels = list(labels) if labels is not None else interval_labels(self.edges)
+        else:
+            self.bin_weights = None
+            self.labels = None
+        self.prn = permanent_random_numbers(self.keys, self.prn_seed)
+        self.codes = self._codes(self.sizes)
+        self.sample_keys = None
+        self._recount()
+
+    def __len__(self):
+        return self.keys.size
+
+    def _codes(self, sizes):
+        if self.edges is None:
+            return None
+        return codes_from_edges(np.clip(sizes, self.edges[0], self.edges[-1]), self.edges)
+
+    def _weights(self, sizes, codes):
+        if self.edges is None:
+            return np.where(sizes > 0, sizes, 0.0)
+        return np.append(self.bin_weights, 0.0)[codes]
+
+    @property
+    def weights(self):
+        """Current weight of every unit, in key order."""
+        return self._weights(self.sizes, self.codes)
+
+    def _recount(self):
+        self.total = float(self.weights.sum())
+        if self.edges is not None:
+            inside = self.codes >= 0
+            num_bins = self.edges.size - 1
+            self.bin_count = np.bincount(self.codes[inside], minlength=num_bins).astype(np.int64)
+            self.bin_size = np.bincount(self.codes[inside], weights=np.nan_to_num(self.sizes[inside]), minlength=num_bins)
+
+    def _count(self, sizes, codes, sign):
+        self.total += sign * float(self._weights(sizes, codes).sum())
+        if self.edges is not None:
+            inside = codes >= 0
+            num_bins = self.edges.size - 1
+            self.bin_count += sign * np.bincount(codes[inside], minlength=num_bins)
+            self.bin_size += sign * np.bincount(codes[inside], weights=np.nan_to_num(sizes[inside]), minlength=num_bins)
+
+    def report(self):
+        """Count, size total and shares of every bin, kept up to date by :meth:`apply_delta`."""
+        if self.edges is None:
+            raise ValueError("This frame has no bins.")
+        return _report(self.labels, self.bin_count, self.bin_size)
+
+    def apply_delta(self, keys, sizes, ops=None):
+        """Insert, update and delete units; returns a :class:`DeltaSummary`.
+
+        ``ops`` holds one of :data:`DELTA_OPS` per row; without it every row
+        is an upsert, inserting new keys and updating known ones. When a key
+        appears several times, its last row wins. Deleting or updating an
+        unknown key, or inserting a known one, raises ``ValueError``.
+        """
+        keys = _key_array(keys)
+        if self.keys.dtype.kind == "U":
+            keys = keys.astype(str)
+        elif keys.dtype.kind == "U":
+            raise ValueError("Delta keys are text but the frame's keys are numbers.")
+        sizes = _sizes(sizes)
+        if ops is None:
+            ops = np.full(keys.size, "upsert")
+        ops = pd.Series(np.asarray(ops, dtype=str)).str.strip().str.lower().to_numpy()
+        unknown_ops = sorted(set(ops) - set(DELTA_OPS))
+        if unknown_ops:
+            raise ValueError(f"Unknown delta operations {unknown_ops}. Use: {', '.join(DELTA_OPS)}.")
+        last = ~pd.Index(keys).duplicated(keep="last")
+        keys, sizes, ops = keys[last], sizes[last], ops[last]
+
+        pos = np.searchsorted(self.keys, keys)
+        found = pos < self.keys.size
+        found[found] = self.keys[pos[found]] == keys[found]
+        for op, bad, problem in (("delete", ~found, "deletes"), ("update", ~found, "updates"), ("insert", found, "inserts")):
+            wrong = (ops == op) & bad
+            if wrong.any():
+                state = "known" if op == "insert" else "unknown"
+                raise ValueError(f"Delta {problem} {int(wrong.sum())} {state} keys, e.g. {keys[wrong][0].item()!r}.")
+
+        changed = np.flatnonzero(found)
+        old = pos[changed]
+        self._count(self.sizes[old], self._codes(self.sizes[old]), -1)
+        updates = changed[ops[changed] != "delete"]
+        self.sizes[pos[updates]] = sizes[updates]
+        if self.codes is not None:
+            self.codes[pos[updates]] = self._codes(sizes[updates])
+        self._count(sizes[updates], self._codes(sizes[updates]), +1)
+
+        deleted = pos[found & (ops == "delete")]
+        if deleted.size:
+            keep = np.ones(self.keys.size, dtype=bool)
+            keep[deleted] = False
+            self._take(keep)
+
+        inserted = np.flatnonzero(~found)
+        if inserted.size:
+            new_keys = keys[inserted]
+            order = np.argsort(new_keys, kind="stable")
+            new_keys, new_sizes = new_keys[order], sizes[inserted][order]
+            new_codes = self._codes(new_sizes)
+            at = np.searchsorted(self.keys, new_keys)
+            if self.keys.dtype.kind == "U" and new_keys.dtype.itemsize > self.keys.dtype.itemsize:
+                self.keys = self.keys.astype(new_keys.dtype)
+            self.keys = np.insert(self.keys, at, new_keys)
+            self.sizes = np.insert(self.sizes, at, new_sizes)
+            self.prn = np.insert(self.prn, at, permanent_random_numbers(new_keys, self.prn_seed))
+            if self.codes is not None:
+                self.codes = np.insert(self.codes, at, new_codes)
+            self._count(new_sizes, new_codes, +1)
+        return DeltaSummary(int(inserted.size), int(updates.size), int(deleted.size))
+
+    def _take(self, mask):
+        self.keys = self.keys[mask]
+        self.sizes = self.sizes[mask]
+        self.prn = self.prn[mask]
+        if self.codes is not None:
+            self.codes = self.codes[mask]
+
+    def draw(self, n=None):
+        """Draw the sample of the current frame; returns ``(DesignSample, SampleChange)``.
+
+        ``n`` changes the sample size for this and later draws. The change
+        compares the sampled keys with the previous draw, if any.
+        """
+        if n is not None:
+            self.n = int(n)
+        result = DESIGNS[self.design](self.weights, self.n, u=shift_prn(self.prn, self.prn_shift))
+        sample_keys = self.keys[result.indices]
+        previous = self.sample_keys if self.sample_keys is not None else sample_keys[:0]
+        change = SampleChange(
+            sample_keys[np.isin(sample_keys, previous)],
+            sample_keys[~np.isin(sample_keys, previous)],
+            previous[~np.isin(previous, sample_keys)],
+        )
+        self.sample_keys = sample_keys
+        return result, change
+
+    def sample_frame(self, result):
+        """Keys, sizes, bin labels and inclusion probabilities of a drawn sample."""
+        frame = pd.DataFrame({
+            self.key_column: self.keys[result.indices],
+            self.size_column: self.sizes[result.indices],
+        })
+        if self.codes is not None:
+            frame["bin_label"] = np.array(self.labels + [None], dtype=object)[self.codes[result.indices]]
+        frame["inclusion_probability"] = result.pi
+        return frame
+
+    def save(self, path):
+        """Write the state to an ``.npz`` file readable by :meth:`load`."""
+        meta = {
+            "version": STATE_VERSION,
+            "n": self.n,
+            "design": self.design,
+            "prn_seed": self.prn_seed,
+            "prn_shift": self.prn_shift,
+            "labels": self.labels,
+            "key_column": self.key_column,
+            "size_column": self.size_column,
+        }
+        arrays = {"keys": self.keys, "sizes": self.sizes, "prn": self.prn, "total": np.float64(self.total)}
+        if self.edges is not None:
+            arrays.update(edges=self.edges, bin_weights=self.bin_weights, codes=self.codes,
+                          bin_count=self.bin_count, bin_size=self.bin_size)
+        if self.sample_keys is not None:
+            arrays["sample_keys"] = self.sample_keys
+        with open(path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Read a state written by :meth:`save`, with its totals, without rehashing the keys."""
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != STATE_VERSION:
+                raise ValueError(f"Unsupported incremental state version {meta.get('version')!r}.")
+            frame = cls.__new__(cls)
+            frame.keys = data["keys"]
+            frame.sizes = data["sizes"]
+            frame.prn = data["prn"]
+            frame.edges = data["edges"] if "edges" in data else None
+            frame.bin_weights = data["bin_weights"] if "bin_weights" in data else None
+            frame.codes = data["codes"] if "codes" in data else None
+            frame.sample_keys = data["sample_keys"] if "sample_keys" in data else None
+            frame.total = float(data["total"])
+            if frame.edges is not None:
+                frame.bin_count = data["bin_count"]
+                frame.bin_size = data["bin_size"]
+        for name in ("n", "design", "prn_seed", "prn_shift", "labels", "key_column", "size_column"):
+            setattr(frame, name, meta[name])
+        return frame
+
+
+def read_delta(source, key_column, size_column, op_column="op"):
+    """Keys, sizes and operations (``None`` without an ``op_column``) of a delta source from :mod:`pps.sources`."""
+    # A size expression needs the columns it names rather than a column of its own
+    sizes_from = [size_column] if size_column in source.columns else SizeExpression(size_column).columns
+    for name in [key_column] + sizes_from:
+        if name not in source.columns:
+            raise ValueError(f"Delta has no '{name}' column.")
+    ops = source.column(op_column) if op_column in source.columns else None
+    return source.column(key_column), source.column(size_column), ops
@@ -0,0 +1,138 @@
+"""Background jobs shared by every session of a server process.
+
+Long setup and sampling work runs on one process-wide thread pool, so a
+Streamlit script can submit it, return straight away and poll the job's
+progress on later reruns. The pool size caps how many jobs run at once
+across all sessions (``PPS_MAX_JOBS``, default the number of CPUs); further
+jobs wait in the queue. NumPy releases the GIL for the heavy array work, so
+threads are enough to keep the UI responsive. A job that starts worker
+processes of its own takes :func:`job_processes` of them, its share of the
+CPUs, so the running jobs together never start more processes than there
+are CPUs.
+
+A job function is called with a ``progress(fraction, message=None)``
+callback as its ``progress`` keyword argument. Cancellation is cooperative: once :meth:`Job.cancel`
+has been called, the next ``progress`` call raises :class:`JobCancelled`.
+"""
+import os
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    """Raised inside a job whose cancellation was requested."""
+
+
+def _max_jobs():
+    return int(os.environ.get("PPS_MAX_JOBS", 0)) or os.cpu_count() or 1
+
+
+class Job:
+    """Handle on a submitted job: its status, progress, message and result."""
+
+    def __init__(self):
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker"
+        self.error = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    def report(self, fraction, message=None):
+        """Progress callback handed to the job function."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.progress = min(max(float(fraction), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def cancel(self):
+        """Ask the job to stop; a job still in the queue never starts."""
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.status = CANCELLED
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def result(self, timeout=None):
+        """The job function's return value; re-raises its exception."""
+        try:
+            return self._future.result(timeout)
+        except (CancelledError, JobCancelled):
+            raise JobCancelled() from None
+
+    def _run(self, func, args, kwargs):
+        if self._cancel.is_set():
+            self.status = CANCELLED
+            raise JobCancelled()
+        self.status = RUNNING
+        self.message = "Running"
+        try:
+            value = func(*args, progress=self.report, **kwargs)
+        except JobCancelled:
+            self.status = CANCELLED
+            raise
+        except Exception as e:
+            self.error = e
+            self.status = FAILED
+            raise
+        self.progress = 1.0
+        self.status = DONE
+        return value
+
+
+class JobManager:
+    """Thread pool running at most ``max_workers`` jobs at a time."""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or _max_jobs()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="pps-job")
+        self._jobs = set()
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        """Number of jobs queued or running."""
+        with self._lock:
+            self._jobs = {job for job in self._jobs if not job.done}
+            return len(self._jobs)
+
+    def submit(self, func, *args, **kwargs):
+        """Run ``func(*args, progress=..., **kwargs)`` in the background and return its :class:`Job`."""
+        job = Job()
+        with self._lock:
+            self._jobs.add(job)
+        job._future = self._executor.submit(job._run, func, args, kwargs)
+        return job
+
+    def shutdown(self, cancel=True):
+        if cancel:
+            with self._lock:
+                for job in self._jobs:
+                    job.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+default_manager = JobManager()
+
+
+def submit_job(func, *args, **kwargs):
+    """Submit a job to the process-wide :class:`JobManager`."""
+    return default_manager.submit(func, *args, **kwargs)
+
+
+def job_processes():
+    """Worker processes one job of the process-wide :class:`JobManager` may start (at least 1).
+
+    The CPUs are split evenly between the jobs that can run at once, so with
+    the default ``PPS_MAX_JOBS`` every job draws in its own thread.
+    """
+    return max(1, (os.cpu_count() or 1) // default_manager.max_workers)
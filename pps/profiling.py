@@ -0,0 +1,165 @@
+"""Stage timers and peak-memory tracking for the sampling pipeline.
+
+A :class:`Profiler` records the wall time, CPU time and optionally the
+peak traced memory of named stages such as reading, binning, weighting,
+drawing and writing. Each stage is tagged ``"io"`` or ``"compute"``, so a
+report tells whether a slow run waits on files or on NumPy; a stage whose
+CPU time is far below its wall time is waiting too. Stages can be logged as
+one JSON object per line to the ``pps.profile`` logger; the logger has no
+handler of its own, so call :func:`configure_logging` (or configure
+:mod:`logging`) to see the records.
+
+Memory tracking uses :mod:`tracemalloc`, which sees NumPy and pandas
+buffers but slows allocation-heavy stages down, so it is off by default.
+It is process-wide: stages profiled at the same time in other threads share
+one peak.
+"""
+import json
+import logging
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+
+import pandas as pd
+
+LOGGER = logging.getLogger("pps.profile")
+
+_handler = None
+
+STAGE_KINDS = ("io", "compute")
+
+StageTiming = namedtuple("StageTiming", ["stage", "kind", "seconds", "cpu_seconds", "peak_bytes"])
+StageTiming.__doc__ = """One timed stage.
+
+``peak_bytes`` is the most memory the stage held above what was in use when
+it started, or ``None`` without memory tracking.
+"""
+
+
+def configure_logging(stream=None, level=logging.INFO):
+    """Write :data:`LOGGER` records at ``level`` and above to ``stream`` (default: stderr), one per line.
+
+    The handler is added once per process, so scripts that run again and
+    again, such as Streamlit apps, can call this on every run.
+    """
+    global _handler
+    if _handler is None:
+        _handler = logging.StreamHandler(stream)
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+        LOGGER.addHandler(_handler)
+    LOGGER.setLevel(level)
+    return _handler
+
+
+class Profiler:
+    """Collects :class:`StageTiming` records from :meth:`stage` blocks.
+
+    With ``memory`` each stage also records the peak memory traced while it
+    ran. With ``log`` each finished stage is written to :data:`LOGGER` as a
+    JSON object, merged with the ``context`` fields (e.g. the input file).
+    """
+
+    def __init__(self, memory=False, log=False, **context):
+        self.memory = memory
+        self.log = log
+        self.context = context
+        self.stages = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stop :mod:`tracemalloc` if this profiler started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def reset(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, kind="compute"):
+        """Time the enclosed block as stage ``name`` of ``kind`` ``"io"`` or ``"compute"``."""
+        if kind not in STAGE_KINDS:
+            raise ValueError(f"Unknown stage kind '{kind}'. Choose from: {', '.join(STAGE_KINDS)}.")
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - cpu_start
+            peak = tracemalloc.get_traced_memory()[1] - base if self.memory and tracemalloc.is_tracing() else None
+            timing = StageTiming(name, kind, seconds, cpu_seconds, peak)
+            self.stages.append(timing)
+            if self.log:
+                LOGGER.info(json.dumps(self._record(timing)))
+
+    def _record(self, timing):
+        return {"event": "stage", **self.context, **timing._asdict()}
+
+    def emit(self):
+        """Write every recorded stage and the :meth:`summary` to :data:`LOGGER`, e.g. after a run in another process."""
+        for timing in self.stages:
+            LOGGER.info(json.dumps(self._record(timing)))
+        self.log_summary()
+
+    def report(self):
+        """Stages summed by name in first-seen order, with their share of the total time.
+
+        ``peak_mb`` is the largest peak of the stage's runs.
+        """
+        if not self.stages:
+            return pd.DataFrame(columns=["stage", "kind", "seconds", "cpu_seconds", "share", "peak_mb"])
+        frame = pd.DataFrame(self.stages, columns=StageTiming._fields)
+        report = frame.groupby(["stage", "kind"], sort=False).agg(
+            seconds=("seconds", "sum"),
+            cpu_seconds=("cpu_seconds", "sum"),
+            peak_bytes=("peak_bytes", "max"),
+        ).reset_index()
+        total = report["seconds"].sum()
+        report["share"] = report["seconds"] / total if total > 0 else 0.0
+        report["peak_mb"] = report.pop("peak_bytes") / 2 ** 20
+        return report[["stage", "kind", "seconds", "cpu_seconds", "share", "peak_mb"]]
+
+    def summary(self):
+        """Total, I/O and compute seconds, the overall peak and which kind dominates."""
+        seconds = {kind: sum(s.seconds for s in self.stages if s.kind == kind) for kind in STAGE_KINDS}
+        peaks = [s.peak_bytes for s in self.stages if s.peak_bytes is not None]
+        total = sum(seconds.values())
+        return {
+            "seconds": total,
+            "io_seconds": seconds["io"],
+            "compute_seconds": seconds["compute"],
+            "peak_bytes": max(peaks) if peaks else None,
+            "bound": None if total == 0 else ("io" if seconds["io"] >= seconds["compute"] else "compute"),
+        }
+
+    def log_summary(self):
+        """Write :meth:`summary` to :data:`LOGGER` as one JSON object."""
+        LOGGER.info(json.dumps({"event": "summary", **self.context, **self.summary()}))
+
+    def format(self):
+        """The report as a plain-text table followed by the summary line, for terminals."""
+        report = self.report()
+        if report.empty:
+            return "No stages timed."
+        if report["peak_mb"].isna().all():
+            report = report.drop(columns="peak_mb")
+        summary = self.summary()
+        lines = [
+            report.to_string(index=False, float_format=lambda x: f"{x:.3f}"),
+            f"Total {summary['seconds']:.3f} s: {summary['io_seconds']:.3f} s I/O, "
+            f"{summary['compute_seconds']:.3f} s compute ({summary['bound']}-bound)",
+        ]
+        return "\n".join(lines)
@@ -0,0 +1,206 @@
+"""Equal-frequency cutoffs without sorting the column.
+
+The exact mode selects only the order statistics the cutoffs need with one
+``np.partition`` call, O(N) instead of the O(N log N) sort behind
+``pd.qcut``, and interpolates them exactly as ``pd.qcut`` does. The
+approximate mode feeds chunks into a :class:`KLLSketch`, whose memory stays
+at a few times ``k`` values however long the stream is, so cutoffs over a
+file that does not fit in memory take a single pass.
+"""
+import numpy as np
+import pandas as pd
+
+from .compact import compact_codes
+
+DEFAULT_K = 200
+
+# Empirical normalized rank error of a KLL sketch is about this divided by k
+RANK_ERROR_FACTOR = 1.7
+
+
+def _quantile_positions(n, num_bins):
+    num_bins = int(num_bins)
+    # Same arithmetic as pd.qcut -> Series.quantile -> np.quantile(method="linear")
+    q = np.linspace(0, 1, int(num_bins) + 1)
+    # Levels not representable in base 2 are rounded up, as pd.qcut does
+    np.putmask(q, num_bins * q != np.arange(num_bins + 1), np.nextafter(q, 1))
+    virtual = (n - 1) * q
+    below = np.floor(virtual)
+    gamma = virtual - below
+    lower = np.clip(below, 0, n - 1).astype(np.intp)
+    upper = np.clip(below + 1, 0, n - 1).astype(np.intp)
+    last = virtual >= n - 1
+    lower[last] = upper[last] = n - 1
+    return lower, upper, gamma
+
+
+def _check_edges(edges):
+    if np.unique(edges).size != edges.size:
+        raise ValueError(f"Bin edges must be unique: {edges!r}. Use fewer bins or a column with more distinct values.")
+    return edges
+
+
+def quantile_edges(values, num_bins):
+    """Exact equal-frequency bin edges, from the minimum to the maximum.
+
+    Missing values are ignored. Raises ``ValueError`` when edges repeat,
+    like ``pd.qcut``.
+    """
+    if int(num_bins) < 1:
+        raise ValueError("Number of bins must be at least 1.")
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        raise ValueError("No valid values to bin.")
+    lower, upper, gamma = _quantile_positions(values.size, num_bins)
+    selected = np.partition(values, np.unique(np.concatenate([lower, upper])))
+    a, b = selected[lower], selected[upper]
+    diff = b - a
+    edges = np.where(gamma >= 0.5, b - diff * (1 - gamma), a + diff * gamma)
+    return _check_edges(edges)
+
+
+def interval_labels(edges):
+    """``pd.cut``-style labels such as ``(0.624, 1.471]`` for consecutive ``edges``."""
+    edges = np.asarray(edges, dtype=np.float64)
+    return pd.cut(edges, bins=edges, include_lowest=True).categories.astype(str).tolist()
+
+
+def codes_from_edges(values, edges):
+    """Bin code of every value for right-closed bins, the first one closed on both sides.
+
+    Values that are missing or outside ``[edges[0], edges[-1]]`` get ``-1``.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    edges = np.asarray(edges, dtype=np.float64)
+    codes = np.searchsorted(edges[1:-1], values, side="left")
+    codes[np.isnan(values) | (values < edges[0]) | (values > edges[-1])] = -1
+    return compact_codes(codes, edges.size - 1)
+
+
+def bin_report(codes, sizes, labels):
+    """Count, size total and their shares for every bin.
+
+    ``codes`` are bin codes (``-1`` for none), ``sizes`` the size of every
+    row and ``labels`` the bin names. Missing sizes count as zero.
+    """
+    codes = np.asarray(codes)
+    sizes = np.nan_to_num(np.asarray(sizes, dtype=np.float64))
+    inside = codes >= 0
+    counts = np.bincount(codes[inside], minlength=len(labels))
+    totals = np.bincount(codes[inside], weights=sizes[inside], minlength=len(labels))
+    return _report(labels, counts, totals)
+
+
+def _report(labels, counts, totals):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return pd.DataFrame({
+            "bin": list(labels),
+            "count": counts,
+            "count_share": counts / counts.sum(),
+            "size_total": totals,
+            "size_share": totals / totals.sum(),
+        })
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang and Liberty) over a stream of chunks.
+
+    Level ``h`` holds values standing for ``2 ** h`` inputs each. A level
+    over its capacity is sorted and every other value, from a random start,
+    moves up a level; capacities shrink by 2/3 per level below the top.
+    Memory is about ``3 * k`` values and the rank error about
+    ``RANK_ERROR_FACTOR / k``; the minimum, maximum and count are exact.
+    """
+
+    def __init__(self, k=DEFAULT_K, random_state=None):
+        if int(k) < 8:
+            raise ValueError("Sketch size k must be at least 8.")
+        self.k = int(k)
+        self.count = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(random_state)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def rank_error(self):
+        return RANK_ERROR_FACTOR / self.k
+
+    def _capacity(self, level):
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self._levels) - 1 - level))))
+
+    def _compress(self):
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if items.size > self._capacity(level):
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                items = np.sort(items)
+                # An odd value out stays behind so the total weight is preserved
+                keep = items[items.size - items.size % 2:]
+                promoted = items[self._rng.integers(2):items.size - items.size % 2:2]
+                self._levels[level] = keep
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        """Add a chunk of values; missing values are skipped."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if values.size:
+            self.count += values.size
+            self.min = min(self.min, float(values.min()))
+            self.max = max(self.max, float(values.max()))
+            self._levels[0] = np.concatenate([self._levels[0], values])
+            self._compress()
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` into this sketch, e.g. sketches of different shards."""
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(level.size, 2.0 ** h) for h, level in enumerate(self._levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def quantiles(self, q):
+        """Approximate values at the quantile levels ``q``; 0 and 1 give the exact minimum and maximum."""
+        if self.count == 0:
+            raise ValueError("No valid values to bin.")
+        q = np.asarray(q, dtype=np.float64)
+        items, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        positions = np.searchsorted(cumulative, q * cumulative[-1], side="left")
+        values = items[np.minimum(positions, items.size - 1)]
+        return np.where(q <= 0, self.min, np.where(q >= 1, self.max, values))
+
+    def edges(self, num_bins):
+        """Approximate equal-frequency bin edges from the minimum to the maximum."""
+        if int(num_bins) < 1:
+            raise ValueError("Number of bins must be at least 1.")
+        return _check_edges(self.quantiles(np.linspace(0, 1, int(num_bins) + 1)))
+
+    def report(self, edges, labels=None):
+        """Estimated count, size total and shares of the bins bounded by ``edges``."""
+        items, weights = self._weighted()
+        codes = codes_from_edges(items, edges)
+        inside = codes >= 0
+        num_bins = len(edges) - 1
+        counts = np.bincount(codes[inside], weights=weights[inside], minlength=num_bins)
+        totals = np.bincount(codes[inside], weights=(weights * items)[inside], minlength=num_bins)
+        return _report(labels or interval_labels(edges), counts, totals)
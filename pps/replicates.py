@@ -0,0 +1,90 @@
+"""Independent PPS replicate samples drawn in parallel worker processes.
+
+Every replicate gets its own child of one ``numpy.random.SeedSequence``, so
+results are reproducible from a single seed and do not depend on how the
+replicates are spread over workers. Output is a long-format index matrix
+with one ``(replicate_id, row_id)`` pair per sampled row, never R copies of
+the sampled data.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .core import PPSSampler
+
+_worker_sampler = None
+
+
+def _init_worker(weights):
+    global _worker_sampler
+    _worker_sampler = PPSSampler(weights)
+
+
+def _draw(sampler, n, replace, design, seed):
+    rng = np.random.default_rng(seed)
+    if design:
+        return sampler.sample_design(n, design=design, random_state=rng).indices
+    return sampler.sample(n, replace=replace, random_state=rng)
+
+
+def _draw_batch(replicate_ids, seeds, n, replace, design, sampler=None):
+    sampler = sampler or _worker_sampler
+    rows = [_draw(sampler, n, replace, design, seed) for seed in seeds]
+    counts = [r.size for r in rows]
+    return np.repeat(np.asarray(replicate_ids, dtype=np.int32), counts), np.concatenate(rows)
+
+
+def generate_replicates(weights, n, replicates, seed=None, replace=False, design=None, workers=None, progress=None):
+    """Draw ``replicates`` independent PPS samples of size ``n``.
+
+    ``weights`` are per-row weights (or a :class:`pps.core.PPSSampler`) and
+    ``design`` optionally names a design from :mod:`pps.designs`. ``workers``
+    defaults to the number of CPUs; pass 1 to draw in the calling process.
+    ``progress(fraction, message)`` is called after every batch, e.g. the
+    callback of a :mod:`pps.jobs` job; an exception it raises stops the
+    remaining batches.
+
+    Returns a DataFrame with ``replicate_id`` and ``row_id`` columns.
+    """
+    replicates = int(replicates)
+    if replicates < 1:
+        raise ValueError("Number of replicates must be at least 1.")
+    seeds = np.random.SeedSequence(seed).spawn(replicates)
+    workers = min(workers or os.cpu_count() or 1, replicates)
+    num_batches = workers * 4 if workers > 1 else 1
+    if progress is not None:
+        # Finer batches so progress moves and cancellation takes effect quickly
+        num_batches = max(num_batches, 100)
+    batches = [b for b in np.array_split(np.arange(replicates), num_batches) if b.size]
+    results = []
+
+    def report(done):
+        if progress is not None:
+            progress(done / replicates, f"{done:,} of {replicates:,} replicates drawn")
+
+    if workers == 1:
+        sampler = weights if isinstance(weights, PPSSampler) else PPSSampler(weights)
+        for batch in batches:
+            results.append(_draw_batch(batch.tolist(), [seeds[i] for i in batch], n, replace, design, sampler))
+            report(int(batch[-1]) + 1)
+    else:
+        if isinstance(weights, PPSSampler):
+            weights = weights.weights
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(weights,))
+        try:
+            futures = [
+                pool.submit(_draw_batch, batch.tolist(), [seeds[i] for i in batch], n, replace, design)
+                for batch in batches
+            ]
+            drawn = 0
+            for future, batch in zip(futures, batches):
+                results.append(future.result())
+                drawn += batch.size
+                report(drawn)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+    replicate_ids = np.concatenate([r[0] for r in results])
+    row_ids = np.concatenate([r[1] for r in results])
+    return pd.DataFrame({"replicate_id": replicate_ids, "row_id": row_ids})
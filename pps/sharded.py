@@ -0,0 +1,227 @@
+"""PPS sampling of one population partitioned into many shard files.
+
+Shards are read in worker processes, one at a time each, and only small
+summaries and the sampled rows travel back. The sampling pass reads only the
+columns the size measure needs, and the sampled rows are fetched afterwards
+from just the shards that have any. Every shard gets its own child
+of one ``numpy.random.SeedSequence``, so results do not depend on how the
+shards are spread over workers.
+
+Without replacement each shard keeps the ``n`` rows with the largest
+Efraimidis-Spirakis keys ``log(u) / size``, as the streaming reservoir does.
+Every row's key depends on its own size only, so the ``n`` largest of the
+merged reservoirs are the ``n`` largest over the concatenated shards: the
+sample is successive PPS sampling of the whole population, exactly as if the
+shards were one file. With replacement the draws are allocated to shards
+multinomially in proportion to their size totals and drawn within each
+shard, which is again the distribution of drawing from the concatenation.
+A first pass totals the shards, and the second draws only each shard's
+allocation, so no shard holds more than its own share of the ``n`` draws.
+
+Bin edges over all shards come from per-shard :class:`pps.quantiles.KLLSketch`
+sketches merged in the parent: exact minima and maxima for equal-width and
+manual bins, approximate cutoffs for equal-frequency bins.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .binning import equal_width_edges, manual_edges
+from .core import PPSSampler
+from .expressions import frame_sizes
+from .quantiles import DEFAULT_K, KLLSketch, codes_from_edges, interval_labels
+from .sources import detect_format, open_source
+from .streaming import _size_columns, fetch_rows
+
+ShardedSample = namedtuple("ShardedSample", ["frame", "shards"])
+ShardedSample.__doc__ = """Result of :func:`sharded_sample`.
+
+``frame`` holds the sampled rows in draw order with ``shard`` (the input
+path), ``row`` (the row's position within its shard) and ``probability``
+(its single-draw probability in the whole population) columns. ``shards``
+reports every shard's rows, eligible rows, weight total, share of the total
+and number of sampled rows.
+"""
+
+
+def _map(function, workers, *iterables):
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(function, *iterables))
+    return list(map(function, *iterables))
+
+
+def _shard_sizes(path, column):
+    """Sizes of every row of one shard, reading only the columns they need."""
+    if detect_format(path) == "csv":
+        return frame_sizes(pd.read_csv(path, usecols=_size_columns(path, column)), column)
+    return open_source(path).column(column)
+
+
+def _shard_weights(path, column, edges=None, bin_weights=None):
+    """Weights of every row of one shard (its size, or the weight of its bin) and the bin codes, if binned."""
+    sizes = np.asarray(_shard_sizes(path, column), dtype=np.float64)
+    codes = None
+    if edges is not None:
+        codes = codes_from_edges(sizes, edges)
+        sizes = np.append(np.asarray(bin_weights, dtype=np.float64), 0.0)[codes]
+    if np.isinf(sizes).any():
+        raise ValueError("Weights must be finite.")
+    return np.where(sizes > 0, sizes, 0.0), codes
+
+
+def _codes_at(codes, rows):
+    return None if codes is None else np.asarray(codes)[rows]
+
+
+def _shard_sketch(path, column, k, seed):
+    sketch = KLLSketch(k, np.random.default_rng(seed))
+    return sketch.update(_shard_sizes(path, column))
+
+
+def _shard_reservoir(path, column, n, seed, edges, bin_weights):
+    """Rows, keys, weights and bin codes of the ``n`` largest keys of one shard, with its counts and total."""
+    weights, codes = _shard_weights(path, column, edges, bin_weights)
+    eligible = np.flatnonzero(weights > 0)
+    n_eligible = eligible.size
+    keys = np.log(np.random.default_rng(seed).random(n_eligible)) / weights[eligible]
+    if n_eligible > n:
+        keep = np.argpartition(keys, n_eligible - n)[n_eligible - n:] if n else np.empty(0, dtype=np.intp)
+        eligible, keys = eligible[keep], keys[keep]
+    return eligible, keys, weights[eligible], _codes_at(codes, eligible), weights.size, n_eligible, float(weights.sum())
+
+
+def _shard_total(path, column, edges, bin_weights):
+    """Rows, eligible rows and weight total of one shard."""
+    weights, _ = _shard_weights(path, column, edges, bin_weights)
+    return weights.size, int((weights > 0).sum()), float(weights.sum())
+
+
+def _shard_draw(path, column, n, seed, edges, bin_weights):
+    """Rows, weights and bin codes of ``n`` draws with replacement from one shard."""
+    weights, codes = _shard_weights(path, column, edges, bin_weights)
+    rows = PPSSampler(weights).sample(n, replace=True, random_state=np.random.default_rng(seed))
+    return rows, weights[rows], _codes_at(codes, rows)
+
+
+def _shard_rows(path, rows, column):
+    """Full rows of one shard at positions ``rows``; CSV shards are read in chunks up to the last one."""
+    if detect_format(path) == "csv":
+        frame = fetch_rows(path, rows)
+    else:
+        frame = open_source(path).take_rows(rows)
+    if column not in frame.columns:
+        # A size expression: keep the derived measure next to the rows
+        frame[column] = frame_sizes(frame, column)
+    return frame
+
+
+def shard_edges(paths, column, bins=None, cutoffs=None, quantiles=None, k=DEFAULT_K, random_state=None,
+                workers=None):
+    """Bin edges over all shards: ``bins`` equal-width bins, manual ``cutoffs`` or ``quantiles`` equal-frequency bins.
+
+    Equal-width and manual edges are exact; equal-frequency edges come from
+    the merged shard sketches and carry their rank error.
+    """
+    seeds = np.random.SeedSequence(random_state).spawn(len(paths))
+    sketch = KLLSketch(k, random_state)
+    for part in _map(_shard_sketch, workers, paths, [column] * len(paths), [k] * len(paths), seeds):
+        sketch.merge(part)
+    if sketch.count == 0:
+        raise ValueError("No valid values to bin.")
+    extent = np.array([sketch.min, sketch.max])
+    if bins is not None:
+        return equal_width_edges(extent, bins)
+    if cutoffs is not None:
+        return manual_edges(extent, cutoffs)
+    return sketch.edges(quantiles)
+
+
+def sharded_sample(paths, column, n, replace=False, random_state=None, edges=None, bin_weights=None,
+                   labels=None, bin_column=None, workers=None, index_only=False):
+    """Sample ``n`` rows PPS on ``column`` from the population split across ``paths``.
+
+    ``workers`` processes read the shards (1 or ``None`` reads them in the
+    calling process). With ``edges`` and ``bin_weights`` rows are weighted by
+    bin, and ``bin_column`` names a column for each sampled row's bin label
+    (``labels``, or the bin intervals by default). With ``index_only`` the
+    sampled rows are not fetched, and ``frame`` holds only their shard, row
+    and probability. Returns a :class:`ShardedSample`.
+    """
+    paths = list(paths)
+    n = int(n)
+    if n < 0:
+        raise ValueError("Sample size must not be negative.")
+    if not paths:
+        raise ValueError("No shards to sample.")
+    seeds = np.random.SeedSequence(random_state).spawn(len(paths) + 1)
+    shard_seeds = seeds[:-1]
+    each = [[value] * len(paths) for value in (column, edges, bin_weights)]
+
+    if replace:
+        n_rows, n_eligible, total = map(np.array, zip(*_map(_shard_total, workers, paths, *each)))
+        if total.sum() <= 0:
+            raise ValueError("Total probability is zero or invalid.")
+        rng = np.random.default_rng(seeds[-1])
+        allocation = rng.multinomial(n, total / total.sum())
+        # Only shards allocated any draws are read again, each drawing just its own share
+        drawing = np.flatnonzero(allocation)
+        same = [[value] * drawing.size for value in (column, edges, bin_weights)]
+        drawn = _map(_shard_draw, workers, [paths[i] for i in drawing], same[0], allocation[drawing],
+                     [shard_seeds[i] for i in drawing], *same[1:])
+        empty = [np.empty(0, dtype=np.intp)]
+        rows, weights, codes = zip(*drawn) if drawn else (empty, empty, empty)
+        shard_ids = np.repeat(np.arange(len(paths)), allocation)
+        rows, weights = np.concatenate(rows), np.concatenate(weights)
+        codes = None if edges is None else np.concatenate(codes)
+        # Shards were drawn one after another; shuffle so the draw order mixes them
+        order = rng.permutation(n)
+    else:
+        reservoirs = _map(_shard_reservoir, workers, paths, each[0], [n] * len(paths), shard_seeds, *each[1:])
+        rows, keys, weights, codes, n_rows, n_eligible, total = zip(*reservoirs)
+        n_rows, n_eligible, total = np.array(n_rows), np.array(n_eligible), np.array(total)
+        if n > n_eligible.sum():
+            raise ValueError("Cannot take a larger sample than population when 'replace=False'")
+        shard_ids = np.concatenate([np.full(r.size, i) for i, r in enumerate(rows)])
+        rows, keys, weights = np.concatenate(rows), np.concatenate(keys), np.concatenate(weights)
+        codes = None if edges is None else np.concatenate(codes)
+        order = np.argpartition(keys, keys.size - n)[keys.size - n:] if n else np.empty(0, dtype=np.intp)
+        order = order[np.argsort(-keys[order], kind="stable")]
+    shard_ids, rows, weights = shard_ids[order], rows[order], weights[order]
+
+    probability = weights / total.sum()
+    shards = pd.DataFrame({
+        "shard": paths,
+        "rows": n_rows,
+        "eligible": n_eligible,
+        "total": total,
+        "share": total / total.sum(),
+        "sampled": np.bincount(shard_ids, minlength=len(paths)),
+    })
+    extra_columns = {}
+    if edges is not None and bin_column is not None:
+        lookup = np.array(list(labels or interval_labels(edges)) + [None], dtype=object)
+        extra_columns[bin_column] = lookup[codes[order]]
+    if index_only:
+        frame = pd.DataFrame({"shard": np.asarray(paths, dtype=object)[shard_ids], "row": rows, **extra_columns,
+                              "probability": probability})
+        return ShardedSample(frame, shards)
+
+    # Fetch the sampled rows of each shard that has any, then restore the draw order
+    needed = np.flatnonzero(shards["sampled"].to_numpy())
+    positions = [np.flatnonzero(shard_ids == i) for i in needed]
+    parts = _map(_shard_rows, workers, [paths[i] for i in needed], [rows[p] for p in positions],
+                 [column] * needed.size)
+    if not parts:
+        frame = pd.DataFrame()
+    else:
+        frame = pd.concat(parts, ignore_index=True)
+        frame = frame.iloc[np.argsort(np.concatenate(positions), kind="stable")].reset_index(drop=True)
+    frame.insert(0, "row", rows)
+    frame.insert(0, "shard", np.asarray(paths, dtype=object)[shard_ids])
+    for name, values in extra_columns.items():
+        frame[name] = values
+    frame["probability"] = probability
+    return ShardedSample(frame, shards)
@@ -0,0 +1,244 @@
+"""Population sources with column projection.
+
+Sampling only needs the size column until the final export. CSV files have
+to be parsed in full, but Parquet, Feather and Arrow IPC files are opened by
+schema only: the size column is read on its own (memory-mapped where the
+format allows) and full rows are materialized only for the sampled indices.
+
+Both source types expose the same small interface: ``columns``,
+``numeric_columns()``, ``head(n)``, ``column(name)``, ``take_rows(indices)`` and ``len()``.
+Compact sources hand out size columns downcast to the narrowest lossless
+dtype as read-only arrays, so one cached copy can serve every session.
+
+``column`` also accepts a size expression over several columns, such as
+``revenue * employees`` or ``log1p(revenue)`` (see :mod:`pps.expressions`).
+Only the named columns are read, and the derived measure is kept per source
+under the expression's normalized text. A source calls its ``on_grow``
+callback whenever it keeps another column, so a cache holding it can count
+the new memory.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from .cache import cached, content_hash, default_cache
+from .compact import compact_frame, downcast, read_only
+from .expressions import SizeExpression
+
+COLUMNAR_FORMATS = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+}
+SUPPORTED_EXTENSIONS = ["csv", "parquet", "pq", "feather", "arrow", "ipc"]
+
+
+def detect_format(name):
+    """``"csv"``, ``"parquet"`` or ``"feather"`` (Feather v2 is the Arrow IPC file format)."""
+    ext = os.path.splitext(str(name))[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in COLUMNAR_FORMATS:
+        return COLUMNAR_FORMATS[ext]
+    raise ValueError(f"Unsupported file type '{ext}'. Supported: {', '.join(SUPPORTED_EXTENSIONS)}.")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Reading Parquet, Feather or Arrow files requires pyarrow (pip install pyarrow).") from e
+    return pyarrow
+
+
+def _derived(source, text):
+    """The size expression ``text`` evaluated over ``source``, cached read-only on the source."""
+    expression = SizeExpression(text)
+    if expression.text not in source._derived:
+        missing = [name for name in expression.columns if name not in source.columns]
+        if missing:
+            raise ValueError(f"Column '{missing[0]}' not found.")
+        _keep(source, source._derived, expression.text, read_only(expression.evaluate(source.column, len(source))))
+    return source._derived[expression.text]
+
+
+def _keep(source, store, name, values):
+    """Keep ``values`` under ``name`` in one of the source's column stores and report the growth."""
+    store[name] = values
+    if source.on_grow is not None:
+        source.on_grow()
+
+
+class FrameSource:
+    """A population already parsed into a DataFrame (CSV input)."""
+
+    def __init__(self, frame, compact=False):
+        self.frame = frame
+        self.compact = compact
+        self.on_grow = None
+        self._columns = {}
+        self._derived = {}
+
+    def __len__(self):
+        return len(self.frame)
+
+    @property
+    def columns(self):
+        return self.frame.columns.tolist()
+
+    def numeric_columns(self):
+        return self.frame.select_dtypes(include="number").columns.tolist()
+
+    def head(self, n=5):
+        return self.frame.head(n)
+
+    def column(self, name):
+        if name not in self.frame.columns:
+            return _derived(self, name)
+        if not self.compact:
+            return self.frame[name].to_numpy()
+        if name not in self._columns:
+            _keep(self, self._columns, name, read_only(downcast(self.frame[name].to_numpy())))
+        return self._columns[name]
+
+    def take_rows(self, indices):
+        return self.frame.iloc[indices].reset_index(drop=True)
+
+
+class ArrowSource:
+    """A Parquet, Feather or Arrow IPC file read one column at a time.
+
+    ``data`` is a path (memory-mapped) or the file's bytes (read zero-copy).
+    Columns read through :meth:`column` are kept for later calls.
+    """
+
+    def __init__(self, data, fmt, compact=False):
+        pa = _pyarrow()
+        self.fmt = fmt
+        self.compact = compact
+        self._data = data
+        self.on_grow = None
+        self._columns = {}
+        self._derived = {}
+        if fmt == "parquet":
+            self._parquet = pa.parquet.ParquetFile(self._input(), memory_map=isinstance(data, (str, os.PathLike)))
+            self.schema = self._parquet.schema_arrow
+            self._num_rows = self._parquet.metadata.num_rows
+        else:
+            # Arrow IPC (Feather v2): batches are read, and decompressed, only for the fields asked for
+            reader = self._ipc([])
+            self.schema = reader.schema
+            self._batch_rows = np.array([reader.get_batch(i).num_rows for i in range(reader.num_record_batches)],
+                                        dtype=np.int64)
+            self._num_rows = int(self._batch_rows.sum())
+
+    def _input(self):
+        if isinstance(self._data, (str, os.PathLike)):
+            return self._data
+        return _pyarrow().BufferReader(self._data)
+
+    def _ipc(self, fields=None):
+        pa = _pyarrow()
+        if isinstance(self._data, (str, os.PathLike)):
+            file = pa.memory_map(os.fspath(self._data))
+        else:
+            file = pa.BufferReader(self._data)
+        return pa.ipc.open_file(file, options=pa.ipc.IpcReadOptions(included_fields=fields))
+
+    def _group_rows(self):
+        if self.fmt == "parquet":
+            metadata = self._parquet.metadata
+            return np.array([metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)], dtype=np.int64)
+        return self._batch_rows
+
+    def _read_groups(self, groups):
+        """All columns of the row groups (Parquet) or record batches (IPC) numbered ``groups``."""
+        if self.fmt == "parquet":
+            return self._parquet.read_row_groups(groups)
+        reader = self._ipc()
+        return _pyarrow().Table.from_batches([reader.get_batch(i) for i in groups], schema=self.schema)
+
+    def __len__(self):
+        return self._num_rows
+
+    @property
+    def columns(self):
+        return self.schema.names
+
+    def numeric_columns(self):
+        types = _pyarrow().types
+        return [f.name for f in self.schema if types.is_integer(f.type) or types.is_floating(f.type)]
+
+    def head(self, n=5):
+        if self.fmt == "parquet":
+            batch = next(self._parquet.iter_batches(batch_size=n), None)
+            return self.schema.empty_table().to_pandas() if batch is None else batch.to_pandas()
+        ends = np.cumsum(self._batch_rows)
+        needed = int(np.searchsorted(ends, n)) + 1 if n > 0 else 0
+        return self._read_groups(list(range(min(needed, ends.size)))).slice(0, n).to_pandas()
+
+    def column(self, name):
+        if name not in self._columns and name not in self.schema.names:
+            return _derived(self, name)
+        if name not in self._columns:
+            if self.fmt == "parquet":
+                values = self._parquet.read(columns=[name]).column(0)
+            else:
+                table = self._ipc([self.schema.get_field_index(name)]).read_all()
+                values = table.column(name)
+            values = values.to_pandas().to_numpy()
+            _keep(self, self._columns, name, read_only(downcast(values)) if self.compact else values)
+        return self._columns[name]
+
+    def take_rows(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        # Read only the row groups (or record batches) that hold sampled rows
+        group_rows = self._group_rows()
+        group_starts = np.concatenate([[0], np.cumsum(group_rows)[:-1]])
+        groups = np.searchsorted(group_starts, indices, side="right") - 1
+        needed = np.unique(groups)
+        table = self._read_groups(needed.tolist())
+        offsets = np.concatenate([[0], np.cumsum(group_rows[needed])[:-1]])
+        local = indices - group_starts[groups] + offsets[np.searchsorted(needed, groups)]
+        return table.take(local).to_pandas()
+
+
+def open_source(path, compact=False):
+    """Open the population stored at ``path``; the format follows the file extension."""
+    fmt = detect_format(path)
+    if fmt == "csv":
+        frame = pd.read_csv(path)
+        return FrameSource(compact_frame(frame) if compact else frame, compact)
+    return ArrowSource(path, fmt, compact)
+
+
+def open_upload(data, name, cache=None, compact=True):
+    """Open uploaded file bytes once per distinct content.
+
+    Returns ``(source, file_hash)`` like :func:`pps.cache.read_csv_cached`.
+    Uploads are compact by default since the cached source is shared by
+    every session working on the same file. The source is the only cache
+    entry holding the parsed file, and it is measured again whenever it keeps
+    another column.
+    """
+    cache = default_cache if cache is None else cache
+    fmt = detect_format(name)
+    file_hash = content_hash(data)
+    key = ("source", file_hash, fmt, compact)
+
+    def load():
+        if fmt == "csv":
+            frame = pd.read_csv(io.BytesIO(data))
+            source = FrameSource(compact_frame(frame) if compact else frame, compact)
+        else:
+            source = ArrowSource(data, fmt, compact)
+        source.on_grow = lambda: cache.remeasure(key)
+        return source
+
+    return cached(key, load, cache), file_hash
@@ -0,0 +1,149 @@
+"""Stratified PPS: allocate the sample over strata, then sample PPS inside each stratum.
+
+Strata are the bin codes produced by :mod:`pps.binning` (one stratum per
+``pd.cut``/``pd.qcut`` bin, or per label when several bins share a label).
+All strata are sampled together in one grouped pass: every eligible row gets
+an Efraimidis-Spirakis key, rows are sorted by ``(stratum, key)`` and the
+first ``n_h`` rows of each stratum are kept.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .compact import compact_codes
+
+ALLOCATIONS = ("proportional", "neyman", "fixed")
+
+StratumSummary = namedtuple("StratumSummary", ["counts", "totals", "std"])
+StratumSummary.__doc__ = """Eligible row count, size total and size standard deviation of each stratum."""
+
+StratifiedSample = namedtuple("StratifiedSample", ["indices", "strata", "probability"])
+StratifiedSample.__doc__ = """Sampled row indices, their stratum codes and their within-stratum single-draw probability."""
+
+
+def _eligible(codes, weights):
+    codes = np.asarray(codes)
+    weights = np.asarray(weights, dtype=np.float64)
+    return np.flatnonzero((codes >= 0) & (weights > 0)), codes, weights
+
+
+def label_strata(codes, labels):
+    """Map bin codes to stratum codes, one stratum per distinct label.
+
+    Returns ``(strata, stratum_labels)``; bins sharing a label form one
+    stratum and rows outside every bin keep code ``-1``.
+    """
+    stratum_labels = list(dict.fromkeys(labels))
+    lookup = np.array([stratum_labels.index(label) for label in labels] + [-1])
+    lookup = compact_codes(lookup, len(stratum_labels))
+    return lookup[np.asarray(codes)], stratum_labels
+
+
+def stratum_summary(codes, weights, num_strata):
+    """Per-stratum counts, size totals and standard deviations in one pass."""
+    rows, codes, weights = _eligible(codes, weights)
+    strata = codes[rows]
+    sizes = weights[rows]
+    counts = np.bincount(strata, minlength=num_strata)
+    totals = np.bincount(strata, weights=sizes, minlength=num_strata)
+    squares = np.bincount(strata, weights=sizes * sizes, minlength=num_strata)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, totals / counts, 0.0)
+        variances = np.where(counts > 0, squares / counts - means ** 2, 0.0)
+    return StratumSummary(counts, totals, np.sqrt(np.clip(variances, 0, None)))
+
+
+def _round_allocation(n, share, capacity):
+    """Split ``n`` in proportion to ``share`` without exceeding ``capacity``.
+
+    Strata whose ideal allocation exceeds their capacity are capped and the
+    rest is re-spread; fractions go to the largest remainders.
+    """
+    share = np.asarray(share, dtype=np.float64)
+    capacity = np.asarray(capacity, dtype=np.int64)
+    if n > capacity.sum():
+        raise ValueError("Cannot take a larger sample than population when 'replace=False'")
+    capped = capacity <= 0
+    while True:
+        open_ = ~capped
+        if not open_.any():
+            # Every stratum is capped, so each takes all of its rows
+            ideal = capacity.astype(np.float64)
+            break
+        if share[open_].sum() <= 0:
+            share = capacity.astype(np.float64)
+        left = n - capacity[capped].sum()
+        ideal = np.where(open_, share * left / share[open_].sum(), capacity)
+        over = open_ & (ideal > capacity)
+        if not over.any():
+            break
+        capped |= over
+    allocation = np.floor(ideal).astype(np.int64)
+    shortfall = int(n - allocation.sum())
+    if shortfall > 0:
+        remainders = np.where(open_ & (allocation < capacity), ideal - allocation, -1.0)
+        allocation[np.argsort(-remainders, kind="stable")[:shortfall]] += 1
+    return allocation
+
+
+def allocate(n, summary, method="proportional", fixed=None):
+    """Sample size of each stratum.
+
+    ``proportional`` allocates by eligible row count, ``neyman`` by row count
+    times size standard deviation, and ``fixed`` takes the per-stratum sizes
+    given in ``fixed`` as they are.
+    """
+    if method not in ALLOCATIONS:
+        raise ValueError(f"Unknown allocation '{method}'. Choose from: {', '.join(ALLOCATIONS)}.")
+    if method == "fixed":
+        allocation = np.asarray(fixed, dtype=np.int64)
+        if allocation.shape != summary.counts.shape:
+            raise ValueError(f"Expected {summary.counts.size} stratum sample sizes.")
+        if (allocation < 0).any() or (allocation > summary.counts).any():
+            raise ValueError("Each stratum sample size must be between 0 and the stratum's eligible rows.")
+        return allocation
+    share = summary.counts if method == "proportional" else summary.counts * summary.std
+    return _round_allocation(int(n), share, summary.counts)
+
+
+def _draw_strata(codes, weights, allocation, seed):
+    rows, codes, weights = _eligible(codes, weights)
+    rng = np.random.default_rng(seed)
+    strata = codes[rows]
+    keys = np.log(rng.random(rows.size)) / weights[rows]
+    order = np.lexsort((-keys, strata))
+    rows, strata = rows[order], strata[order]
+    starts = np.searchsorted(strata, np.arange(allocation.size))
+    rank = np.arange(rows.size) - starts[strata]
+    chosen = rank < allocation[strata]
+    return rows[chosen], strata[chosen]
+
+
+def stratified_sample(codes, weights, allocation, random_state=None, workers=None, summary=None):
+    """Draw ``allocation[h]`` rows PPS on ``weights`` inside every stratum ``h``.
+
+    Sampling within a stratum is successive PPS without replacement, as in
+    :meth:`pps.core.PPSSampler.sample`. With ``workers`` above 1 the strata
+    are split into that many groups and drawn in worker processes, each group
+    with its own child seed of ``random_state``. Pass the ``summary`` from
+    :func:`stratum_summary` to avoid recomputing stratum totals.
+    """
+    codes = np.asarray(codes)
+    weights = np.asarray(weights, dtype=np.float64)
+    allocation = np.asarray(allocation, dtype=np.int64)
+    if summary is None:
+        summary = stratum_summary(codes, weights, allocation.size)
+    if workers and workers > 1:
+        groups = [g for g in np.array_split(np.flatnonzero(allocation), workers) if g.size]
+        seeds = np.random.SeedSequence(random_state).spawn(len(groups))
+        members = [np.flatnonzero(np.isin(codes, g)) for g in groups]
+        allocations = [np.where(np.isin(np.arange(allocation.size), g), allocation, 0) for g in groups]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_draw_strata, [codes[m] for m in members], [weights[m] for m in members],
+                                  allocations, seeds))
+        indices = np.concatenate([m[rows] for m, (rows, _) in zip(members, parts)] or [np.empty(0, dtype=np.intp)])
+        strata = np.concatenate([p[1] for p in parts] or [np.empty(0, dtype=codes.dtype)])
+    else:
+        indices, strata = _draw_strata(codes, weights, allocation, random_state)
+    return StratifiedSample(indices, strata, weights[indices] / summary.totals[strata])
@@ -0,0 +1,143 @@
+"""Two-pass PPS sampling of CSV files that do not fit in memory.
+
+The first pass reads only the size column (or the columns a size
+expression names, see :mod:`pps.expressions`), chunk by chunk, and keeps a
+weighted reservoir (Efraimidis-Spirakis A-Res) of the ``n`` rows with the
+largest keys ``log(u) / size``. That is the same successive-sampling design
+as :meth:`pps.core.PPSSampler.sample` without replacement. The second pass
+reads the file again and keeps only the selected rows, so memory is bounded
+by the sample size and the chunk size, never by the file size.
+
+Equal-frequency bins over such files come from one extra pass through a
+:class:`pps.quantiles.KLLSketch`; the sampling passes then weight each row
+by the weight of its bin.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .expressions import SizeExpression, frame_sizes
+from .quantiles import DEFAULT_K, KLLSketch, codes_from_edges, interval_labels
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+Reservoir = namedtuple("Reservoir", ["rows", "sizes", "total", "n_rows", "n_eligible"])
+Reservoir.__doc__ = """Result of the first pass.
+
+``rows`` are 0-based data-row offsets in draw order and ``sizes`` their
+weights (the size value, or the bin weight when sampling over bins);
+``total`` is the weight total of all eligible rows.
+"""
+
+StreamedBins = namedtuple("StreamedBins", ["edges", "labels", "report", "rank_error"])
+StreamedBins.__doc__ = """Approximate equal-frequency bins of a streamed column.
+
+``report`` estimates each bin's count and size share from the sketch and
+``rank_error`` bounds how far, as a share of rows, a cutoff may sit from
+its exact quantile.
+"""
+
+
+def _size_columns(path, column, **read_csv_kwargs):
+    """The columns to read for the sizes in ``column``: itself, or those its expression names."""
+    if column in pd.read_csv(path, nrows=0, **read_csv_kwargs).columns:
+        return [column]
+    return SizeExpression(column).columns
+
+
+def stream_quantile_bins(path, column, num_bins, chunksize=DEFAULT_CHUNKSIZE, k=DEFAULT_K,
+                         random_state=None, **read_csv_kwargs):
+    """Approximate equal-frequency bins of ``column`` in one chunked pass."""
+    sketch = KLLSketch(k, random_state)
+    usecols = _size_columns(path, column, **read_csv_kwargs)
+    with pd.read_csv(path, usecols=usecols, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            sketch.update(frame_sizes(chunk, column))
+    edges = sketch.edges(num_bins)
+    return StreamedBins(edges, interval_labels(edges), sketch.report(edges), sketch.rank_error)
+
+
+def reservoir_sample_csv(path, column, n, chunksize=DEFAULT_CHUNKSIZE, random_state=None,
+                         edges=None, bin_weights=None, **read_csv_kwargs):
+    """First pass: draw ``n`` row offsets with probability proportional to ``column``.
+
+    Missing and non-positive sizes are skipped, as in the automatic mode.
+    With bin ``edges`` (e.g. from :func:`stream_quantile_bins`) each row is
+    instead weighted by the entry of ``bin_weights`` for its bin.
+    """
+    lookup = None if edges is None else np.append(np.asarray(bin_weights, dtype=np.float64), 0.0)
+    n = int(n)
+    if n < 0:
+        raise ValueError("Sample size must not be negative.")
+    rng = np.random.default_rng(random_state)
+    keys = np.empty(0)
+    rows = np.empty(0, dtype=np.int64)
+    sizes = np.empty(0)
+    total = 0.0
+    n_rows = 0
+    n_eligible = 0
+    usecols = _size_columns(path, column, **read_csv_kwargs)
+    with pd.read_csv(path, usecols=usecols, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            values = frame_sizes(chunk, column)
+            if lookup is not None:
+                values = lookup[codes_from_edges(values, edges)]
+            positions = np.flatnonzero(values > 0)
+            chunk_sizes = values[positions]
+            total += float(chunk_sizes.sum())
+            n_eligible += positions.size
+            keys = np.concatenate([keys, np.log(rng.random(positions.size)) / chunk_sizes])
+            rows = np.concatenate([rows, positions + n_rows])
+            sizes = np.concatenate([sizes, chunk_sizes])
+            n_rows += len(values)
+            if keys.size > n:
+                # argpartition needs a kth inside the array, so an empty sample keeps nothing directly
+                keep = np.argpartition(keys, keys.size - n)[keys.size - n:] if n else np.empty(0, dtype=np.intp)
+                keys, rows, sizes = keys[keep], rows[keep], sizes[keep]
+    if n > n_eligible:
+        raise ValueError("Cannot take a larger sample than population when 'replace=False'")
+    order = np.argsort(-keys, kind="stable")
+    return Reservoir(rows[order], sizes[order], total, n_rows, n_eligible)
+
+
+def fetch_rows(path, rows, chunksize=DEFAULT_CHUNKSIZE, **read_csv_kwargs):
+    """Second pass: read only the data rows at offsets ``rows``, in the given order."""
+    rows = np.asarray(rows, dtype=np.int64)
+    wanted = np.unique(rows)
+    parts = []
+    start = 0
+    with pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs) as reader:
+        for chunk in reader:
+            stop = start + len(chunk)
+            lo, hi = np.searchsorted(wanted, [start, stop])
+            if hi > lo:
+                parts.append(chunk.iloc[wanted[lo:hi] - start])
+            start = stop
+            if hi == wanted.size:
+                break
+    fetched = pd.concat(parts, ignore_index=True) if parts else pd.read_csv(path, nrows=0, **read_csv_kwargs)
+    return fetched.iloc[np.searchsorted(wanted, rows)].reset_index(drop=True)
+
+
+def stream_sample_csv(path, column, n, chunksize=DEFAULT_CHUNKSIZE, random_state=None,
+                      edges=None, bin_weights=None, labels=None, bin_column=None, **read_csv_kwargs):
+    """Sample ``n`` rows of a CSV without replacement, PPS on ``column``, in two passes.
+
+    Returns the sampled rows in draw order with a ``probability`` column
+    holding each row's single-draw probability, like ``PPSSampler.take``.
+    With ``edges`` and ``bin_weights`` rows are weighted by bin, and
+    ``bin_column`` names a column for each sampled row's bin label
+    (``labels``, or the bin intervals by default).
+    """
+    reservoir = reservoir_sample_csv(path, column, n, chunksize, random_state, edges, bin_weights, **read_csv_kwargs)
+    sample_df = fetch_rows(path, reservoir.rows, chunksize, **read_csv_kwargs)
+    if column not in sample_df.columns:
+        # A size expression: keep the derived measure next to the fetched rows
+        sample_df[column] = frame_sizes(sample_df, column)
+    if edges is not None and bin_column is not None:
+        lookup = np.array(list(labels or interval_labels(edges)) + [None], dtype=object)
+        sizes = frame_sizes(sample_df, column)
+        sample_df[bin_column] = lookup[codes_from_edges(sizes, edges)]
+    sample_df["probability"] = reservoir.sizes / reservoir.total
+    return sample_df
@@ -0,0 +1,97 @@
+"""Streamlit widgets shared by the sampling apps.
+
+This is the one module of the package that imports Streamlit, so
+``import pps`` does not load it; the apps import it as ``pps.ui``.
+"""
+import streamlit as st
+
+from .expressions import FUNCTIONS, SizeExpression
+from .profiling import Profiler
+
+
+def finished_job(key):
+    """Take the job stored under ``key`` out of the session once it has finished."""
+    job = st.session_state[key]
+    if job is None or not job.done:
+        return None
+    st.session_state[key] = None
+    return job
+
+
+@st.fragment(run_every=0.5)
+def job_progress(key):
+    """Progress bar and cancel button for the running job under ``key``, refreshed without rerunning the page."""
+    job = st.session_state[key]
+    if job is None or job.done:
+        st.rerun()
+    st.progress(job.progress, text=job.message)
+    if st.button("✖ Cancel", key=f"cancel_{key}"):
+        job.cancel()
+
+
+def session_profiler(key, memory=False, log=False):
+    """The session's profiler under ``key``, following this run's ``memory`` and ``log`` settings."""
+    if st.session_state[key] is None:
+        st.session_state[key] = Profiler()
+    profiler = st.session_state[key]
+    profiler.memory, profiler.log = memory, log
+    return profiler
+
+
+def export_sample(sample, export_format, index_only, profiler):
+    """Download callback: encode the sample, timing the export."""
+    profiler.reset()
+    with profiler.stage("export", "io"):
+        return sample.export(export_format, index_only)
+
+
+def show_diagnostics(profilers):
+    """Sidebar tables of the stage timings collected by ``profilers``, keyed by title."""
+    st.sidebar.markdown("### ⏱️ Diagnostics")
+    for title, profiler in profilers.items():
+        if profiler is None or not profiler.stages:
+            continue
+        summary = profiler.summary()
+        st.sidebar.markdown(f"**{title}**: {summary['seconds']:.3f} s, mostly {summary['bound']}")
+        st.sidebar.dataframe(profiler.report(), hide_index=True)
+
+
+def show_sample_checks(checks):
+    """Summary figures and per-bin table of a :func:`pps.diagnose` result."""
+    summary = checks.summary
+    sum_col, ess_col, coverage_col = st.columns(3)
+    sum_col.metric("Σπ vs n", f"{summary['sum_pi']:.2f} / {summary['sample_size']}")
+    ess_col.metric("Effective sample size", f"{summary['effective_sample_size']:.1f}")
+    coverage_col.metric("Size coverage", f"{summary['size_coverage']:.1%}")
+    st.markdown(f"Certainty units sampled: {summary['certainty_sampled']} of {summary['certainty_units']}")
+    if "replicates" in summary:
+        st.markdown(
+            f"Monte Carlo over {summary['replicates']} replicates: largest inclusion error "
+            f"{summary['mc_max_abs_error']:.4f}, {summary['mc_share_outside_3se']:.2%} of units outside 3 SE"
+        )
+    st.dataframe(checks.bins, hide_index=True)
+
+
+def choose_size_measure(source, numeric_columns, profiler):
+    """A numeric column or a size expression over several columns, or ``None`` until one is entered.
+
+    Expressions are evaluated over just the columns they name, timed with
+    ``profiler``, and cached on the shared source by their normalized text.
+    """
+    if st.radio("Size measure:", ["Column", "Expression"], horizontal=True) == "Column":
+        return st.selectbox("Select a numeric column for PPS sampling:", numeric_columns)
+    text = st.text_input(
+        "Size expression:",
+        placeholder="e.g., revenue * employees, 0.7 * sales + 0.3 * assets, log1p(revenue)",
+        help="Arithmetic and comparisons over columns, plus " + ", ".join(FUNCTIONS)
+             + ". Quote column names with spaces in backticks."
+    )
+    if not text:
+        return None
+    try:
+        with profiler.stage("size expression"):
+            source.column(text)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+    return SizeExpression(text).text
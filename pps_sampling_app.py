@@ -1,54 +1,120 @@
 
 import streamlit as st
+import numpy as np
 import pandas as pd
 
+from pps import (
+    DEFAULT_REPLICATES,
+    EXPORT_FORMATS,
+    SUPPORTED_EXTENSIONS,
+    LazySample,
+    PPSSampler,
+    Profiler,
+    available_formats,
+    cached,
+    configure_logging,
+    diagnose,
+    equal_width_bins,
+    job_processes,
+    label_rows,
+    manual_bins,
+    open_upload,
+    submit_job,
+)
+from pps.jobs import CANCELLED, FAILED
+from pps.ui import (
+    choose_size_measure,
+    export_sample,
+    finished_job,
+    job_progress,
+    session_profiler,
+    show_diagnostics,
+    show_sample_checks,
+)
+
+APP_NAME = "pps_sampling_app"
+
 st.set_page_config(page_title="PPS Sampling - Flexible Binning", layout="centered")
 st.title("📊 PPS Sampling with Equal Width or Manual Binning")
 
 # Initialize session state
-for key in ["df", "sampling_started", "column", "mode", "bin_col", "sample_df"]:
+for key in ["source", "sampling_started", "column", "mode", "bin_col", "sample", "sampler", "bin_codes", "bin_labels", "user_labels", "file_hash", "sample_job", "sample_profile", "export_profile", "checks_job", "sample_checks"]:
     if key not in st.session_state:
         st.session_state[key] = None
 
+# Optional diagnostics: stage timings, and peak memory, logged as JSON to the pps.profile logger
+diagnostics = st.sidebar.checkbox("Show diagnostics")
+track_memory = diagnostics and st.sidebar.checkbox("Track peak memory (slower)")
+profiler = Profiler(memory=track_memory, log=diagnostics, app=APP_NAME)
+if diagnostics:
+    configure_logging()
+
+
+def draw_sample(source, sampler, sample_size, column, bin_col, codes, bin_labels, user_labels, profiler, progress):
+    """Background job behind Step 6."""
+    progress(0.1, "Drawing")
+    with profiler.stage("sample"):
+        indices = sampler.sample(sample_size, random_state=42)
+    extra_columns = {}
+    if column not in source.columns:
+        # A size expression: show and export the derived measure next to the rows
+        extra_columns[column] = source.column(column)[indices]
+    if bin_col:
+        progress(0.9, "Labelling the sampled rows")
+        with profiler.stage("label"):
+            extra_columns[bin_col] = label_rows(codes, bin_labels, indices)
+            extra_columns['bin_label'] = label_rows(codes, user_labels, indices)
+    return LazySample(source, sampler, indices, extra_columns)
+
+
 # Step 1: File Upload
-uploaded_file = st.file_uploader("Upload your CSV file", type="csv")
+uploaded_file = st.file_uploader("Upload your data file (CSV, Parquet, Feather or Arrow)", type=SUPPORTED_EXTENSIONS)
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
-        st.session_state.df = df
+        # Opened once per distinct file content, shared across reruns and sessions.
+        # Columnar files are read one column at a time.
+        with profiler.stage("read", "io"):
+            source, file_hash = open_upload(uploaded_file.getvalue(), uploaded_file.name)
+        st.session_state.source = source
+        st.session_state.file_hash = file_hash
         st.success("✅ File uploaded and read successfully.")
         st.write("### Preview of Uploaded Data")
-        st.dataframe(df.head())
+        st.dataframe(source.head())
     except Exception as e:
         st.error(f"❌ File read failed: {e}")
         st.stop()
 
 # Step 2: Select Numeric Column
-if st.session_state.df is not None:
-    numeric_columns = st.session_state.df.select_dtypes(include='number').columns.tolist()
+if st.session_state.source is not None:
+    with profiler.stage("select_dtypes"):
+        numeric_columns = st.session_state.source.numeric_columns()
     if not numeric_columns:
         st.error("No numeric columns found.")
         st.stop()
 
-    st.session_state.column = st.selectbox("Select a numeric column for PPS sampling:", numeric_columns)
+    st.session_state.column = choose_size_measure(st.session_state.source, numeric_columns, profiler)
 
     if st.button("▶️ Run Sampling Setup"):
         st.session_state.sampling_started = True
 
 # Step 3: Sampling Setup
 if st.session_state.sampling_started and st.session_state.column:
-    df = st.session_state.df
+    source = st.session_state.source
     column = st.session_state.column
+    file_hash = st.session_state.file_hash
 
     st.session_state.mode = st.radio("Choose sampling mode:", ["Automatic (based on values)", "Custom binning"], index=0)
 
     if st.session_state.mode == "Automatic (based on values)":
-        filtered_df = df[df[column].notnull() & (df[column] > 0)].copy()
-        if filtered_df.empty:
+        try:
+            with profiler.stage("weights"):
+                st.session_state.sampler = cached(
+                    ("sampler", file_hash, column, "auto"),
+                    lambda: PPSSampler.from_sizes(source.column(column))
+                )
+        except ValueError:
             st.error("No valid data found.")
             st.stop()
-        filtered_df['probability'] = filtered_df[column] / filtered_df[column].sum()
-        st.session_state.sample_ready_df = filtered_df
         st.session_state.bin_col = None
 
     else:
@@ -61,11 +127,15 @@ if st.session_state.sampling_started and st.session_state.column:
         try:
             if binning_mode == "Automatic":
                 bin_col = f"{column}_cut"
-                df[bin_col] = pd.cut(df[column], bins=int(num_bins))
-                unique_bins = df[bin_col].cat.categories.astype(str).tolist()
+                bin_spec = ("equal_width", int(num_bins))
+                with profiler.stage("bin"):
+                    codes, unique_bins = cached(
+                        ("bins", file_hash, column, "equal_width", int(num_bins)),
+                        lambda: equal_width_bins(source.column(column), int(num_bins))
+                    )
             else:
-                min_val = float(df[column].min())
-                max_val = float(df[column].max())
+                min_val = float(np.nanmin(source.column(column)))
+                max_val = float(np.nanmax(source.column(column)))
                 st.markdown(f"ℹ️ Column range: {min_val:.2f} – {max_val:.2f}")
                 manual_bins_input = st.text_input(
                     f"Enter {num_bins - 1} internal cutoff points (comma-separated):",
@@ -76,10 +146,13 @@ if st.session_state.sampling_started and st.session_state.column:
                     st.warning(f"⚠️ You must provide exactly {num_bins - 1} breakpoints.")
                     st.stop()
 
-                all_bins = [min_val] + cutoffs + [max_val + 0.01]
                 bin_col = f"{column}_cut"
-                df[bin_col] = pd.cut(df[column], bins=all_bins, include_lowest=True)
-                unique_bins = df[bin_col].cat.categories.astype(str).tolist()
+                bin_spec = ("manual", tuple(cutoffs))
+                with profiler.stage("bin"):
+                    codes, unique_bins = cached(
+                        ("bins", file_hash, column, "manual", tuple(cutoffs)),
+                        lambda: manual_bins(source.column(column), cutoffs)
+                    )
 
             st.session_state.bin_col = bin_col
 
@@ -100,10 +173,6 @@ if st.session_state.sampling_started and st.session_state.column:
                 st.warning(f"Please enter exactly {len(unique_bins)} labels.")
                 st.stop()
 
-            # Assign custom labels
-            bin_label_map = dict(zip(unique_bins, user_labels))
-            df['bin_label'] = df[bin_col].astype(str).map(bin_label_map)
-
             # Step 5: Weights
             st.markdown("Step 4: Assign weights to each bin")
             default_weights = ",".join(["1.0"] * len(user_labels))
@@ -113,41 +182,102 @@ if st.session_state.sampling_started and st.session_state.column:
                 st.warning(f"Expected {len(user_labels)} weights.")
                 st.stop()
 
+            # Bins sharing a label share that label's weight. The key holds the exact bin spec, since
+            # the rounded interval labels of two different specs can coincide.
             prob_map = dict(zip(user_labels, bin_weights))
-            df['probability'] = df['bin_label'].map(prob_map).astype(float)
-            total = df['probability'].sum()
-            if total == 0 or pd.isna(total):
-                st.error("Total probability is zero or invalid.")
-                st.stop()
-            df['probability'] = df['probability'] / total
-            st.session_state.sample_ready_df = df
+            label_weights = tuple(prob_map[label] for label in user_labels)
+            with profiler.stage("weights"):
+                st.session_state.sampler = cached(
+                    ("sampler", file_hash, column, "bins") + bin_spec + (label_weights,),
+                    lambda: PPSSampler.from_bins(codes, label_weights)
+                )
+            st.session_state.bin_codes = codes
+            st.session_state.bin_labels = unique_bins
+            st.session_state.user_labels = user_labels
 
         except Exception as e:
             st.error(f"Error in binning or labeling: {e}")
             st.stop()
 
     # Step 6: Sampling
-    sample_size = st.number_input("Step 5: Enter sample size", min_value=1, max_value=len(st.session_state.sample_ready_df), step=1)
+    sampler = st.session_state.sampler
+    sample_size = st.number_input("Step 5: Enter sample size", min_value=1, max_value=sampler.n_eligible, step=1)
 
-    if st.button("📌 Step 6: Sample Data"):
-        try:
-            sample_df = st.session_state.sample_ready_df.sample(
-                n=sample_size,
-                weights='probability',
-                random_state=42
-            ).reset_index(drop=True)
-            st.session_state.sample_df = sample_df
+    # Sampling runs on the shared background pool; the page polls it instead of blocking
+    if st.button("📌 Step 6: Sample Data", disabled=st.session_state.sample_job is not None):
+        st.session_state.sample_profile = Profiler(memory=track_memory, log=diagnostics, app=APP_NAME)
+        st.session_state.sample_job = submit_job(
+            draw_sample, source, sampler, sample_size, column, st.session_state.bin_col,
+            st.session_state.bin_codes, st.session_state.bin_labels, st.session_state.user_labels,
+            st.session_state.sample_profile
+        )
+    job = finished_job("sample_job")
+    if job is not None:
+        if job.status == FAILED:
+            st.error(f"Sampling failed: {job.error}")
+        elif job.status == CANCELLED:
+            st.warning("Sampling cancelled.")
+        else:
+            st.session_state.sample = job.result()
+            st.session_state.sample_checks = None
             st.success("✅ Sampling completed.")
-        except Exception as e:
-            st.error(f"Sampling failed: {e}")
+    if st.session_state.sample_job is not None:
+        job_progress("sample_job")
 
 # Step 7: Show and Download Sample
-if st.session_state.sample_df is not None:
+if st.session_state.sample is not None:
+    sample = st.session_state.sample
     st.subheader("🎯 Sampled Data Preview")
     preview_cols = [st.session_state.column, 'probability']
     if st.session_state.bin_col:
         preview_cols.insert(1, st.session_state.bin_col)
-    st.dataframe(st.session_state.sample_df[preview_cols].head())
+    preview_df = sample.head()
+    st.dataframe(preview_df[[c for c in preview_cols if c in preview_df.columns]])
+
+    # Rows are encoded chunk by chunk, and only when the download is clicked
+    export_format = st.selectbox("Download format", available_formats())
+    index_only = st.checkbox("Export only row indices and probabilities")
+    extension, mime = EXPORT_FORMATS[export_format]
+    export_profile = session_profiler("export_profile", track_memory, diagnostics)
+    st.download_button(
+        "📥 Download Sampled Data",
+        data=lambda: export_sample(sample, export_format, index_only, export_profile),
+        file_name=f"sampled_data.{extension}",
+        mime=mime
+    )
+
+    # Expected vs. realized counts per bin, certainty units, coverage and a Monte Carlo check of pi
+    with st.expander("🩺 Sample Checks"):
+        check_replicates = st.number_input("Monte Carlo replicates", min_value=0, value=DEFAULT_REPLICATES, step=50)
+        if st.button("Run Checks", disabled=st.session_state.checks_job is not None):
+            st.session_state.checks_job = submit_job(
+                diagnose,
+                sample.sampler,
+                sample.indices,
+                codes=st.session_state.bin_codes if st.session_state.bin_col else None,
+                labels=st.session_state.user_labels,
+                sizes=st.session_state.source.column(st.session_state.column),
+                replicates=int(check_replicates),
+                random_state=42,
+                workers=job_processes()
+            )
+        job = finished_job("checks_job")
+        if job is not None:
+            if job.status == FAILED:
+                st.error(f"Sample checks failed: {job.error}")
+            elif job.status == CANCELLED:
+                st.warning("Sample checks cancelled.")
+            else:
+                st.session_state.sample_checks = job.result()
+        if st.session_state.checks_job is not None:
+            job_progress("checks_job")
+        if st.session_state.sample_checks is not None:
+            show_sample_checks(st.session_state.sample_checks)
 
-    csv = st.session_state.sample_df.to_csv(index=False).encode('utf-8')
-    st.download_button("📥 Download Sampled Data", data=csv, file_name="sampled_data.csv", mime="text/csv")
+if diagnostics:
+    profiler.log_summary()
+    show_diagnostics({
+        "This run": profiler,
+        "Last sampling job": st.session_state.sample_profile,
+        "Last export": st.session_state.export_profile,
+    })
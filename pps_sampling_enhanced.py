@@ -1,79 +1,269 @@
 
 import streamlit as st
-import pandas as pd
+import numpy as np
+
+from pps import (
+    DEFAULT_REPLICATES,
+    EXPORT_FORMATS,
+    IncrementalFrame,
+    SUPPORTED_EXTENSIONS,
+    LazySample,
+    PPSSampler,
+    PRN_DESIGNS,
+    Profiler,
+    allocate,
+    available_formats,
+    bin_report,
+    cached,
+    configure_logging,
+    diagnose,
+    equal_width_bins,
+    equal_width_edges,
+    estimate,
+    generate_replicates,
+    job_processes,
+    label_rows,
+    label_strata,
+    manual_bins,
+    manual_edges,
+    open_upload,
+    permanent_random_numbers,
+    quantile_bins,
+    quantile_edges,
+    read_delta,
+    shift_prn,
+    stratified_sample,
+    stratum_summary,
+    submit_job,
+)
+from pps.jobs import CANCELLED, FAILED
+from pps.ui import (
+    choose_size_measure,
+    export_sample,
+    finished_job,
+    job_progress,
+    session_profiler,
+    show_diagnostics,
+    show_sample_checks,
+)
+
+APP_NAME = "pps_sampling_enhanced"
 
 st.set_page_config(page_title="PPS Sampling - Flexible Binning", layout="centered")
-st.title("📊 PPS Sampling with Equal Width or Manual Binning")
+st.title("📊 PPS Sampling with Equal Width, Equal Frequency or Manual Binning")
+
+# Stratum allocation methods offered in the UI, mapped to pps.stratified names
+ALLOCATION_OPTIONS = {
+    "Proportional": "proportional",
+    "Neyman": "neyman",
+    "Fixed per label": "fixed",
+}
+
+# Without-replacement designs offered in the UI, mapped to pps.designs names
+DESIGN_OPTIONS = {
+    "Successive draws": None,
+    "Systematic PPS": "systematic",
+    "Sampford": "sampford",
+    "Pareto πps": "pareto",
+    "Sequential Poisson πps": "sequential_poisson",
+}
 
 # Initialize session state
-for key in ["df", "sampling_started", "column", "mode", "bin_col", "sample_df", "replace"]:
+for key in ["source", "file_hash", "sampling_started", "column", "mode", "bin_col", "sample", "sampler", "bin_codes", "bin_labels", "user_labels", "replace", "design", "prn", "replicates_df", "stratified", "strata", "stratum_summary", "allocation", "parallel_strata", "sample_job", "replicates_job", "bin_spec", "bin_weights", "incremental", "sample_profile", "export_profile", "checks_job", "sample_checks"]:
     if key not in st.session_state:
         st.session_state[key] = None
 
+# Optional diagnostics: stage timings, and peak memory, logged as JSON to the pps.profile logger
+diagnostics = st.sidebar.checkbox("Show diagnostics")
+track_memory = diagnostics and st.sidebar.checkbox("Track peak memory (slower)")
+profiler = Profiler(memory=track_memory, log=diagnostics, app=APP_NAME)
+if diagnostics:
+    configure_logging()
+
+
+def reuse_sampler(key, build):
+    """Reuse the sampler, and the alias table it caches, while the file and its inputs in ``key`` are unchanged."""
+    with profiler.stage("weights"):
+        st.session_state.sampler = cached(("sampler",) + key, build)
+    return st.session_state.sampler
+
+
+def bin_edges(values, spec):
+    """Edges of the bins described by ``spec``, the binning mode and its parameter."""
+    mode, param = spec
+    if mode == "equal_width":
+        return equal_width_edges(values, param)
+    if mode == "quantile":
+        return quantile_edges(values, param)
+    return manual_edges(values, param)
+
+
+def stratify_bins(codes, user_labels, sizes):
+    """Stratum code of every row, the stratum labels and the stratum summary."""
+    strata, stratum_labels = label_strata(codes, user_labels)
+    return strata, stratum_labels, stratum_summary(strata, sizes, len(stratum_labels))
+
+
+# Session settings a sampling job needs, copied when it is submitted
+SAMPLING_STATE = ["column", "stratified", "strata", "stratum_summary", "allocation", "parallel_strata",
+                  "design", "prn", "replace", "bin_col", "bin_codes", "bin_labels", "user_labels"]
+
+
+def draw_sample(source, sampler, sample_size, state, profiler, progress):
+    """Background job behind Step 6; ``state`` holds the :data:`SAMPLING_STATE` settings."""
+    extra_columns = {}
+    with profiler.stage("sample"):
+        if state["stratified"]:
+            progress(0.1, "Drawing within strata")
+            method, fixed_sizes = state["allocation"]
+            allocation = allocate(sample_size, state["stratum_summary"], method, fixed_sizes)
+            result = stratified_sample(
+                state["strata"],
+                source.column(state["column"]),
+                allocation,
+                random_state=42,
+                workers=job_processes() if state["parallel_strata"] else None,
+                summary=state["stratum_summary"]
+            )
+            indices = result.indices
+            extra_columns['stratum_probability'] = result.probability
+        elif state["design"]:
+            prn = None
+            if state["prn"]:
+                progress(0.05, "Hashing unit keys")
+                key_column, prn_seed, prn_shift = state["prn"]
+                prn = shift_prn(permanent_random_numbers(source.column(key_column), prn_seed), prn_shift)
+            progress(0.1, "Computing inclusion probabilities and drawing")
+            result = sampler.sample_design(sample_size, design=state["design"], random_state=42, prn=prn)
+            indices = result.indices
+            extra_columns['inclusion_probability'] = result.pi
+        else:
+            if state["replace"]:
+                progress(0.1, "Building the alias table")
+                sampler.alias_table
+            progress(0.5, "Drawing")
+            indices = sampler.sample(sample_size, random_state=42, replace=state["replace"])
+    if state["bin_col"]:
+        progress(0.9, "Labelling the sampled rows")
+        codes = state["bin_codes"]
+        with profiler.stage("label"):
+            extra_columns[state["bin_col"]] = label_rows(codes, state["bin_labels"], indices)
+            extra_columns['bin_label'] = label_rows(codes, state["user_labels"], indices)
+    if state["column"] not in source.columns:
+        # A size expression: show and export the derived measure next to the rows
+        extra_columns[state["column"]] = source.column(state["column"])[indices]
+    return LazySample(source, sampler, indices, extra_columns)
+
+
+def estimator_args(sample):
+    """How :func:`pps.estimate` should weight this sample, from the columns its design produced."""
+    if "inclusion_probability" in sample.columns:
+        return {"pi": "inclusion_probability"}
+    if "stratum_probability" in sample.columns:
+        return {"probability": "stratum_probability", "strata": "bin_label"}
+    return {"probability": "probability"}
+
+
 # Step 1: File Upload
-uploaded_file = st.file_uploader("Upload your CSV file", type="csv")
+uploaded_file = st.file_uploader("Upload your data file (CSV, Parquet, Feather or Arrow)", type=SUPPORTED_EXTENSIONS)
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
-        st.session_state.df = df
+        # Opened once per distinct file content, shared across reruns and sessions.
+        # Columnar files are read one column at a time.
+        with profiler.stage("read", "io"):
+            source, file_hash = open_upload(uploaded_file.getvalue(), uploaded_file.name)
+        st.session_state.source = source
+        st.session_state.file_hash = file_hash
         st.success("✅ File uploaded and read successfully.")
         st.write("### Preview of Uploaded Data")
-        st.dataframe(df.head())
+        st.dataframe(source.head())
     except Exception as e:
         st.error(f"❌ File read failed: {e}")
         st.stop()
 
 # Step 2: Select Numeric Column
-if st.session_state.df is not None:
-    numeric_columns = st.session_state.df.select_dtypes(include='number').columns.tolist()
+if st.session_state.source is not None:
+    with profiler.stage("select_dtypes"):
+        numeric_columns = st.session_state.source.numeric_columns()
     if not numeric_columns:
         st.error("No numeric columns found.")
         st.stop()
 
-    st.session_state.column = st.selectbox("Select a numeric column for PPS sampling:", numeric_columns)
+    st.session_state.column = choose_size_measure(st.session_state.source, numeric_columns, profiler)
 
     # Show Min and Max of column
-    min_val = st.session_state.df[st.session_state.column].min()
-    max_val = st.session_state.df[st.session_state.column].max()
-    st.info(f"📊 **Selected column range:** Min = {min_val}, Max = {max_val}")
+    if st.session_state.column is not None:
+        column_values = st.session_state.source.column(st.session_state.column)
+        min_val = np.nanmin(column_values)
+        max_val = np.nanmax(column_values)
+        st.info(f"📊 **Selected column range:** Min = {min_val}, Max = {max_val}")
 
     if st.button("▶️ Run Sampling Setup"):
         st.session_state.sampling_started = True
 
 # Step 3: Sampling Setup
 if st.session_state.sampling_started and st.session_state.column:
-    df = st.session_state.df
+    source = st.session_state.source
     column = st.session_state.column
+    file_hash = st.session_state.file_hash
 
     # Ask for replacement option
     st.session_state.replace = st.radio("Do you want to sample with replacement?", ["Without Replacement", "With Replacement"]) == "With Replacement"
+    if not st.session_state.replace:
+        design_choice = st.radio("Choose sampling design:", list(DESIGN_OPTIONS), index=0)
+        st.session_state.design = DESIGN_OPTIONS[design_choice]
+    else:
+        st.session_state.design = None
+
+    # Permanent random numbers keep successive samples from an updated file coordinated
+    st.session_state.prn = None
+    if st.session_state.design in PRN_DESIGNS and st.checkbox("Coordinate with earlier samples (permanent random numbers)"):
+        key_column = st.selectbox("Unit key column", source.columns)
+        prn_seed = st.number_input("PRN seed (keep it fixed across periods)", min_value=0, value=0, step=1)
+        prn_shift = st.number_input("PRN shift (0 = maximum overlap; the sampling fraction rotates units out)",
+                                    min_value=0.0, max_value=0.999, value=0.0, step=0.05)
+        st.session_state.prn = (key_column, int(prn_seed), float(prn_shift))
 
     st.session_state.mode = st.radio("Choose sampling mode:", ["Automatic (based on values)", "Custom binning"], index=0)
 
     if st.session_state.mode == "Automatic (based on values)":
-        filtered_df = df[df[column].notnull() & (df[column] > 0)].copy()
-        if filtered_df.empty:
+        try:
+            reuse_sampler((file_hash, column, "auto"), lambda: PPSSampler.from_sizes(source.column(column)))
+        except ValueError:
             st.error("No valid data found.")
             st.stop()
-        filtered_df['probability'] = filtered_df[column] / filtered_df[column].sum()
-        st.session_state.sample_ready_df = filtered_df
         st.session_state.bin_col = None
+        st.session_state.bin_spec = None
+        st.session_state.bin_weights = None
+        st.session_state.stratified = False
 
     else:
         # Step 1: Number of bins
         num_bins = st.number_input("Step 1: Number of bins", min_value=2, value=3, step=1)
 
         # Step 2: Binning method
-        binning_mode = st.radio("Step 2: Define bin ranges", ["Automatic", "Manual"])
+        binning_mode = st.radio("Step 2: Define bin ranges", ["Automatic", "Equal-frequency", "Manual"])
 
         try:
             if binning_mode == "Automatic":
                 bin_col = f"{column}_cut"
-                df[bin_col] = pd.cut(df[column], bins=int(num_bins))
-                unique_bins = df[bin_col].cat.categories.astype(str).tolist()
+                st.session_state.bin_spec = ("equal_width", int(num_bins))
+                with profiler.stage("bin"):
+                    codes, unique_bins = cached(
+                        ("bins", file_hash, column, "equal_width", int(num_bins)),
+                        lambda: equal_width_bins(source.column(column), int(num_bins))
+                    )
+            elif binning_mode == "Equal-frequency":
+                bin_col = f"{column}_qbin"
+                st.session_state.bin_spec = ("quantile", int(num_bins))
+                with profiler.stage("bin"):
+                    codes, unique_bins = cached(
+                        ("bins", file_hash, column, "quantile", int(num_bins)),
+                        lambda: quantile_bins(source.column(column), int(num_bins))
+                    )
             else:
-                min_val = float(df[column].min())
-                max_val = float(df[column].max())
+                min_val = float(np.nanmin(source.column(column)))
+                max_val = float(np.nanmax(source.column(column)))
                 st.markdown(f"ℹ️ Column range: {min_val:.2f} – {max_val:.2f}")
                 manual_bins_input = st.text_input(
                     f"Enter {num_bins - 1} internal cutoff points (comma-separated):",
@@ -84,18 +274,21 @@ if st.session_state.sampling_started and st.session_state.column:
                     st.warning(f"⚠️ You must provide exactly {num_bins - 1} breakpoints.")
                     st.stop()
 
-                all_bins = [min_val] + cutoffs + [max_val + 0.01]
                 bin_col = f"{column}_cut"
-                df[bin_col] = pd.cut(df[column], bins=all_bins, include_lowest=True)
-                unique_bins = df[bin_col].cat.categories.astype(str).tolist()
+                st.session_state.bin_spec = ("manual", tuple(cutoffs))
+                with profiler.stage("bin"):
+                    codes, unique_bins = cached(
+                        ("bins", file_hash, column, "manual", tuple(cutoffs)),
+                        lambda: manual_bins(source.column(column), cutoffs)
+                    )
 
             st.session_state.bin_col = bin_col
 
             # Step 3: Show bin ranges and counts
             st.markdown("### Bin Ranges and Counts")
-            bin_ranges_df = df[bin_col].value_counts(sort=False).reset_index()
-            bin_ranges_df.columns = ['Range', 'Count']
-            st.table(bin_ranges_df)
+            with profiler.stage("bin report"):
+                report = bin_report(codes, source.column(column), unique_bins)
+            st.table(report)
 
             # Step 4: Label bins
             st.markdown("Step 3: Label your bins")
@@ -106,55 +299,252 @@ if st.session_state.sampling_started and st.session_state.column:
                 st.warning(f"Please enter exactly {len(unique_bins)} labels.")
                 st.stop()
 
-            # Assign custom labels
-            bin_label_map = dict(zip(unique_bins, user_labels))
-            df['bin_label'] = df[bin_col].astype(str).map(bin_label_map)
-
-            # Step 5: Weights
-            st.markdown("Step 4: Assign weights to each bin")
-            default_weights = ",".join(["1.0"] * len(user_labels))
-            prob_input = st.text_input("Enter weights (comma-separated)", value=default_weights)
-            bin_weights = [float(w.strip()) for w in prob_input.split(",")]
-            if len(bin_weights) != len(user_labels):
-                st.warning(f"Expected {len(user_labels)} weights.")
-                st.stop()
+            st.session_state.bin_codes = codes
+            st.session_state.bin_labels = unique_bins
+            st.session_state.user_labels = user_labels
 
-            prob_map = dict(zip(user_labels, bin_weights))
-            df['probability'] = df['bin_label'].map(prob_map).astype(float)
-            total = df['probability'].sum()
-            if total == 0 or pd.isna(total):
-                st.error("Total probability is zero or invalid.")
-                st.stop()
-            df['probability'] = df['probability'] / total
-            st.session_state.sample_ready_df = df
+            # Step 5: Weights, or per-bin allocation for stratified PPS
+            bin_usage = st.radio("Step 4: How should the bins be used?", ["Weight bins", "Stratified PPS within bins"])
+            st.session_state.stratified = bin_usage == "Stratified PPS within bins"
+            # Strata and samplers are keyed on the exact bin spec, since the rounded interval labels of
+            # two different specs can coincide
+            bin_spec = st.session_state.bin_spec
+            if st.session_state.stratified:
+                # Bins sharing a label form one stratum
+                sizes = source.column(column)
+                with profiler.stage("strata"):
+                    strata, stratum_labels, summary = cached(
+                        ("strata", file_hash, column) + bin_spec + (tuple(user_labels),),
+                        lambda: stratify_bins(codes, user_labels, sizes)
+                    )
+                allocation_method = st.radio("Allocate the sample across bins:", list(ALLOCATION_OPTIONS))
+                fixed_sizes = None
+                if ALLOCATION_OPTIONS[allocation_method] == "fixed":
+                    fixed_input = st.text_input(
+                        f"Enter sample sizes for {', '.join(stratum_labels)} (comma-separated)",
+                        value=",".join(["10"] * len(stratum_labels))
+                    )
+                    fixed_sizes = [int(x.strip()) for x in fixed_input.split(",")]
+                    if len(fixed_sizes) != len(stratum_labels):
+                        st.warning(f"Expected {len(stratum_labels)} sample sizes.")
+                        st.stop()
+                    if sum(fixed_sizes) < 1:
+                        st.warning("The fixed sample sizes must add up to at least 1.")
+                        st.stop()
+                st.session_state.strata = strata
+                st.session_state.stratum_summary = summary
+                st.session_state.allocation = (ALLOCATION_OPTIONS[allocation_method], fixed_sizes)
+                st.session_state.parallel_strata = st.checkbox("Draw strata in parallel worker processes")
+                reuse_sampler((file_hash, column, "auto"), lambda: PPSSampler.from_sizes(sizes))
+            else:
+                st.markdown("Step 4: Assign weights to each bin")
+                default_weights = ",".join(["1.0"] * len(user_labels))
+                prob_input = st.text_input("Enter weights (comma-separated)", value=default_weights)
+                bin_weights = [float(w.strip()) for w in prob_input.split(",")]
+                if len(bin_weights) != len(user_labels):
+                    st.warning(f"Expected {len(user_labels)} weights.")
+                    st.stop()
+
+                # Bins sharing a label share that label's weight
+                prob_map = dict(zip(user_labels, bin_weights))
+                label_weights = tuple(prob_map[label] for label in user_labels)
+                st.session_state.bin_weights = label_weights
+                reuse_sampler(
+                    (file_hash, column, "bins") + bin_spec + (label_weights,),
+                    lambda: PPSSampler.from_bins(codes, label_weights)
+                )
 
         except Exception as e:
             st.error(f"Error in binning or labeling: {e}")
             st.stop()
 
     # Step 6: Sampling
-    sample_size = st.number_input("Step 5: Enter sample size", min_value=1, max_value=len(st.session_state.sample_ready_df), step=1)
+    sampler = st.session_state.sampler
+    method, fixed_sizes = st.session_state.allocation or (None, None)
+    if st.session_state.stratified and method == "fixed":
+        # Fixed allocations set the sample size themselves
+        sample_size = sum(fixed_sizes)
+        st.markdown(f"Step 5: Sample size {sample_size}, the sum of the fixed sizes per bin")
+    else:
+        sample_size = st.number_input("Step 5: Enter sample size", min_value=1, max_value=sampler.n_eligible, step=1)
 
-    if st.button("📌 Step 6: Sample Data"):
-        try:
-            sample_df = st.session_state.sample_ready_df.sample(
-                n=sample_size,
-                weights='probability',
-                random_state=42,
-                replace=st.session_state.replace
-            ).reset_index(drop=True)
-            st.session_state.sample_df = sample_df
+    # Sampling runs on the shared background pool; the page polls it instead of blocking
+    if st.button("📌 Step 6: Sample Data", disabled=st.session_state.sample_job is not None):
+        state = {key: st.session_state[key] for key in SAMPLING_STATE}
+        st.session_state.sample_profile = Profiler(memory=track_memory, log=diagnostics, app=APP_NAME)
+        st.session_state.sample_job = submit_job(draw_sample, source, sampler, sample_size, state,
+                                                 st.session_state.sample_profile)
+    job = finished_job("sample_job")
+    if job is not None:
+        if job.status == FAILED:
+            st.error(f"Sampling failed: {job.error}")
+        elif job.status == CANCELLED:
+            st.warning("Sampling cancelled.")
+        else:
+            st.session_state.sample = job.result()
+            st.session_state.sample_checks = None
             st.success("✅ Sampling completed.")
-        except Exception as e:
-            st.error(f"Sampling failed: {e}")
+    if st.session_state.sample_job is not None:
+        job_progress("sample_job")
+
+    # Replicates: many independent samples stored as (replicate_id, row_id) pairs
+    with st.expander("🔁 Replicate Samples"):
+        num_replicates = st.number_input("Number of replicates", min_value=1, value=1000, step=1)
+        replicate_seed = st.number_input("Seed", min_value=0, value=42, step=1)
+        if st.button("Generate Replicates", disabled=st.session_state.replicates_job is not None):
+            st.session_state.replicates_job = submit_job(
+                generate_replicates,
+                sampler,
+                sample_size,
+                num_replicates,
+                seed=int(replicate_seed),
+                replace=st.session_state.replace,
+                design=st.session_state.design,
+                workers=job_processes()
+            )
+        job = finished_job("replicates_job")
+        if job is not None:
+            if job.status == FAILED:
+                st.error(f"Replicate sampling failed: {job.error}")
+            elif job.status == CANCELLED:
+                st.warning("Replicate sampling cancelled.")
+            else:
+                st.session_state.replicates_df = job.result()
+                st.success(f"✅ Generated {st.session_state.replicates_df['replicate_id'].nunique()} replicates.")
+        if st.session_state.replicates_job is not None:
+            job_progress("replicates_job")
+        if st.session_state.replicates_df is not None:
+            replicates_csv = st.session_state.replicates_df.to_csv(index=False).encode('utf-8')
+            st.download_button("📥 Download Replicate Index", data=replicates_csv, file_name="replicates.csv", mime="text/csv")
+
+    # Incremental update: apply a delta to the kept sizes and bins and redraw, without re-reading the frame
+    if st.session_state.prn and not st.session_state.stratified:
+        with st.expander("♻️ Incremental Update from a Delta File"):
+            key_column, prn_seed, prn_shift = st.session_state.prn
+            binned = st.session_state.bin_col is not None
+            settings = (file_hash, column, st.session_state.prn, st.session_state.design,
+                        st.session_state.bin_spec, st.session_state.bin_weights)
+            st.caption(f"The delta needs the '{key_column}' and '{column}' columns and may have an 'op' column "
+                       "(insert, update, delete or upsert); without it every row is an upsert.")
+            delta_file = st.file_uploader("Upload a delta file", type=SUPPORTED_EXTENSIONS, key="delta_file")
+            if delta_file and st.button("Apply Delta and Redraw"):
+                try:
+                    if st.session_state.incremental is None or st.session_state.incremental[0] != settings:
+                        sizes = source.column(column)
+                        frame = IncrementalFrame(
+                            source.column(key_column), sizes, sample_size, st.session_state.design,
+                            prn_seed, prn_shift,
+                            bin_edges(sizes, st.session_state.bin_spec) if binned else None,
+                            st.session_state.bin_weights if binned else None,
+                            st.session_state.user_labels if binned else None,
+                            key_column, column
+                        )
+                        frame.draw()
+                    else:
+                        frame = st.session_state.incremental[1]
+                    delta_source, _ = open_upload(delta_file.getvalue(), delta_file.name)
+                    summary = frame.apply_delta(*read_delta(delta_source, key_column, column))
+                    result, change = frame.draw(sample_size)
+                    st.session_state.incremental = (settings, frame, frame.sample_frame(result))
+                    st.success(f"✅ {summary.inserted} inserted, {summary.updated} updated, {summary.deleted} deleted. "
+                               f"Sample: {change.kept.size} kept, {change.added.size} added, {change.dropped.size} dropped.")
+                except ValueError as e:
+                    st.error(f"Delta failed: {e}")
+            if st.session_state.incremental is not None and st.session_state.incremental[0] == settings:
+                updated_sample = st.session_state.incremental[2]
+                st.dataframe(updated_sample.head())
+                st.download_button("📥 Download Updated Sample", data=lambda: updated_sample.to_csv(index=False).encode("utf-8"),
+                                   file_name="updated_sample.csv", mime="text/csv")
 
 # Step 7: Show and Download Sample
-if st.session_state.sample_df is not None:
+if st.session_state.sample is not None:
+    sample = st.session_state.sample
     st.subheader("🎯 Sampled Data Preview")
     preview_cols = [st.session_state.column, 'probability']
     if st.session_state.bin_col:
         preview_cols.insert(1, st.session_state.bin_col)
-    st.dataframe(st.session_state.sample_df[preview_cols].head())
+    preview_df = sample.head()
+    st.dataframe(preview_df[[c for c in preview_cols if c in preview_df.columns]])
+
+    # Rows are encoded chunk by chunk, and only when the download is clicked
+    export_format = st.selectbox("Download format", available_formats())
+    index_only = st.checkbox("Export only row indices and probabilities")
+    extension, mime = EXPORT_FORMATS[export_format]
+    export_profile = session_profiler("export_profile", track_memory, diagnostics)
+    st.download_button(
+        "📥 Download Sampled Data",
+        data=lambda: export_sample(sample, export_format, index_only, export_profile),
+        file_name=f"sampled_data.{extension}",
+        mime=mime
+    )
+
+    # Expected vs. realized counts per bin, certainty units, coverage and a Monte Carlo check of pi;
+    # stratified samples follow their allocation rather than one pi over the population
+    if not st.session_state.stratified:
+        with st.expander("🩺 Sample Checks"):
+            check_replicates = st.number_input("Monte Carlo replicates", min_value=0, value=DEFAULT_REPLICATES, step=50)
+            if st.button("Run Checks", disabled=st.session_state.checks_job is not None):
+                st.session_state.checks_job = submit_job(
+                    diagnose,
+                    sample.sampler,
+                    sample.indices,
+                    codes=st.session_state.bin_codes if st.session_state.bin_col else None,
+                    labels=st.session_state.user_labels,
+                    sizes=st.session_state.source.column(st.session_state.column),
+                    replace=st.session_state.replace,
+                    design=st.session_state.design,
+                    replicates=int(check_replicates),
+                    random_state=42,
+                    workers=job_processes()
+                )
+            job = finished_job("checks_job")
+            if job is not None:
+                if job.status == FAILED:
+                    st.error(f"Sample checks failed: {job.error}")
+                elif job.status == CANCELLED:
+                    st.warning("Sample checks cancelled.")
+                else:
+                    st.session_state.sample_checks = job.result()
+            if st.session_state.checks_job is not None:
+                job_progress("checks_job")
+            if st.session_state.sample_checks is not None:
+                show_sample_checks(st.session_state.sample_checks)
+
+    # Estimates straight from the sample in memory, for any numeric columns
+    with st.expander("📊 Estimates"):
+        numeric_cols = st.session_state.source.numeric_columns()
+        if st.session_state.column not in numeric_cols:
+            # A size expression, exported with the sample
+            numeric_cols = [st.session_state.column] + numeric_cols
+        estimate_cols = st.multiselect("Columns to estimate", numeric_cols, default=[st.session_state.column])
+        by_bin = st.checkbox("Estimate per bin label", value="bin_label" in sample.columns, disabled="bin_label" not in sample.columns)
+        ratio_col = st.selectbox("Ratio to (optional)", ["None"] + numeric_cols)
+        variance_method = st.radio("Variance", ["Design-based", "Jackknife"])
+        if estimate_cols:
+            try:
+                with profiler.stage("estimate"):
+                    estimates_df = estimate(
+                        sample,
+                        estimate_cols,
+                        by="bin_label" if by_bin else None,
+                        ratio_to=None if ratio_col == "None" else ratio_col,
+                        variance="design" if variance_method == "Design-based" else "jackknife",
+                        **estimator_args(sample)
+                    )
+                st.dataframe(estimates_df)
+                st.download_button(
+                    "📥 Download Estimates",
+                    data=estimates_df.to_csv().encode('utf-8'),
+                    file_name="estimates.csv",
+                    mime="text/csv"
+                )
+            except Exception as e:
+                st.error(f"Estimation failed: {e}")
 
-    csv = st.session_state.sample_df.to_csv(index=False).encode('utf-8')
-    st.download_button("📥 Download Sampled Data", data=csv, file_name="sampled_data.csv", mime="text/csv")
+if diagnostics:
+    profiler.log_summary()
+    show_diagnostics({
+        "This run": profiler,
+        "Last sampling job": st.session_state.sample_profile,
+        "Last export": st.session_state.export_profile,
+    })
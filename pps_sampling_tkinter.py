@@ -1,37 +1,82 @@
+import os
 import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, simpledialog, messagebox
 
+from pps import (
+    LazySample,
+    PPSSampler,
+    Profiler,
+    bin_report,
+    detect_format,
+    format_from_path,
+    label_rows,
+    open_source,
+    quantile_bins,
+    stream_quantile_bins,
+    stream_sample_csv,
+    write_frame,
+)
+
+# Files above this size are offered two-pass streaming sampling instead of a full read
+STREAMING_THRESHOLD = 1 << 30
+
+# Stage timings, printed after the sample is saved; dialogs are not timed
+profiler = Profiler()
+
 # Setup GUI
 root = tk.Tk()
 root.withdraw()
 
 # Step 1: File selection
-file_path = filedialog.askopenfilename(title="Select your CSV file")
+file_path = filedialog.askopenfilename(
+    title="Select your data file",
+    filetypes=[("Data files", "*.csv *.parquet *.pq *.feather *.arrow *.ipc"), ("All files", "*.*")]
+)
 if not file_path:
     messagebox.showerror("Error", "No file selected.")
     exit()
 
 try:
-    df = pd.read_csv(file_path)
+    file_format = detect_format(file_path)
+except ValueError as e:
+    messagebox.showerror("Error", str(e))
+    exit()
+
+streaming = file_format == "csv" and os.path.getsize(file_path) > STREAMING_THRESHOLD and messagebox.askyesno(
+    "Large File",
+    "This file is large. Stream it in chunks (PPS without replacement) instead of loading it into memory?"
+)
+
+try:
+    # In streaming mode only the header is read here; columnar files are read column by column
+    with profiler.stage("read", "io"):
+        if streaming:
+            source = None
+            columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+        else:
+            source = open_source(file_path)
+            columns = source.columns
 except Exception as e:
     messagebox.showerror("Error", f"Failed to read file:\n{e}")
     exit()
 
 # Step 2: Column to bin
 column = simpledialog.askstring("Column", "Enter the column name to bin:")
-if column is None or column not in df.columns:
+if column is None or column not in columns:
     messagebox.showerror("Error", f"Column '{column}' not found or cancelled.")
     exit()
 
 # Step 3: Choose binning method
 auto_mode = messagebox.askyesno("Binning Mode", "Do you want to use automatic PPS sampling without custom bins?")
 
-if auto_mode:
+if streaming and auto_mode:
+    bin_col = None
+elif auto_mode:
     # Auto mode: use raw column values as weights directly
     try:
-        df = df[df[column].notnull() & (df[column] > 0)].copy()
-        df['probability'] = df[column] / df[column].sum()
+        with profiler.stage("weights"):
+            sampler = PPSSampler.from_sizes(source.column(column))
     except Exception as e:
         messagebox.showerror("Error", f"Failed to calculate automatic PPS weights:\n{e}")
         exit()
@@ -52,9 +97,19 @@ else:
 
     bin_col = f"{column}_qbin"
     try:
-        df[bin_col] = pd.qcut(df[column], q=num_bins, labels=labels)
+        if streaming:
+            # Approximate cutoffs from one pass over the size column
+            with profiler.stage("quantile sketch", "io"):
+                streamed_bins = stream_quantile_bins(file_path, column, num_bins)
+            report = streamed_bins.report.assign(bin=labels)
+            print(f"Approximate cutoffs (rank error about {streamed_bins.rank_error:.2%}):")
+        else:
+            with profiler.stage("bin"):
+                codes, _ = quantile_bins(source.column(column), num_bins, labels=labels)
+                report = bin_report(codes, source.column(column), labels)
+        print(report.to_string(index=False))
     except Exception as e:
-        messagebox.showerror("Error", f"qcut failed:\n{e}")
+        messagebox.showerror("Error", f"Equal-frequency binning failed:\n{e}")
         exit()
 
     prob_input = simpledialog.askstring("Probabilities", f"Enter sampling weights for bins (comma-separated):")
@@ -66,14 +121,13 @@ else:
         messagebox.showerror("Error", f"Invalid weights:\n{e}")
         exit()
 
-    prob_map = dict(zip(labels, bin_weights))
-    df['probability'] = df[bin_col].map(prob_map).astype(float)
-
-    total = df['probability'].sum()
-    if total == 0 or pd.isna(total):
-        messagebox.showerror("Error", "Total probability is zero or invalid.")
-        exit()
-    df['probability'] = df['probability'] / total
+    if not streaming:
+        try:
+            with profiler.stage("weights"):
+                sampler = PPSSampler.from_bins(codes, bin_weights)
+        except ValueError:
+            messagebox.showerror("Error", "Total probability is zero or invalid.")
+            exit()
 
 # Step 4: Sample
 try:
@@ -82,12 +136,26 @@ except:
     messagebox.showerror("Error", "Invalid sample size.")
     exit()
 
-if sample_size > len(df):
-    messagebox.showerror("Error", f"Sample size ({sample_size}) exceeds available records ({len(df)}).")
+if not streaming and sample_size > sampler.n_eligible:
+    messagebox.showerror("Error", f"Sample size ({sample_size}) exceeds available records ({sampler.n_eligible}).")
     exit()
 
 try:
-    sample_df = df.sample(n=sample_size, weights='probability', random_state=42).reset_index(drop=True)
+    if streaming:
+        with profiler.stage("stream sample", "io"):
+            if bin_col is None:
+                sample_df = stream_sample_csv(file_path, column, sample_size, random_state=42)
+            else:
+                sample_df = stream_sample_csv(file_path, column, sample_size, random_state=42, edges=streamed_bins.edges,
+                                              bin_weights=bin_weights, labels=labels, bin_column=bin_col)
+        preview_df = sample_df.head()
+    else:
+        with profiler.stage("sample"):
+            indices = sampler.sample(sample_size, random_state=42)
+        with profiler.stage("label"):
+            extra_columns = None if bin_col is None else {bin_col: label_rows(codes, labels, indices)}
+        sample = LazySample(source, sampler, indices, extra_columns)
+        preview_df = sample.head()
 except Exception as e:
     messagebox.showerror("Error", f"Sampling failed:\n{e}")
     exit()
@@ -95,16 +163,26 @@ except Exception as e:
 # Step 5: Preview
 print("\u2705 Sampled data preview:")
 preview_cols = [column, 'probability'] if bin_col is None else [column, bin_col, 'probability']
-print(sample_df[preview_cols].head())
+print(preview_df[preview_cols])
 
 # Step 6: Save output
 save_path = filedialog.asksaveasfilename(
     title="Save sampled data",
     defaultextension=".csv",
-    filetypes=[("CSV files", "*.csv")]
+    filetypes=[("CSV files", "*.csv"), ("Gzip CSV files", "*.csv.gz"), ("Zstd CSV files", "*.csv.zst"),
+               ("Parquet files", "*.parquet")]
 )
 if save_path:
-    sample_df.to_csv(save_path, index=False)
+    with profiler.stage("write", "io"):
+        if streaming:
+            write_frame(save_path, sample_df)
+        else:
+            # Rows are fetched and written in chunks instead of as one frame
+            with open(save_path, "wb") as f:
+                sample.write(f, format_from_path(save_path))
     print(f"\u2705 Sample saved to: {save_path}")
 else:
     print("\u26A0 Save cancelled.")
+
+print("\u23F1 Stage timings:")
+print(profiler.format())
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pps import KLLSketch, codes_from_edges, equal_width_bins, quantile_bins, quantile_edges
+
+
+@pytest.mark.parametrize("num_bins", [2, 4, 7])
+def test_quantile_bins_match_qcut(num_bins):
+    values = np.random.default_rng(0).lognormal(size=1001)
+    values[[3, 500]] = np.nan
+    codes, labels = quantile_bins(values, num_bins)
+    expected = pd.qcut(values, num_bins)
+    np.testing.assert_array_equal(codes, expected.codes)
+    assert labels == list(expected.categories.astype(str))
+
+
+def test_quantile_bins_with_labels():
+    values = np.arange(12.0)
+    codes, labels = quantile_bins(values, 3, labels=["low", "mid", "high"])
+    np.testing.assert_array_equal(codes, pd.qcut(values, 3, labels=False))
+    assert labels == ["low", "mid", "high"]
+    with pytest.raises(ValueError):
+        quantile_bins(values, 3, labels=["low", "high"])
+
+
+def test_equal_width_bins_match_cut():
+    values = np.random.default_rng(1).normal(size=500)
+    codes, labels = equal_width_bins(values, 5)
+    expected = pd.cut(values, 5)
+    np.testing.assert_array_equal(codes, expected.codes)
+    assert labels == list(expected.categories.astype(str))
+
+
+def test_kll_sketch_quantiles_within_rank_error():
+    rng = np.random.default_rng(2)
+    values = rng.lognormal(size=200_000)
+    sketch = KLLSketch(200, random_state=3)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    assert sketch.count == values.size
+    assert sketch.min == values.min() and sketch.max == values.max()
+    q = np.linspace(0.1, 0.9, 9)
+    ranks = np.searchsorted(np.sort(values), sketch.quantiles(q)) / values.size
+    assert np.abs(ranks - q).max() <= sketch.rank_error
+
+
+def test_merged_kll_sketches_cover_all_parts():
+    rng = np.random.default_rng(4)
+    parts = [rng.normal(loc, size=50_000) for loc in range(4)]
+    sketch = KLLSketch(200, random_state=5)
+    for part in parts:
+        sketch.merge(KLLSketch(200, random_state=6).update(part))
+    values = np.sort(np.concatenate(parts))
+    edges = sketch.edges(4)
+    assert edges[0] == values[0] and edges[-1] == values[-1]
+    ranks = np.searchsorted(values, edges[1:-1]) / values.size
+    assert np.abs(ranks - [0.25, 0.5, 0.75]).max() <= sketch.rank_error
+
+
+def test_codes_from_edges_mark_values_outside_as_missing():
+    edges = quantile_edges(np.arange(10.0), 2)
+    codes = codes_from_edges(np.array([0.0, 9.0, -1.0, 20.0, np.nan]), edges)
+    np.testing.assert_array_equal(codes, [0, 1, -1, -1, -1])
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from pps import LRUCache, open_upload
+
+
+def csv_bytes(rows=1000):
+    frame = pd.DataFrame({"id": np.arange(rows), "revenue": np.random.default_rng(0).lognormal(size=rows)})
+    return frame.to_csv(index=False).encode()
+
+
+def test_uploaded_source_is_cached_once_and_remeasured_as_it_grows():
+    cache = LRUCache()
+    source, _ = open_upload(csv_bytes(), "upload.csv", cache=cache)
+    assert len(cache) == 1
+    before = cache.nbytes
+    source.column("revenue")
+    after_column = cache.nbytes
+    assert after_column > before
+    source.column("revenue * 2")
+    assert cache.nbytes > after_column
+    assert open_upload(csv_bytes(), "upload.csv", cache=cache)[0] is source
+
+
+def test_growth_past_the_limit_evicts_older_entries():
+    cache = LRUCache()
+    cache.put("old", np.zeros(1000))
+    source, _ = open_upload(csv_bytes(), "upload.csv", cache=cache)
+    cache.max_bytes = cache.nbytes + 100
+    source.column("revenue * 2")
+    assert "old" not in cache and len(cache) == 1
+    assert cache.nbytes > cache.max_bytes
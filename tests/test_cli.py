@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pps.cli import EXIT_FAILURE, EXIT_OK, EXIT_USAGE, main
+
+
+@pytest.fixture
+def data(tmp_path):
+    rng = np.random.default_rng(0)
+    for name in ("a", "b"):
+        pd.DataFrame({"id": np.arange(50), "revenue": rng.lognormal(size=50)}).to_csv(tmp_path / f"{name}.csv", index=False)
+    return tmp_path
+
+
+def test_samples_every_input(data):
+    status = main([str(data / "a.csv"), str(data / "b.csv"), "-c", "revenue", "-n", "5",
+                   "-o", str(data / "out" / "{stem}_sample.csv")])
+    assert status == EXIT_OK
+    for name in ("a", "b"):
+        sample = pd.read_csv(data / "out" / f"{name}_sample.csv")
+        assert len(sample) == 5 and "probability" in sample.columns
+
+
+def test_expands_quoted_glob_patterns(data):
+    status = main([str(data / "*.csv"), "-c", "revenue", "-n", "5", "--sharded", "-o", str(data / "all.csv")])
+    assert status == EXIT_OK
+    assert set(pd.read_csv(data / "all.csv")["shard"]) <= {str(data / "a.csv"), str(data / "b.csv")}
+
+
+def test_seed_makes_runs_reproducible(data):
+    for name in ("one", "two"):
+        assert main([str(data / "a.csv"), "-c", "revenue", "-n", "5", "--seed", "3", "-o", str(data / f"{name}.csv")]) == EXIT_OK
+    pd.testing.assert_frame_equal(pd.read_csv(data / "one.csv"), pd.read_csv(data / "two.csv"))
+
+
+def test_failed_input_exits_with_failure(data, capsys):
+    status = main([str(data / "a.csv"), str(data / "missing.csv"), "-c", "revenue", "-n", "5",
+                   "-o", str(data / "{stem}_out.csv")])
+    assert status == EXIT_FAILURE
+    assert "missing.csv" in capsys.readouterr().err
+    assert (data / "a_out.csv").exists()
+
+
+def test_unknown_column_exits_with_failure(data):
+    assert main([str(data / "a.csv"), "-c", "nope", "-n", "5", "-o", str(data / "out.csv")]) == EXIT_FAILURE
+
+
+@pytest.mark.parametrize("args", [
+    ["-c", "revenue", "-n", "0"],
+    ["-c", "revenue", "-n", "5", "--stratified"],
+    ["-c", "revenue", "-n", "5", "--prn-key", "id"],
+    ["-c", "revenue", "-n", "5", "--bins", "2", "--fixed", "1,1"],
+    ["-c", "revenue", "-n", "5", "--bins", "2", "--stratified", "--weights", "1,2"],
+    ["-n", "5"],
+])
+def test_invalid_arguments_exit_with_usage_error(data, args):
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(data / "a.csv")] + args)
+    assert exit_info.value.code == EXIT_USAGE
+
+
+def test_diagnostics_report_is_written(data):
+    status = main([str(data / "a.csv"), "-c", "revenue", "-n", "5", "--design", "sampford",
+                   "--diagnostics", str(data / "checks.txt"), "--diagnostic-replicates", "20",
+                   "-o", str(data / "out.csv")])
+    assert status == EXIT_OK
+    assert "Sum of pi 5.0000" in (data / "checks.txt").read_text()
+
+
+def test_state_updates_keep_the_saved_size_column(data, capsys):
+    state = str(data / "state.npz")
+    assert main([str(data / "a.csv"), "-c", "revenue", "-n", "5", "--design", "pareto", "--prn-key", "id",
+                 "--save-state", state, "-o", str(data / "first.csv")]) == EXIT_OK
+    pd.DataFrame({"id": [100], "revenue": [2.0], "other": [3.0]}).to_csv(data / "delta.csv", index=False)
+    args = [str(data / "delta.csv"), "-n", "5", "--from-state", state, "-o", str(data / "next.csv")]
+    assert main(args + ["-c", "other"]) == EXIT_FAILURE
+    assert "size column 'revenue'" in capsys.readouterr().err
+    assert main(args + ["-c", "revenue"]) == EXIT_OK
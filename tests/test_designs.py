@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from pps import AliasTable, PPSSampler, inclusion_probabilities, pareto, sampford, sequential_poisson, systematic_pps
+
+WEIGHTS = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 10.0, 0.0, 25.0])
+N = 3
+REPLICATES = 4000
+
+
+def inclusion_frequencies(draw, replicates=REPLICATES):
+    counts = np.zeros(WEIGHTS.size)
+    for seed in range(replicates):
+        counts[draw(seed)] += 1
+    return counts / replicates
+
+
+def test_inclusion_probabilities_cap_certainty_units():
+    pi = inclusion_probabilities(WEIGHTS, N)
+    assert pi[-1] == 1.0
+    assert pi[6] == 0.0
+    assert pi.sum() == pytest.approx(N)
+    np.testing.assert_allclose(pi[:6], WEIGHTS[:6] * 2 / WEIGHTS[:6].sum())
+
+
+def test_inclusion_probabilities_reject_too_large_samples():
+    with pytest.raises(ValueError):
+        inclusion_probabilities(WEIGHTS, 8)
+
+
+@pytest.mark.parametrize("design, tolerance", [
+    (sampford, 4),
+    (systematic_pps, 4),
+    (pareto, 4),
+    (sequential_poisson, 6),
+])
+def test_designs_hit_target_inclusion_probabilities(design, tolerance):
+    pi = inclusion_probabilities(WEIGHTS, N)
+    frequency = inclusion_frequencies(lambda seed: design(WEIGHTS, N, random_state=seed).indices)
+    standard_error = np.sqrt(pi * (1 - pi) / REPLICATES)
+    assert np.all(np.abs(frequency - pi) <= tolerance * standard_error + 1e-12)
+
+
+@pytest.mark.parametrize("design", [sampford, systematic_pps, pareto, sequential_poisson])
+def test_designs_return_n_distinct_units_with_their_pi(design):
+    result = design(WEIGHTS, N, random_state=1)
+    assert np.unique(result.indices).size == N
+    np.testing.assert_allclose(result.pi, inclusion_probabilities(WEIGHTS, N)[result.indices])
+
+
+def test_order_designs_follow_the_given_random_numbers():
+    u = np.random.default_rng(3).random(WEIGHTS.size)
+    first = pareto(WEIGHTS, N, u=u).indices
+    np.testing.assert_array_equal(first, pareto(WEIGHTS, N, random_state=99, u=u).indices)
+    with pytest.raises(ValueError):
+        sequential_poisson(WEIGHTS, N, u=u[:-1])
+
+
+def test_alias_table_draws_proportional_to_weight():
+    table = AliasTable.from_weights(WEIGHTS)
+    draws = table.draw(200_000, random_state=0)
+    frequency = np.bincount(draws, minlength=WEIGHTS.size) / draws.size
+    p = WEIGHTS / WEIGHTS.sum()
+    assert np.all(np.abs(frequency - p) <= 4 * np.sqrt(p * (1 - p) / draws.size) + 1e-12)
+    assert frequency[6] == 0
+
+
+def test_alias_table_round_trips_through_npz(tmp_path):
+    table = AliasTable.from_weights(WEIGHTS)
+    path = tmp_path / "alias.npz"
+    table.save(path)
+    loaded = AliasTable.load(path)
+    np.testing.assert_array_equal(loaded.draw(100, random_state=5), table.draw(100, random_state=5))
+    assert loaded.total == table.total
+
+
+def test_alias_table_rejects_zero_total():
+    with pytest.raises(ValueError):
+        AliasTable.from_weights([0.0, -1.0, np.nan])
+
+
+def test_successive_sampling_draws_first_unit_proportional_to_weight():
+    sampler = PPSSampler(WEIGHTS)
+    firsts = np.array([sampler.sample(N, random_state=seed)[0] for seed in range(REPLICATES)])
+    frequency = np.bincount(firsts, minlength=WEIGHTS.size) / REPLICATES
+    p = WEIGHTS / WEIGHTS.sum()
+    assert np.all(np.abs(frequency - p) <= 4 * np.sqrt(p * (1 - p) / REPLICATES) + 1e-12)
+
+
+def test_probabilities_are_float64_for_float32_weights():
+    sampler = PPSSampler.from_sizes(np.array([1, 2, 3], dtype=np.int16))
+    assert sampler.weights.dtype == np.float32
+    assert sampler.probabilities.dtype == np.float64
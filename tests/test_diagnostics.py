@@ -0,0 +1,17 @@
+import numpy as np
+
+from pps import diagnose, sampford
+
+
+def test_monte_carlo_z_is_missing_for_counts_that_never_vary():
+    # These pi sum to 3 only up to rounding, so a z-score of the fixed count would be infinite
+    weights = np.random.default_rng(0).lognormal(size=9)
+    codes = np.array([0, 0, 0, 0, 0, 1, 1, 1, 1])
+    sample = sampford(weights, 3, random_state=0)
+    whole = diagnose(weights, sample.indices, codes=np.zeros(9, dtype=int), labels=["all"], design="sampford",
+                     replicates=20, random_state=1).bins
+    assert whole["mc_mean"].iloc[0] == 3
+    assert np.isnan(whole["mc_z"].iloc[0])
+    split = diagnose(weights, sample.indices, codes=codes, labels=["first", "second"], design="sampford",
+                     replicates=20, random_state=1).bins
+    assert np.isfinite(split["mc_z"]).all()
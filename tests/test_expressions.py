@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pps import FrameSource, SizeExpression
+
+FRAME = pd.DataFrame({"sales": [1.0, 2.0, 0.0, 4.0], "assets": [10, 20, 30, 40], "net sales": [1, 1, 2, 2]})
+
+
+def test_evaluates_arithmetic_and_functions():
+    expression = SizeExpression("0.7 * sales + 0.3 * assets")
+    np.testing.assert_allclose(expression.evaluate_frame(FRAME), 0.7 * FRAME["sales"] + 0.3 * FRAME["assets"])
+    np.testing.assert_allclose(SizeExpression("clip(assets, 15, 35)").evaluate_frame(FRAME), [15, 20, 30, 35])
+    np.testing.assert_allclose(SizeExpression("`net sales` * 2").evaluate_frame(FRAME), [2, 2, 4, 4])
+    assert sorted(expression.columns) == ["assets", "sales"]
+
+
+def test_undefined_results_become_missing():
+    result = SizeExpression("log(sales)").evaluate_frame(FRAME)
+    assert np.isnan(result[2])
+    assert result.dtype == np.float64
+
+
+@pytest.mark.parametrize("text", [
+    "sales.__class__",
+    "sales.sum()",
+    "__import__('os')",
+    "eval('1')",
+    "open('x')",
+    "clip(sales, a_min=0)",
+    "[sales]",
+    "sales[0]",
+    "lambda: 1",
+    "'text'",
+    "True",
+])
+def test_rejects_attributes_calls_and_other_syntax(text):
+    with pytest.raises(ValueError):
+        SizeExpression(text)
+
+
+def test_unknown_column_is_reported():
+    with pytest.raises(ValueError, match="not found"):
+        SizeExpression("revenue * 2").evaluate_frame(FRAME)
+
+
+def test_sources_cache_expressions_by_normalized_text():
+    source = FrameSource(FRAME)
+    first = source.column("sales*2")
+    assert source.column("sales * 2") is first
+    with pytest.raises(ValueError):
+        first[0] = 1.0
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from pps import IncrementalFrame, pareto, permanent_random_numbers, sequential_poisson, shift_prn
+
+
+def population(seed=0, size=500):
+    rng = np.random.default_rng(seed)
+    return np.arange(size) * 3, rng.lognormal(size=size)
+
+
+def test_permanent_random_numbers_depend_only_on_the_key():
+    keys = np.array([7, 3, 11, 5])
+    prn = permanent_random_numbers(keys, seed=1)
+    assert np.all((prn > 0) & (prn < 1))
+    order = np.array([2, 0, 3, 1])
+    np.testing.assert_array_equal(permanent_random_numbers(keys[order], seed=1), prn[order])
+    np.testing.assert_array_equal(permanent_random_numbers(keys.astype(np.float64), seed=1), prn)
+    np.testing.assert_array_equal(permanent_random_numbers(keys.astype(np.int8), seed=1), prn)
+    assert not np.array_equal(permanent_random_numbers(keys, seed=2), prn)
+    with pytest.raises(ValueError):
+        permanent_random_numbers(np.array([1.0, np.nan]))
+
+
+def test_permanent_random_numbers_coordinate_samples():
+    keys, sizes = population()
+    prn = permanent_random_numbers(keys, seed=4)
+    first = set(sequential_poisson(sizes, 50, u=prn).indices)
+    # A small change to the sizes keeps most of the sample
+    grown = sizes * np.random.default_rng(5).uniform(0.95, 1.05, sizes.size)
+    assert len(first & set(sequential_poisson(grown, 50, u=prn).indices)) >= 40
+    # Shifting by the sampling fraction rotates units out
+    shifted = set(pareto(sizes, 50, u=shift_prn(prn, 0.5)).indices)
+    assert len(first & shifted) <= 15
+
+
+def test_shift_prn_stays_in_the_open_unit_interval():
+    shifted = shift_prn(np.array([0.25, 0.75, 0.5]), 0.5)
+    np.testing.assert_allclose(shifted[:2], [0.75, 0.25])
+    assert 0 < shifted[2] < 1
+
+
+@pytest.mark.parametrize("binned", [False, True])
+def test_applying_a_delta_matches_a_rebuild(binned):
+    keys, sizes = population()
+    options = {"edges": [0.0, 1.0, 2.0, 100.0], "bin_weights": [1.0, 2.0, 4.0]} if binned else {}
+    frame = IncrementalFrame(keys, sizes, 40, design="pareto", prn_seed=3, **options)
+    frame.draw()
+
+    rng = np.random.default_rng(1)
+    updated = rng.choice(keys, 30, replace=False)
+    deleted = np.setdiff1d(rng.choice(keys, 20, replace=False), updated)
+    inserted = np.arange(5000, 5025)
+    delta_keys = np.concatenate([updated, deleted, inserted])
+    delta_sizes = np.concatenate([rng.lognormal(size=updated.size), np.zeros(deleted.size),
+                                  rng.lognormal(size=inserted.size)])
+    ops = ["update"] * updated.size + ["delete"] * deleted.size + ["insert"] * inserted.size
+    summary = frame.apply_delta(delta_keys, delta_sizes, ops)
+    assert summary == (inserted.size, updated.size, deleted.size)
+    result, change = frame.draw()
+
+    final = dict(zip(keys, sizes))
+    final.update(zip(updated, delta_sizes[:updated.size]))
+    for key in deleted:
+        del final[key]
+    final.update(zip(inserted, delta_sizes[-inserted.size:]))
+    rebuilt = IncrementalFrame(list(final), list(final.values()), 40, design="pareto", prn_seed=3, **options)
+    rebuilt_result, _ = rebuilt.draw()
+
+    np.testing.assert_array_equal(frame.keys[result.indices], rebuilt.keys[rebuilt_result.indices])
+    np.testing.assert_allclose(result.pi, rebuilt_result.pi)
+    assert frame.total == pytest.approx(rebuilt.total)
+    if binned:
+        np.testing.assert_array_equal(frame.bin_count, rebuilt.bin_count)
+        np.testing.assert_allclose(frame.bin_size, rebuilt.bin_size)
+    assert len(change.kept) + len(change.added) == 40
+
+
+def test_state_round_trips_through_npz(tmp_path):
+    keys, sizes = population()
+    frame = IncrementalFrame(keys, sizes, 25, prn_seed=9)
+    frame.draw()
+    path = tmp_path / "state.npz"
+    frame.save(path)
+    loaded = IncrementalFrame.load(path)
+    np.testing.assert_array_equal(loaded.draw()[0].indices, frame.draw()[0].indices)
+
+
+def test_invalid_deltas_are_rejected():
+    keys, sizes = population(size=10)
+    frame = IncrementalFrame(keys, sizes, 3)
+    with pytest.raises(ValueError):
+        frame.apply_delta([1], [1.0], ["update"])
+    with pytest.raises(ValueError):
+        frame.apply_delta([0], [1.0], ["insert"])
+    with pytest.raises(ValueError):
+        frame.apply_delta([0], [1.0], ["replace"])
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from pps import shard_edges, sharded_sample, stream_sample_csv
+
+SIZES = [np.array([1.0, 5.0, 0.0, 2.0]), np.array([8.0, 3.0]), np.array([4.0, np.nan, 6.0])]
+
+
+@pytest.fixture
+def shards(tmp_path):
+    paths = []
+    start = 0
+    for i, sizes in enumerate(SIZES):
+        frame = pd.DataFrame({"id": np.arange(start, start + sizes.size), "size": sizes, "other": "x"})
+        start += sizes.size
+        path = tmp_path / f"part-{i}.csv"
+        frame.to_csv(path, index=False)
+        paths.append(str(path))
+    return paths
+
+
+def test_sharded_sample_fetches_rows_and_probabilities(shards):
+    result = sharded_sample(shards, "size", 3, random_state=0)
+    frame = result.frame
+    assert list(frame.columns[:2]) == ["shard", "row"]
+    assert frame["id"].is_unique and len(frame) == 3
+    sizes = np.concatenate(SIZES)
+    np.testing.assert_allclose(frame["probability"], sizes[frame["id"]] / np.nansum(sizes))
+    assert result.shards["sampled"].sum() == 3
+    assert result.shards["eligible"].tolist() == [3, 2, 2]
+
+
+def test_sharded_merge_draws_first_unit_proportional_to_size(shards):
+    sizes = np.nan_to_num(np.concatenate(SIZES))
+    replicates = 1000
+    firsts = [sharded_sample(shards, "size", 2, random_state=seed, index_only=True).frame for seed in range(replicates)]
+    offsets = {path: sum(s.size for s in SIZES[:i]) for i, path in enumerate(shards)}
+    first_ids = np.array([offsets[f["shard"][0]] + f["row"][0] for f in firsts])
+    frequency = np.bincount(first_ids, minlength=sizes.size) / replicates
+    p = sizes / sizes.sum()
+    assert np.all(np.abs(frequency - p) <= 4 * np.sqrt(p * (1 - p) / replicates) + 1e-12)
+
+
+def test_sharded_sample_with_replacement_matches_single_draw_probabilities(shards):
+    sizes = np.nan_to_num(np.concatenate(SIZES))
+    offsets = {path: sum(s.size for s in SIZES[:i]) for i, path in enumerate(shards)}
+    replicates, n = 500, 20
+    counts = np.zeros(sizes.size)
+    for seed in range(replicates):
+        frame = sharded_sample(shards, "size", n, replace=True, random_state=seed, index_only=True).frame
+        np.add.at(counts, frame["shard"].map(offsets).to_numpy() + frame["row"].to_numpy(), 1)
+    p = sizes / sizes.sum()
+    assert np.all(np.abs(counts / replicates - n * p) <= 4 * np.sqrt(n * p * (1 - p) / replicates) + 1e-12)
+
+
+def test_sharded_sample_is_reproducible_and_takes_everything_eligible(shards):
+    first = sharded_sample(shards, "size", 7, random_state=5).frame
+    second = sharded_sample(shards, "size", 7, random_state=5).frame
+    pd.testing.assert_frame_equal(first, second)
+    assert sorted(first["id"]) == [0, 1, 3, 4, 5, 6, 8]
+    with pytest.raises(ValueError):
+        sharded_sample(shards, "size", 8, random_state=5)
+
+
+def test_shard_edges_are_exact_for_equal_width_bins(shards):
+    edges = shard_edges(shards, "size", bins=2, random_state=0)
+    assert edges[-1] == 8.0
+    result = sharded_sample(shards, "size", 3, random_state=1, edges=edges, bin_weights=[1.0, 3.0],
+                            bin_column="bin_label")
+    assert result.frame["bin_label"].notna().all()
+
+
+def test_sharded_size_expressions_read_their_columns(shards):
+    frame = sharded_sample(shards, "size * 2 + id", 3, random_state=2).frame
+    np.testing.assert_allclose(frame["size * 2 + id"], frame["size"] * 2 + frame["id"])
+
+
+def test_stream_sample_csv_matches_probabilities(shards):
+    frame = stream_sample_csv(shards[0], "size", 2, chunksize=1, random_state=0)
+    assert len(frame) == 2
+    np.testing.assert_allclose(frame["probability"], frame["size"] / 8.0)
+
+
+def test_stream_sample_csv_allows_empty_samples(shards):
+    assert len(stream_sample_csv(shards[0], "size", 0, chunksize=2, random_state=0)) == 0
+    with pytest.raises(ValueError):
+        stream_sample_csv(shards[0], "size", -1)
+
+
+def test_empty_samples_read_every_shard(shards):
+    result = sharded_sample(shards, "size", 0, random_state=0)
+    assert len(result.frame) == 0
+    assert result.shards["eligible"].sum() == 7
+
+
+def test_sharded_sample_with_replacement_draws_only_allocated_shards(shards):
+    assert len(sharded_sample(shards, "size", 0, replace=True, random_state=0).frame) == 0
+    edges = shard_edges(shards, "size", bins=2, random_state=0)
+    result = sharded_sample(shards, "size", 30, replace=True, random_state=1, edges=edges, bin_weights=[1.0, 3.0],
+                            bin_column="bin_label", workers=2)
+    assert len(result.frame) == 30 and result.frame["bin_label"].notna().all()
+    assert result.shards["sampled"].sum() == 30
@@ -0,0 +1,42 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from pps import allocate, stratified_sample, stratum_summary
+
+CODES = np.array([0, 0, 1, 1, 1, 1, 2, 2, 2, -1])
+WEIGHTS = np.array([1.0, 2.0, 1.0, 1.0, 50.0, 1.0, 3.0, 0.0, 4.0, 9.0])
+
+
+def summary():
+    return stratum_summary(CODES, WEIGHTS, 3)
+
+
+def test_proportional_allocation_follows_eligible_counts():
+    assert summary().counts.tolist() == [2, 4, 2]
+    np.testing.assert_array_equal(allocate(4, summary()), [1, 2, 1])
+
+
+def test_allocation_with_every_stratum_capped():
+    empty = stratum_summary(np.full(4, -1), np.ones(4), 3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        np.testing.assert_array_equal(allocate(8, summary(), "neyman"), [2, 4, 2])
+        np.testing.assert_array_equal(allocate(0, empty), [0, 0, 0])
+    with pytest.raises(ValueError):
+        allocate(9, summary())
+
+
+def test_fixed_allocation_is_checked_against_stratum_sizes():
+    np.testing.assert_array_equal(allocate(0, summary(), "fixed", [1, 0, 2]), [1, 0, 2])
+    with pytest.raises(ValueError):
+        allocate(0, summary(), "fixed", [3, 0, 0])
+
+
+def test_stratified_sample_draws_the_allocation():
+    allocation = np.array([1, 2, 2])
+    result = stratified_sample(CODES, WEIGHTS, allocation, random_state=0, summary=summary())
+    np.testing.assert_array_equal(np.bincount(result.strata, minlength=3), allocation)
+    assert 7 not in result.indices and 9 not in result.indices
+    np.testing.assert_allclose(result.probability, WEIGHTS[result.indices] / summary().totals[result.strata])